@@ -0,0 +1,178 @@
+"""
+Benchmark: CityResolver automaton vs. the previous nested-loop implementation.
+基准测试：CityResolver 自动机 vs 旧版嵌套循环实现。
+
+Usage:
+    python benchmarks/bench_city_resolver.py [--rounds 20] [--synthetic-venues 3]
+
+`--synthetic-venues N` adds N made-up venue keywords per CITIES entry on top of
+config/venue_city_mapping.json, to see how both implementations scale as the mapping grows.
+`--synthetic-venues N` 为每个 CITIES 城市额外生成 N 个场馆关键词，用于观察映射规模增长时的表现。
+
+Besides timing, every sample is resolved by both implementations and any mismatch is reported,
+so the benchmark doubles as an equivalence check.
+除计时外，每个样本都会用两种实现解析并报告差异，同时作为等价性校验。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+from services.hulaquan.city_resolver import CityResolver
+from services.hulaquan.utils import CITIES, extract_title_info, detect_city_in_text
+
+
+class LegacyCityResolver:
+    """Copy of the loop-based lookups CityResolver used before the automaton."""
+
+    def __init__(self, resolver: CityResolver):
+        self.venue_rules = resolver.venue_rules
+        self.title_rules = resolver.title_rules
+        self.fallback_rules = resolver.fallback_rules
+
+    def from_venue(self, location):
+        if not location:
+            return None
+        for city, keywords in self.venue_rules.items():
+            for kw in keywords:
+                if kw in location:
+                    return city
+        return None
+
+    def from_title(self, title):
+        if not title:
+            return None
+        for city, keywords in self.title_rules.items():
+            for kw in keywords:
+                if kw in title:
+                    return city
+        return None
+
+    def from_fallback(self, location):
+        if not location:
+            return None
+        for key, city in self.fallback_rules.items():
+            if key in location:
+                return city
+        return None
+
+    def resolve_ticket_city(self, ticket_title, ticket_city, event_title, location):
+        if location:
+            city = self.from_venue(location)
+            if city: return city, "venue_keyword"
+        for title in (ticket_title, event_title):
+            city = self.from_title(title)
+            if city: return city, "title_keyword"
+        if ticket_city:
+            return ticket_city, "ticket_city"
+        if ticket_title:
+            city = extract_title_info(ticket_title).get("city")
+            if city: return city, "ticket_title_text"
+        if event_title:
+            city = extract_title_info(event_title).get("city")
+            if city: return city, "event_title_text"
+        if location:
+            city = detect_city_in_text(location)
+            if city: return city, "location_text"
+        return None, None
+
+
+SYNTHETIC_VENUE_SUFFIXES = ["大剧院", "保利剧院", "文化中心", "艺术中心", "音乐厅", "小剧场", "大舞台", "剧场"]
+
+
+def build_resolver(synthetic_venues: int) -> CityResolver:
+    resolver = CityResolver()
+    if not synthetic_venues:
+        return resolver
+
+    venue_rules = {city: list(kws) for city, kws in resolver.venue_rules.items()}
+    for city in CITIES:
+        extra = [f"{city}{suffix}" for suffix in SYNTHETIC_VENUE_SUFFIXES[:synthetic_venues]]
+        venue_rules.setdefault(city, []).extend(extra)
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"venue_keywords": venue_rules, "title_keywords": resolver.title_rules}, f, ensure_ascii=False)
+    try:
+        return CityResolver(config_path=path)
+    finally:
+        os.remove(path)
+
+
+def build_samples(resolver: CityResolver, count: int, seed: int = 42):
+    """Synthetic (ticket_title, ticket_city, event_title, location) tuples from the live rule set."""
+    rng = random.Random(seed)
+    venues = [kw for kws in resolver.venue_rules.values() for kw in kws] + list(resolver.fallback_rules)
+    titles = [kw for kws in resolver.title_rules.values() for kw in kws]
+    noise_venues = ["某某剧场", "城市艺术中心", "小剧场B厅", "Livehouse"]
+    shows = ["《阿波罗尼亚》", "《粉丝来信》", "《上海之夜》", "《北京法源寺》", "《灯塔》"]
+
+    samples = []
+    for _ in range(count):
+        show = rng.choice(shows)
+        prefix = rng.choice(CITIES) if rng.random() < 0.5 else ""
+        suffix = rng.choice(titles) if titles and rng.random() < 0.2 else ""
+        event_title = f"{prefix}{show}{suffix}"
+        ticket_title = f"{event_title} 12-{rng.randint(1, 31):02d} 19:30 ￥{rng.choice([180, 280, 380])}"
+        venue_pool = venues if venues and rng.random() < 0.6 else noise_venues
+        location = rng.choice(CITIES) + rng.choice(venue_pool) if rng.random() < 0.3 else rng.choice(venue_pool)
+        ticket_city = rng.choice(CITIES) if rng.random() < 0.2 else None
+        samples.append((ticket_title, ticket_city, event_title, location))
+    return samples
+
+
+def timed(label, fn, samples, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for s in samples:
+            fn(*s)
+        best = min(best, time.perf_counter() - start)
+    per_call_us = best / len(samples) * 1e6
+    print(f"{label:<32} best {best * 1000:8.2f} ms  ({per_call_us:6.2f} µs/ticket)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CityResolver benchmark")
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--synthetic-venues", type=int, default=0)
+    args = parser.parse_args()
+
+    resolver = build_resolver(args.synthetic_venues)
+    legacy = LegacyCityResolver(resolver)
+    samples = build_samples(resolver, args.samples)
+    venue_keywords = sum(len(kws) for kws in resolver.venue_rules.values())
+    print(f"Rules: {len(resolver.venue_rules)} venue cities ({venue_keywords} keywords), {len(resolver.title_rules)} title cities, "
+          f"{len(resolver.fallback_rules)} fallback keys, {len(CITIES)} CITIES; "
+          f"automaton keywords={resolver._automaton.size}")
+
+    mismatches = [
+        (s, legacy.resolve_ticket_city(*s), resolver.resolve_ticket_city(*s))
+        for s in samples
+        if legacy.resolve_ticket_city(*s) != resolver.resolve_ticket_city(*s)
+    ]
+    print(f"Equivalence: {len(samples) - len(mismatches)}/{len(samples)} identical")
+    for s, old, new in mismatches[:10]:
+        print(f"  MISMATCH {s}: legacy={old} automaton={new}")
+
+    def automaton_cold(*s):
+        # Clear the per-text cache so every call pays for the scan
+        resolver._scan_cache.clear()
+        return resolver.resolve_ticket_city(*s)
+
+    old = timed("legacy loops", legacy.resolve_ticket_city, samples, args.rounds)
+    cold = timed("automaton (no cache)", automaton_cold, samples, args.rounds)
+    warm = timed("automaton (scan cache)", resolver.resolve_ticket_city, samples, args.rounds)
+    print(f"Speedup: cold x{old / cold:.2f}, warm x{old / warm:.2f}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+爬虫 HTTP 客户端基准测试：旧的「每个服务一个 Session、连接错误即关闭重建」 vs 共享的 AdvancedCrawlerClient
+Benchmark: legacy session-per-service fetching vs the shared AdvancedCrawlerClient.
+
+默认在本地启动一个 aiohttp 测试服务器（可配置延迟与故障率），不访问外网；
+服务器统计新建 TCP 连接数，用于对比长连接复用效果。
+Starts a local aiohttp server with configurable latency and fault rate (no outbound traffic by default)
+and reports requests/s, p50/p99 latency, failures and the number of TCP connections the server accepted.
+
+用法 / Usage:
+    python benchmarks/bench_crawler_client.py                         # 本地服务器，两种模式对比
+    python benchmarks/bench_crawler_client.py -n 2000 -c 20 --fault 0.02 --latency-ms 30
+    python benchmarks/bench_crawler_client.py --url https://y.saoju.net/yyj/api/city/ -n 20 -c 2 --probe
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+sys.path.append(os.getcwd())
+
+import aiohttp
+from aiohttp import web
+
+from services.crawler.advanced_client import RETRY_STATUSES, AdvancedCrawlerClient
+from services.crawler.smart_retry import RetryConfig, RetryStrategy
+from services.system.http_clients import http_clients
+
+PAYLOAD = {"show_list": [{"musical": f"剧目{i}", "time": "19:30", "city": "上海", "cast": []} for i in range(50)]}
+
+
+# --- Local test server ---
+
+class BenchServer:
+    def __init__(self, latency_ms: float, fault_rate: float):
+        self.latency_ms = latency_ms
+        self.fault_rate = fault_rate
+        self._peers = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    @property
+    def connections(self) -> int:
+        # Distinct client (ip, port) pairs ~ TCP connections accepted / 不同的客户端端口数 ≈ 新建连接数
+        return len(self._peers)
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self._peers.add(request.transport.get_extra_info("peername"))
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000 * random.uniform(0.5, 1.5))
+        if random.random() < self.fault_rate:
+            # Drop the connection mid-request (what a flaky upstream / LB does)
+            # 直接断开连接，模拟上游或负载均衡异常
+            request.transport.abort()
+            return web.Response(status=500)
+        return web.json_response(PAYLOAD)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+# --- Clients under test ---
+
+class LegacySessionClient:
+    """旧实现：服务自己持有一个 Session，连接错误时关闭整个 Session（丢弃所有长连接）"""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _ensure_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(ssl=False),
+                timeout=aiohttp.ClientTimeout(total=90, connect=20),
+            )
+
+    async def fetch(self, url: str) -> Tuple[int, bytes]:
+        await self._ensure_session()
+        try:
+            async with self._session.get(url) as response:
+                return response.status, await response.read()
+        except (aiohttp.ClientConnectionError, ConnectionResetError, asyncio.TimeoutError):
+            await self.close()
+            raise
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+class AdvancedAdapter:
+    def __init__(self, base_url: str, pool_size: int, probe: bool):
+        self.client = AdvancedCrawlerClient(
+            base_url,
+            pool_size=pool_size,
+            enable_health_probe=probe,
+            retry_config=RetryConfig(max_retries=3, base_delay=0.05, max_delay=1.0, give_up_probability=0.0),
+            retry_strategy=RetryStrategy.EXPONENTIAL_BACKOFF,
+            retry_statuses=RETRY_STATUSES,
+        )
+
+    async def fetch(self, url: str) -> Tuple[int, bytes]:
+        return await self.client.fetch_bytes(url)
+
+    async def close(self):
+        await self.client.close()
+
+
+# --- Runner ---
+
+def _percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_mode(client, url: str, requests: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    failures = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal failures
+        async with sem:
+            started = time.perf_counter()
+            try:
+                status, _ = await client.fetch(url)
+                if status != 200:
+                    failures += 1
+            except Exception:
+                failures += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "failed": failures,
+        "elapsed_s": elapsed,
+        "rps": requests / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+def _print_row(name: str, result: Dict, connections: Optional[int]):
+    conns = "-" if connections is None else str(connections)
+    print(f"{name:<10} {result['requests']:>8} {result['failed']:>7} {result['rps']:>9.1f} "
+          f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {conns:>8}")
+
+
+async def main_async(args):
+    # Injected faults make aiohttp's server log every aborted request / 注入的断连会让服务端逐条报错
+    logging.getLogger("aiohttp.server").setLevel(logging.CRITICAL)
+    server = None
+    if args.url:
+        url = args.url
+        parsed = urlparse(url)
+        base_url = f"{parsed.scheme}://{parsed.netloc}"
+    else:
+        server = BenchServer(args.latency_ms, args.fault)
+        await server.start()
+        base_url = server.base_url
+        url = f"{base_url}/yyj/api/search_day/"
+
+    print(f"Target: {url}  requests={args.requests} concurrency={args.concurrency} "
+          f"latency={args.latency_ms}ms fault={args.fault}")
+    print(f"{'mode':<10} {'requests':>8} {'failed':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'conns':>8}")
+
+    try:
+        for mode in args.modes:
+            if mode == "legacy":
+                client = LegacySessionClient()
+            else:
+                client = AdvancedAdapter(base_url, pool_size=args.concurrency, probe=args.probe)
+                await client.client.initialize()
+            before = server.connections if server else None
+            try:
+                result = await run_mode(client, url, args.requests, args.concurrency)
+            finally:
+                await client.close()
+            _print_row(mode, result, (server.connections - before) if server else None)
+    finally:
+        await http_clients.close()
+        if server:
+            await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy per-service sessions with AdvancedCrawlerClient")
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Local server latency (randomized ±50%%)")
+    parser.add_argument("--fault", type=float, default=0.01, help="Local server connection-drop rate")
+    parser.add_argument("--url", help="Benchmark a real URL instead of the local server (keep -n small)")
+    parser.add_argument("--probe", action="store_true", help="Enable the health prober (real hosts only)")
+    parser.add_argument("--modes", nargs="+", default=["legacy", "advanced"], choices=["legacy", "advanced"])
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Benchmark: full sync cycles (Hulaquan sync_all_data -> Saoju sync_future_days -> match_co_casts) offline.
+基准测试：离线运行完整同步周期（呼啦圈 sync_all_data -> 扫剧 sync_future_days -> match_co_casts）。
+
+Usage:
+    # 1. Record once against the live APIs (writes raw responses, see services/crawler/recorder.py)
+    #    先对线上接口录制一次
+    python benchmarks/bench_sync_pipeline.py --record benchmarks/recordings
+
+    # 2. Replay as often as needed, with simulated network latency
+    #    之后可反复离线回放，并模拟网络延迟
+    python benchmarks/bench_sync_pipeline.py --replay benchmarks/recordings --cycles 3 --latency-ms 80 --jitter-ms 40
+
+Every run uses a scratch SQLite database (HLQ_DB_PATH, created with init_db) so production data is never
+touched: cycle 1 is the cold sync, later cycles measure the steady state (unchanged tickets, day
+fingerprints). ``--force`` makes every cycle re-fetch and re-diff all Saoju days.
+每次运行使用临时 SQLite 库；第 1 轮为冷启动同步，后续轮次衡量稳态（--force 让每轮都重新抓取扫剧所有日期）。
+
+Per cycle it reports events/s, queries per event (services/db/profiler.py), p50/p99/total per stage and
+peak RSS. Stages are timed by wrapping the service methods on the instances under test; no production
+code paths are changed.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+from typing import Dict, List
+from urllib.parse import urlparse
+
+sys.path.append(os.getcwd())
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageTimer:
+    """Collects per-call latencies (ms) of wrapped methods, by stage name."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def reset(self):
+        self.samples.clear()
+
+    def wrap(self, owner, attr: str, stage: str):
+        fn = getattr(owner, attr)
+        timer = self
+
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    timer.samples[stage].append((time.perf_counter() - started) * 1000)
+        else:
+            @wraps(fn)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    # list.append is atomic, so executor threads can record directly
+                    timer.samples[stage].append((time.perf_counter() - started) * 1000)
+
+        setattr(owner, attr, timed)
+
+    def rows(self):
+        for stage in sorted(self.samples):
+            samples = self.samples[stage]
+            yield stage, len(samples), _percentile(samples, 50), _percentile(samples, 99), sum(samples) / 1000
+
+
+def _query_count(profiler) -> int:
+    return sum(row["count"] for row in profiler.report(top=1_000_000)["queries"])
+
+
+def _top_artists(limit: int) -> List[str]:
+    """Most frequent artists in the synced SaojuShow rows (co-cast search inputs)."""
+    from sqlmodel import select
+
+    from services.db.connection import session_scope
+    from services.hulaquan.tables import SaojuShow
+
+    counts = Counter()
+    with session_scope(readonly=True) as session:
+        for cast_str in session.exec(select(SaojuShow.cast_str)).all():
+            for seg in (cast_str or "").split(" / "):
+                artist = seg.split(":", 1)[-1].strip()
+                if artist:
+                    counts[artist] += 1
+    return [name for name, _ in counts.most_common(limit)]
+
+
+async def run_cycle(cycle: int, service, timer: StageTimer, profiler, args) -> Dict:
+    timer.reset()
+    result = {"cycle": cycle}
+
+    profiler.reset()
+    started = time.perf_counter()
+    updates = await service.sync_all_data()
+    result["hlq_s"] = time.perf_counter() - started
+    result["events"] = len(timer.samples.get("hlq.event", []))
+    result["updates"] = len(updates)
+    result["hlq_queries"] = _query_count(profiler)
+
+    profiler.reset()
+    started = time.perf_counter()
+    await service.saoju.sync_future_days(0, args.days, force=args.force)
+    result["saoju_s"] = time.perf_counter() - started
+    result["saoju_queries"] = _query_count(profiler)
+
+    artists = await asyncio.get_running_loop().run_in_executor(None, _top_artists, args.co_cast_artists)
+    started = time.perf_counter()
+    for i, artist in enumerate(artists):
+        await service.saoju.match_co_casts([artist])
+        if i + 1 < len(artists):
+            await service.saoju.match_co_casts([artist, artists[i + 1]])
+    result["co_cast_s"] = time.perf_counter() - started
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    result["stages"] = list(timer.rows())
+    return result
+
+
+def _print_cycle(result: Dict):
+    events = result["events"]
+    eps = events / result["hlq_s"] if result["hlq_s"] else 0.0
+    qpe = result["hlq_queries"] / events if events else 0.0
+    print(f"\nCycle {result['cycle']}: Hulaquan {events} events in {result['hlq_s']:.2f}s "
+          f"({eps:.1f} events/s, {qpe:.1f} queries/event, {result['updates']} updates); "
+          f"Saoju days {result['saoju_s']:.2f}s ({result['saoju_queries']} queries); "
+          f"co-cast {result['co_cast_s']:.2f}s; peak RSS {result['peak_rss_mb']:.0f} MB")
+    print(f"  {'stage':<22} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'total s':>9}")
+    for stage, count, p50, p99, total in result["stages"]:
+        print(f"  {stage:<22} {count:>7} {p50:>9.1f} {p99:>9.1f} {total:>9.2f}")
+
+
+async def main_async(args) -> int:
+    # Imported here: HLQ_DB_PATH / HLQ_CRAWL_RECORD_DIR must be set before services.config loads
+    # 在设置好环境变量后再导入 services
+    import services.saoju.service as saoju_module
+    from services.crawler.advanced_client import close_all_clients
+    from services.crawler.recorder import http_recorder
+    from services.db.init import init_db
+    from services.db.profiler import profiler
+    from services.hulaquan.service import HulaquanService
+    from services.saoju.service import SaojuService
+    from services.system.http_clients import http_clients
+
+    servers = {}
+    if args.replay:
+        from replay_server import start_replay
+
+        servers = await start_replay(args.replay, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+        hlq_host = urlparse(HulaquanService.BASE_URL).netloc
+        saoju_host = urlparse(SaojuService.API_HOST).netloc
+        missing = [h for h in (hlq_host, saoju_host) if h not in servers]
+        if missing:
+            print(f"No recordings for {', '.join(missing)} under {args.replay}")
+            for server in servers.values():
+                await server.stop()
+            return 1
+        HulaquanService.BASE_URL = servers[hlq_host].base_url
+        SaojuService.API_HOST = servers[saoju_host].base_url
+        SaojuService.API_BASE = f"{SaojuService.API_HOST}/yyj/api"
+    else:
+        http_recorder.enable(args.record)
+        print(f"Recording live responses into {args.record} (this hits the real APIs)")
+
+    init_db()
+    profiler.enabled = True
+
+    service = HulaquanService()
+    timer = StageTimer()
+    timer.wrap(service, "_fetch_json", "hlq.fetch")
+    timer.wrap(service, "_sync_event_details", "hlq.event")
+    timer.wrap(service, "_run_read", "hlq.read")
+    timer.wrap(service, "_enrich_ticket_data_async", "hlq.enrich")
+    timer.wrap(service, "_save_synced_data_sync", "hlq.write")
+    timer.wrap(service.saoju, "_fetch_json", "saoju.fetch")
+    timer.wrap(service.saoju, "match_co_casts", "co_cast.match")
+    timer.wrap(saoju_module, "apply_show_changes", "saoju.cdc_write")
+
+    # The service grows its recommendation page size after clean cycles, but a replay only has the page
+    # sizes that were recorded: keep every cycle (record and replay) at the configured size
+    # 服务在顺利的周期后会增大推荐列表分页，而回放只有录制过的分页大小：每轮固定为配置的初始大小
+    page_size = service._page_size
+
+    failed = False
+    try:
+        for cycle in range(1, args.cycles + 1):
+            service._page_size = page_size
+            _print_cycle(await run_cycle(cycle, service, timer, profiler, args))
+    except Exception as e:
+        print(f"Cycle failed: {type(e).__name__}: {e}")
+        failed = True
+    finally:
+        await close_all_clients()
+        await http_clients.close()
+        for host, server in servers.items():
+            stats = server.stats()
+            print(f"\nReplay {host}: {stats['hits']} hits, {stats['misses']} misses "
+                  f"(date shift {stats['date_shift_days']}d)")
+            for key, count in sorted(server.misses.items(), key=lambda kv: -kv[1])[:10]:
+                print(f"  MISS x{count} {key}")
+            await server.stop()
+        if args.record:
+            print(f"\nRecorded {http_recorder.recorded} responses into {args.record}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline sync pipeline benchmark (record / replay)")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--record", metavar="DIR", help="Run one live cycle and record every response into DIR")
+    mode.add_argument("--replay", metavar="DIR", help="Replay recordings from DIR on local servers")
+    parser.add_argument("--cycles", type=int, default=None, help="Sync cycles to run (default: 3 replay / 1 record)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Replay latency per response")
+    parser.add_argument("--jitter-ms", type=float, default=25.0, help="Replay latency jitter (uniform ±)")
+    parser.add_argument("--days", type=int, default=120, help="Saoju sync_future_days window (0..days)")
+    parser.add_argument("--force", action="store_true", help="Re-fetch and re-diff every Saoju day each cycle")
+    parser.add_argument("--co-cast-artists", type=int, default=20, help="Artists used for match_co_casts")
+    parser.add_argument("--db", help="Scratch DB path (default: a temp file, deleted afterwards)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    if args.cycles is None:
+        args.cycles = 1 if args.record else 3
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    tmp_dir = None
+    if args.db:
+        db_path = args.db
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix="hlq-bench-")
+        db_path = os.path.join(tmp_dir, "bench.db")
+    os.environ["HLQ_DB_PATH"] = db_path
+    print(f"Scratch DB: {db_path}")
+
+    try:
+        return asyncio.run(main_async(args))
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
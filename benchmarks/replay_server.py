@@ -0,0 +1,151 @@
+"""
+Replay server: serves responses recorded by services/crawler/recorder.py from a local aiohttp server.
+回放服务器：在本地 aiohttp 服务器上按请求 key 回放 recorder 录制的响应。
+
+Usage:
+    HLQ_CRAWL_RECORD_DIR=benchmarks/recordings python benchmarks/bench_sync_pipeline.py --record   # live, once
+    python benchmarks/replay_server.py benchmarks/recordings --latency-ms 80 --jitter-ms 40
+
+One local server per recorded host (each on its own port). Requests are looked up by the same
+``request_key`` the recorder used; unknown requests get a 404 and are counted as misses.
+每个录制的主机一个本地端口；未录制的请求返回 404 并计为 miss。
+
+Date-windowed syncs (search_day?date=...) ask for dates relative to "today". ``date_shift_days``
+(default: days since the recording was made) moves every ``YYYY-MM-DD`` query value back by that many
+days before the lookup, so a recording made last week still answers this week's requests.
+按天同步的请求以“今天”为基准，回放时将查询参数中的日期按录制至今的天数平移后再查找。
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+sys.path.append(os.getcwd())
+
+from aiohttp import web
+
+from services.crawler.recorder import load_index, recorded_hosts, request_key
+
+_DATE_VALUE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ReplayServer:
+    def __init__(self, host: str, host_dir: str, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 date_shift_days: Optional[int] = None):
+        self.host = host
+        self.host_dir = host_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.entries = load_index(host_dir)
+        if date_shift_days is None:
+            recorded = min((e["recorded_at"][:10] for e in self.entries.values()), default=None)
+            date_shift_days = (date.today() - date.fromisoformat(recorded)).days if recorded else 0
+        self.date_shift_days = date_shift_days
+        self.hits = 0
+        self.misses: Dict[str, int] = {}
+        self._bodies: Dict[str, bytes] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    def _shift(self, value: str) -> str:
+        if not self.date_shift_days or not _DATE_VALUE.match(value):
+            return value
+        try:
+            shifted = datetime.strptime(value, "%Y-%m-%d") - timedelta(days=self.date_shift_days)
+        except ValueError:
+            return value
+        return shifted.strftime("%Y-%m-%d")
+
+    def _body(self, entry: Dict) -> bytes:
+        # Bodies are read once and kept in memory so disk I/O doesn't show up in the benchmark
+        # 响应体首次读取后缓存在内存，避免磁盘 I/O 影响测量
+        body = self._bodies.get(entry["file"])
+        if body is None:
+            with open(os.path.join(self.host_dir, entry["file"]), "rb") as f:
+                body = f.read()
+            self._bodies[entry["file"]] = body
+        return body
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        params = {k: self._shift(v) for k, v in request.query.items()}
+        key = request_key(request.method, request.path, params)
+        if self.latency_ms or self.jitter_ms:
+            delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+            await asyncio.sleep(delay / 1000)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses[key] = self.misses.get(key, 0) + 1
+            return web.Response(status=404, text=f"not recorded: {key}")
+        self.hits += 1
+        return web.Response(status=entry["status"], body=self._body(entry), content_type="application/json")
+
+    async def start(self, port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def stats(self) -> Dict:
+        return {
+            "recorded": len(self.entries),
+            "hits": self.hits,
+            "misses": sum(self.misses.values()),
+            "date_shift_days": self.date_shift_days,
+        }
+
+
+async def start_replay(record_dir: str, **kwargs) -> Dict[str, ReplayServer]:
+    """Start one ReplayServer per host recorded under ``record_dir``; returns host -> server."""
+    servers = {}
+    for host, host_dir in recorded_hosts(record_dir):
+        server = ReplayServer(host, host_dir, **kwargs)
+        await server.start()
+        servers[host] = server
+    return servers
+
+
+async def main_async(args):
+    servers = await start_replay(args.record_dir, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                 date_shift_days=args.date_shift_days)
+    if not servers:
+        print(f"No recordings under {args.record_dir}")
+        return 1
+    for host, server in servers.items():
+        print(f"{host:<28} -> {server.base_url}  ({len(server.entries)} responses, "
+              f"date shift {server.date_shift_days}d)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for server in servers.values():
+            await server.stop()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded crawler responses")
+    parser.add_argument("record_dir")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--date-shift-days", type=int, default=None,
+                        help="Days to move YYYY-MM-DD query values back (default: days since recording)")
+    try:
+        return asyncio.run(main_async(parser.parse_args()))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,8 @@ from __future__ import annotations
 import logging
 from typing import Mapping, MutableMapping, Optional
 
+from services.system.metrics import metrics
+
 log = logging.getLogger(__name__)
 
 MetricLabels = Optional[Mapping[str, str]]
@@ -12,13 +14,15 @@ MetricLabels = Optional[Mapping[str, str]]
 def emit(metric_name: str, value: float = 1.0, labels: MetricLabels = None) -> None:
     """输出一个数值型指标。
 
-    当前实现只写结构化日志；待持久化链路就绪后，可以替换成数据库写入
-    或 push-gateway 客户端，而无需修改调用端。
+    按计数器累加到进程内指标注册表（services/system/metrics.py），随 ``/metrics``
+    导出并定期批量写入 ``Metric`` 表；结构化日志降为 DEBUG。
     """
-    payload: MutableMapping[str, object] = {"metric": metric_name, "value": value}
-    if labels:
-        payload["labels"] = dict(labels)
-    log.info("METRIC %s", payload)
+    metrics.inc(metric_name, value, labels)
+    if log.isEnabledFor(logging.DEBUG):
+        payload: MutableMapping[str, object] = {"metric": metric_name, "value": value}
+        if labels:
+            payload["labels"] = dict(labels)
+        log.debug("METRIC %s", payload)
 
 
 __all__ = ["emit", "MetricLabels"]
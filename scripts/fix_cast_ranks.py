@@ -7,6 +7,8 @@ import os
 sys.path.append(os.getcwd())
 
 from services.saoju.service import SaojuService
+from services.crawler.advanced_client import close_all_clients
+from services.system.http_clients import http_clients
 from services.db.connection import session_scope
 from services.hulaquan.tables import HulaquanEvent, TicketCastAssociation, HulaquanTicket
 from sqlmodel import select
@@ -23,6 +25,8 @@ async def main():
     if not role_orders:
         print("❌ Failed to load role_orders from Saoju data. Aborting.")
         await saoju.close()
+        await close_all_clients()
+        await http_clients.close()
         return
 
     print(f"✅ Loaded role orders for {len(role_orders)} musicals.")
@@ -79,6 +83,8 @@ async def main():
         print("✅ Fix Complete.")
 
     await saoju.close()
+    await close_all_clients()
+    await http_clients.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
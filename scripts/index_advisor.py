@@ -0,0 +1,198 @@
+"""
+Index advisor: run EXPLAIN QUERY PLAN over the registered hot queries and flag full table scans.
+索引顾问：对已登记的热点查询执行 EXPLAIN QUERY PLAN，标记全表扫描。
+
+Usage:
+    python scripts/index_advisor.py                 # check data/musicalbot.db
+    python scripts/index_advisor.py --db path.db --fix   # also create missing indexes
+    python scripts/index_advisor.py --schema-only   # fresh temp DB built from the models (CI / pre-commit)
+
+Exit code is 1 when a hot query does a full scan (or sorts with a temp B-tree) it is not allowed to.
+When a query changes shape or a new hot path appears, add it to HOT_QUERIES below.
+查询结构变化或新增热点路径时，在 HOT_QUERIES 中登记。
+"""
+import argparse
+import os
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, FrozenSet, List
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import or_
+from sqlmodel import col, func, select
+
+from services.db.init import init_db
+from services.db.migrations import ensure_indexes
+from services.db.models import SendQueue, SendQueueStatus, UserAuthMethod
+from services.hulaquan.tables import (
+    HulaquanAlias,
+    HulaquanCast,
+    HulaquanTicket,
+    SaojuShow,
+    TicketCastAssociation,
+    TicketUpdateLog,
+)
+
+_NOW = datetime(2026, 1, 1, 19, 30)
+
+
+@dataclass
+class HotQuery:
+    name: str
+    source: str  # where the real query lives
+    build: Callable
+    # Tables this query is allowed to scan (e.g. tiny lookup tables)
+    allow_scan: FrozenSet[str] = field(default_factory=frozenset)
+
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery(
+        "events_by_date",
+        "HulaquanService._get_events_by_date_query",
+        lambda: select(HulaquanTicket).where(
+            HulaquanTicket.session_time >= _NOW.replace(hour=0, minute=0),
+            HulaquanTicket.session_time < _NOW.replace(hour=0, minute=0) + timedelta(days=1),
+        ),
+    ),
+    HotQuery(
+        "recent_updates_seed",
+        "HulaquanService._seed_recent_updates_query",
+        lambda: select(TicketUpdateLog, HulaquanTicket).outerjoin(
+            HulaquanTicket, TicketUpdateLog.ticket_id == HulaquanTicket.id
+        ).where(
+            TicketUpdateLog.change_type == "new",
+            or_(TicketUpdateLog.session_time >= _NOW, TicketUpdateLog.session_time == None),  # noqa: E711
+        ).order_by(col(TicketUpdateLog.created_at).desc()).limit(100),
+    ),
+    HotQuery(
+        "send_queue_consume",
+        "NotificationEngine._get_pending_items",
+        lambda: select(SendQueue).where(
+            SendQueue.status == SendQueueStatus.PENDING,
+            (SendQueue.next_retry_at.is_(None)) | (SendQueue.next_retry_at <= _NOW),
+        ).order_by(SendQueue.created_at).limit(50),
+    ),
+    HotQuery(
+        "send_queue_dedupe",
+        "NotificationEngine (ref_id duplicate check)",
+        lambda: select(SendQueue).where(
+            SendQueue.user_id == "000001",
+            SendQueue.ref_id == "000001_1_new_202601011930",
+            SendQueue.status.in_([SendQueueStatus.PENDING, SendQueueStatus.SENT]),
+        ),
+    ),
+    HotQuery(
+        "resolve_user_id",
+        "BotHandler.resolve_user_id",
+        lambda: select(UserAuthMethod).where(
+            UserAuthMethod.provider == "qq",
+            UserAuthMethod.provider_user_id == "10001",
+        ),
+    ),
+    HotQuery(
+        "saoju_day_city",
+        "SaojuService._search_show_db_sync",
+        lambda: select(SaojuShow).where(SaojuShow.date == _NOW, SaojuShow.city == "上海"),
+    ),
+    HotQuery(
+        "saoju_session_span",
+        "session_match.load_session_index",
+        lambda: select(SaojuShow.date, SaojuShow.musical_name, SaojuShow.city).where(
+            SaojuShow.date >= _NOW,
+            SaojuShow.date < _NOW + timedelta(days=30),
+            or_(col(SaojuShow.musical_name).contains("时光", autoescape=True),
+                func.instr("时光代理人", SaojuShow.musical_name) > 0),
+        ),
+    ),
+    HotQuery(
+        "co_cast_tickets",
+        "HulaquanService._search_co_casts_query",
+        lambda: select(TicketCastAssociation.ticket_id).join(HulaquanCast).where(HulaquanCast.name == "丁辰西"),
+    ),
+    HotQuery(
+        "alias_lookup",
+        "HulaquanService._get_event_id_by_name_query",
+        lambda: select(HulaquanAlias).where(HulaquanAlias.alias == "连璧"),
+    ),
+]
+
+
+def _is_full_scan(detail: str) -> bool:
+    # "SCAN t" (no index) vs "SCAN t USING [COVERING] INDEX ..." / "SEARCH t USING ..."
+    return detail.startswith("SCAN ") and " USING " not in detail
+
+
+def _scanned_table(detail: str) -> str:
+    return detail.split()[1]
+
+
+def explain(conn, stmt) -> List[str]:
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    # SQLite plans with placeholders, so bound values don't change the plan
+    # SQLite 基于占位符生成查询计划，参数取值不影响结果
+    params = (None,) * len(compiled.positiontup or ())
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[3] for row in rows]
+
+
+def run(engine) -> int:
+    problems = 0
+    with engine.connect() as conn:
+        for query in HOT_QUERIES:
+            plan = explain(conn, query.build())
+            issues = []
+            for detail in plan:
+                if _is_full_scan(detail) and _scanned_table(detail) not in query.allow_scan:
+                    issues.append(f"full scan: {detail}")
+                elif "USE TEMP B-TREE" in detail:
+                    issues.append(f"sort without index: {detail}")
+
+            status = "❌" if issues else "✅"
+            print(f"{status} {query.name}  ({query.source})")
+            for detail in plan:
+                print(f"      {detail}")
+            for issue in issues:
+                print(f"   !! {issue}")
+            problems += len(issues)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN advisor for hot queries")
+    parser.add_argument("--db", help="SQLite database path (default: data/musicalbot.db)")
+    parser.add_argument("--schema-only", action="store_true", help="Check a fresh temp DB built from the models")
+    parser.add_argument("--fix", action="store_true", help="Create indexes declared on the models but missing in the DB")
+    parser.add_argument("--analyze", action="store_true", help="Run ANALYZE before explaining")
+    args = parser.parse_args()
+
+    if args.schema_only:
+        tmp_dir = tempfile.mkdtemp(prefix="index_advisor_")
+        engine = init_db(os.path.join(tmp_dir, "schema.db"))
+    else:
+        from services.db.connection import get_engine
+        engine = get_engine(args.db)
+        if args.fix:
+            with engine.begin() as conn:
+                created = ensure_indexes(conn)
+            print(f">>> Created {len(created)} missing index(es): {', '.join(created) or '-'}")
+        if args.analyze:
+            # Refresh sqlite_stat1 so the planner (and this report) use real row counts
+            # 刷新 sqlite_stat1，让查询规划器使用真实统计信息
+            with engine.begin() as conn:
+                conn.exec_driver_sql("ANALYZE")
+
+    print("🔍 Index advisor")
+    problems = run(engine)
+    if problems:
+        print(f"\n❌ {problems} plan issue(s) found. Add an index on the model (see services/hulaquan/tables.py) "
+              f"and run with --fix / restart to apply.")
+        sys.exit(1)
+    print("\n✅ All hot queries use indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Apply versioned schema migrations (services/db/migrations.py).
+执行版本化的数据库结构迁移。
+
+Usage:
+    python scripts/migrate.py --status
+    python scripts/migrate.py                     # apply all pending
+    python scripts/migrate.py --to 3 --batch-size 500
+
+Backfills are batched and resumable: if interrupted, re-running continues from the stored cursor.
+回填分批执行且可续跑：中断后重新运行会从记录的游标继续。
+"""
+import argparse
+import logging
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlmodel import SQLModel
+
+from services.db.connection import get_engine
+from services.db.migrations import MIGRATIONS, get_schema_version, migrate, pending_migrations
+from services.db.models import *  # noqa: F401,F403
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned schema migrations")
+    parser.add_argument("--db", help="SQLite database path (default: data/musicalbot.db)")
+    parser.add_argument("--status", action="store_true", help="Show current version and pending migrations")
+    parser.add_argument("--to", type=int, help="Stop after this version")
+    parser.add_argument("--batch-size", type=int, help="Override backfill batch size")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    # New tables come from create_all; migrations only alter existing ones
+    # 新表由 create_all 创建，迁移只修改已有表
+    SQLModel.metadata.create_all(get_engine(args.db))
+
+    current = get_schema_version(args.db)
+    pending = pending_migrations(args.db, args.to)
+    print(f">>> Schema version: {current} (latest {max(m.version for m in MIGRATIONS)})")
+    for m in pending:
+        print(f"    pending: {m.version:04d}_{m.name} ({len(m.steps)} steps, {len(m.backfills)} backfills)")
+
+    if args.status:
+        return
+    if not pending:
+        print(">>> Nothing to apply.")
+        return
+
+    applied = migrate(args.db, target=args.to, batch_size=args.batch_size)
+    print(f">>> Applied: {', '.join(str(v) for v in applied)}. Schema version: {get_schema_version(args.db)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,8 @@ def migrate():
         # Check table name in definition? Defaults to class name lowercase.
         try:
             session.exec(text("DROP TABLE IF EXISTS saojushow"))
+            # Day fingerprints describe the dropped rows; drop them too so the next sync refetches everything
+            session.exec(text("DROP TABLE IF EXISTS saojudayfingerprint"))
             session.commit()
             print("Table dropped.")
         except Exception as e:
@@ -12,6 +12,8 @@ sys.path.append(os.getcwd())
 
 from services.hulaquan.service import HulaquanService
 from services.saoju.service import SaojuService
+from services.crawler.advanced_client import close_all_clients
+from services.system.http_clients import http_clients
 from services.db.connection import get_engine
 from sqlmodel import Session, select
 from services.hulaquan.tables import HulaquanTicket, TicketCastAssociation, HulaquanEvent, SaojuShow
@@ -62,9 +64,9 @@ async def perform_reset(dry_run: bool = False):
             if not dry_run:
                 # Sync logic is idempotent but we just wiped the table, so it's a full fetch
                 # Sync Past
-                await saoju.sync_future_days(start_days=start_history, end_days=-1)
+                await saoju.sync_future_days(start_days=start_history, end_days=-1, force=True)
                 # Sync Future
-                await saoju.sync_future_days(start_days=0, end_days=end_future)
+                await saoju.sync_future_days(start_days=0, end_days=end_future, force=True)
             else:
                 log.info(f"Step 2: [DRY RUN] Would sync days from {start_history} to {end_future}.")
 
@@ -144,6 +146,9 @@ async def perform_reset(dry_run: bool = False):
         log.error(f"Reset failed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await close_all_clients()
+        await http_clients.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Global Data Reset & Sync")
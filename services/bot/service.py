@@ -79,3 +79,8 @@ class BotService:
                 
         await self.notifier.stop()
         await self.hlq_service.close()
+
+        from services.crawler.advanced_client import close_all_clients
+        from services.system.http_clients import http_clients
+        await close_all_clients()
+        await http_clients.close()
@@ -8,6 +8,8 @@ import logging
 import aiohttp
 from typing import Optional
 
+from services.system.http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 # Cloudflare Turnstile 验证端点
@@ -47,24 +49,24 @@ async def verify_turnstile(token: str, remote_ip: Optional[str] = None) -> bool:
         if remote_ip:
             data["remoteip"] = remote_ip
         
-        # 发送验证请求
-        async with aiohttp.ClientSession() as session:
-            async with session.post(TURNSTILE_VERIFY_URL, data=data, timeout=5) as resp:
-                if resp.status != 200:
-                    logger.error(f"❌ [Turnstile] API请求失败: {resp.status}")
-                    return False
-                
-                result = await resp.json()
-                
-                # 验证成功
-                if result.get("success"):
-                    logger.info(f"✅ [Turnstile] 验证通过 (IP: {remote_ip or 'unknown'})")
-                    return True
-                else:
-                    # 验证失败,记录错误码
-                    error_codes = result.get("error-codes", [])
-                    logger.warning(f"❌ [Turnstile] 验证失败: {error_codes}")
-                    return False
+        # 发送验证请求(复用进程级共享连接, 省去每次验证的 TLS 握手)
+        session = http_clients.session_for(TURNSTILE_VERIFY_URL)
+        async with session.post(TURNSTILE_VERIFY_URL, data=data, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+            if resp.status != 200:
+                logger.error(f"❌ [Turnstile] API请求失败: {resp.status}")
+                return False
+            
+            result = await resp.json()
+            
+            # 验证成功
+            if result.get("success"):
+                logger.info(f"✅ [Turnstile] 验证通过 (IP: {remote_ip or 'unknown'})")
+                return True
+            else:
+                # 验证失败,记录错误码
+                error_codes = result.get("error-codes", [])
+                logger.warning(f"❌ [Turnstile] 验证失败: {error_codes}")
+                return False
                     
     except aiohttp.ClientError as e:
         logger.error(f"❌ [Turnstile] 网络请求异常: {e}")
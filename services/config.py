@@ -15,6 +15,56 @@ class ServiceConfig(BaseSettings):
     
     # 数据库路径覆盖（可选）
     DB_PATH: Optional[str] = None
+
+    # SQL 查询分析（services/db/profiler.py）：默认关闭，开启后记录指纹统计、慢查询与 N+1
+    DB_PROFILE: bool = False
+    DB_SLOW_QUERY_MS: float = 200.0
+    DB_N_PLUS_ONE_THRESHOLD: int = 10
+
+    # 外部接口爬取预算（services/crawler/crawl_executor.py）：每个主机的并发上限与令牌桶速率
+    CRAWL_MAX_CONCURRENCY_PER_HOST: int = 10
+    CRAWL_RATE_PER_HOST: float = 20.0
+    CRAWL_BURST_PER_HOST: float = 20.0
+
+    # 进程级 HTTP 连接器（services/system/http_clients.py）：每主机连接上限、keep-alive 空闲保持时间、DNS 缓存
+    HTTP_LIMIT_PER_HOST: int = 30
+    HTTP_KEEPALIVE_TIMEOUT: float = 60.0
+    HTTP_DNS_CACHE_TTL: int = 300
+
+    # 爬虫后台流量（services/crawler/advanced_client.py）：按 IP 的健康探测（每 30 秒）、连接池预热与空闲 HEAD 心跳；
+    # 这些请求不经过爬取预算与上游熔断，默认关闭
+    CRAWL_BACKGROUND_PROBES: bool = False
+
+    # 爬虫响应 JSON 解码后端（services/crawler/json_codec.py）：auto / orjson / msgspec / json
+    JSON_BACKEND: str = "auto"
+
+    # 录制爬虫响应（services/crawler/recorder.py）：设置目录后 AdvancedCrawlerClient 的每个响应都写入磁盘，供 benchmarks/ 回放
+    CRAWL_RECORD_DIR: Optional[str] = None
+
+    # 上游熔断（services/system/network_health.py）：连续失败阈值、熔断时长（秒）、熔断期间后台探测间隔与超时
+    UPSTREAM_FAILURE_THRESHOLD: int = 3
+    UPSTREAM_OPEN_SECONDS: int = 300
+    UPSTREAM_PROBE_INTERVAL: float = 30.0
+    UPSTREAM_PROBE_TIMEOUT: float = 5.0
+
+    # 呼啦圈推荐列表分页抓取（services/hulaquan/service.py）：最多取多少个事件、初始分页大小、最小分页大小
+    # （分页大小为最小值的整数倍，按服务端是否接受自适应增减）
+    RECOMMEND_MAX_EVENTS: int = 95
+    RECOMMEND_PAGE_SIZE: int = 30
+    RECOMMEND_PAGE_SIZE_MIN: int = 10
+
+    # 指标（services/system/metrics.py）：写入 Metric 表的间隔（秒，0 为不写库）、保留天数、/metrics 访问令牌（未设置时 /metrics 返回 404）
+    METRICS_FLUSH_INTERVAL: float = 60.0
+    METRICS_RETENTION_DAYS: int = 7
+    METRICS_TOKEN: Optional[str] = None
+
+    # 数据库线程池（services/db/executor.py）：异步代码中同步数据库操作专用的线程数
+    DB_EXECUTOR_WORKERS: int = 4
+
+    # 事件循环延迟监控（services/system/loop_monitor.py）：采样间隔（秒）、告警阈值（毫秒，0 为关闭）；
+    # 循环被阻塞超过阈值时记录告警及事件循环线程当前的调用栈
+    LOOP_LAG_INTERVAL: float = 0.5
+    LOOP_LAG_THRESHOLD_MS: float = 100.0
     
     class Config:
         env_file = ".env"
@@ -14,15 +14,35 @@
 import asyncio
 import aiohttp
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlparse
 import logging
 
 from .smart_retry import SmartRetryManager, RetryConfig, RetryStrategy
 from .connection_pool import SmartConnectionPool
-from .health_prober import ServerHealthProber
+from .health_prober import ServerHealthProber, HealthAwareResolver
+from .crawl_executor import CrawlExecutor
+from .recorder import http_recorder
+from services.system.http_clients import http_clients
+from services.system.metrics import gauges_from, metrics
+from services.system.network_health import CircuitBreaker, CircuitOpenError
 
 log = logging.getLogger(__name__)
 
+# 可重试的网络错误(连接失败/断开/超时); 其他异常直接抛出不重试
+RETRYABLE_ERRORS = (aiohttp.ClientConnectionError, ConnectionResetError, asyncio.TimeoutError)
+# 通常表示限流或上游暂时不可用的状态码
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class RetryableStatusError(Exception):
+    """响应状态码属于 retry_statuses(如 429/503),触发重试"""
+    
+    def __init__(self, status: int, body: bytes):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.body = body
+
 
 class AdvancedCrawlerClient:
     """高级爬虫客户端"""
@@ -31,40 +51,69 @@ class AdvancedCrawlerClient:
         self,
         base_url: str,
         enable_connection_pool: bool = True,
-        enable_health_probe: bool = True,
+        enable_health_probe: bool = False,
+        enable_keepalive_probes: bool = False,
         enable_smart_retry: bool = True,
         pool_size: int = 5,
         max_retries: int = 10,
         user_agent: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        ssl: Optional[bool] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        retry_config: Optional[RetryConfig] = None,
+        retry_strategy: RetryStrategy = RetryStrategy.LUCKY_USER,
+        retry_statuses: Tuple[int, ...] = (),
+        executor: Optional[CrawlExecutor] = None,
+        breaker: Optional[CircuitBreaker] = None,
     ):
         """
         Args:
             base_url: 基础URL(如 https://example.com)
             enable_connection_pool: 是否启用连接池
-            enable_health_probe: 是否启用健康探测
+            enable_health_probe: 是否启用健康探测(每 30 秒探测目标域名解析出的每个 IP)
+            enable_keepalive_probes: 是否启用连接池预热与空闲心跳
+                (探测/预热/心跳都是不经过 executor 与 breaker 的后台流量, 默认关闭)
             enable_smart_retry: 是否启用智能重试
             pool_size: 连接池大小
             max_retries: 最大重试次数
             user_agent: 自定义User-Agent
+            headers: 每个请求附带的默认Headers
+            ssl: 传给连接器的 ssl 参数(False 表示不校验证书)
+            timeout: 请求超时配置
+            retry_config: 自定义重试配置(默认按 max_retries 生成)
+            retry_strategy: 重试延迟策略
+            retry_statuses: 需要重试的响应状态码(如 429/503)
+            executor: 爬取执行器,每次尝试占用一个并发名额与一个令牌
+            breaker: 上游熔断器; 熔断期间直接抛出 CircuitOpenError, 不发请求也不再重试
         """
         self.base_url = base_url.rstrip('/')
         self.enable_connection_pool = enable_connection_pool
         self.enable_health_probe = enable_health_probe
+        self.enable_keepalive_probes = enable_keepalive_probes
         self.enable_smart_retry = enable_smart_retry
         
         # 提取域名
-        from urllib.parse import urlparse
         parsed = urlparse(base_url)
-        self.domain = parsed.netloc
+        self.domain = parsed.hostname or parsed.netloc
         
         # 组件
         self.connection_pool: Optional[SmartConnectionPool] = None
         self.health_prober: Optional[ServerHealthProber] = None
         self.retry_manager: Optional[SmartRetryManager] = None
+        self._init_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
         # 配置
         self.pool_size = pool_size
-        self.max_retries = max_retries
+        self.max_retries = retry_config.max_retries if retry_config else max_retries
+        self.retry_config = retry_config
+        self.retry_strategy = retry_strategy
+        self.retry_statuses = tuple(retry_statuses)
+        self.executor = executor
+        self.breaker = breaker
+        self.headers = dict(headers or {})
+        self.ssl = ssl
+        self.timeout = timeout
         self.user_agent = user_agent or (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
             "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -80,30 +129,45 @@ class AdvancedCrawlerClient:
         }
     
     async def initialize(self):
-        """初始化客户端"""
+        """初始化客户端(可重复调用; 并发调用只初始化一次)"""
+        if self._init_task is None:
+            self._loop = asyncio.get_running_loop()
+            self._init_task = asyncio.ensure_future(self._initialize())
+        await asyncio.shield(self._init_task)
+    
+    async def _initialize(self):
         log.info(f"初始化高级爬虫客户端: {self.base_url}")
         
+        # 初始化健康探测(先于连接池: 连接池通过它的解析器优先连接健康节点)
+        resolver = None
+        if self.enable_health_probe:
+            self.health_prober = ServerHealthProber(
+                target_domain=self.domain,
+                probe_interval=30.0,
+            )
+            await self.health_prober.start()
+            resolver = HealthAwareResolver(self.health_prober)
+            log.info("✅ 健康探测已启用")
+        
         # 初始化连接池
         if self.enable_connection_pool:
             self.connection_pool = SmartConnectionPool(
                 target_url=self.base_url,
                 pool_size=self.pool_size,
+                ssl=self.ssl,
+                timeout=self.timeout,
+                resolver=resolver,
+                # DNS 缓存与探测周期一致, 节点健康变化能及时反映到连接顺序
+                ttl_dns_cache=30 if resolver else None,
+                warm_up=self.enable_keepalive_probes,
+                heartbeat=self.enable_keepalive_probes,
             )
             await self.connection_pool.initialize()
             log.info("✅ 连接池已启用")
         
-        # 初始化健康探测
-        if self.enable_health_probe:
-            self.health_prober = ServerHealthProber(
-                target_domain=self.domain,
-                probe_interval=30.0,
-            )
-            await self.health_prober.start()
-            log.info("✅ 健康探测已启用")
-        
         # 初始化重试管理器
         if self.enable_smart_retry:
-            retry_config = RetryConfig(
+            retry_config = self.retry_config or RetryConfig(
                 max_retries=self.max_retries,
                 base_delay=1.0,
                 max_delay=30.0,
@@ -125,6 +189,8 @@ class AdvancedCrawlerClient:
         if self.health_prober:
             await self.health_prober.stop()
         
+        self._init_task = None
+        
         # 输出最终统计
         log.info(f"📊 最终统计: {self.get_stats()}")
     
@@ -145,65 +211,112 @@ class AdvancedCrawlerClient:
         Returns:
             响应文本
         """
-        url = f"{self.base_url}{path}"
+        _, body = await self.fetch_bytes(path, method=method, **kwargs)
+        return body.decode("utf-8", errors="replace")
+    
+    async def fetch_bytes(
+        self,
+        path: str,
+        method: str = "GET",
+        **kwargs
+    ) -> Tuple[int, bytes]:
+        """
+        抓取数据, 返回 (状态码, 响应体)
+        
+        网络错误与 retry_statuses 中的状态码按重试策略重试; 重试耗尽后网络错误抛出最后一次的异常,
+        状态码则正常返回。
+        配置了 breaker 时, 重试耗尽的网络错误与 5xx 计为一次上游失败; 熔断期间抛出 CircuitOpenError。
         
-        # 准备请求
+        Args:
+            path: 路径(如 /api/data)或完整URL
+            method: HTTP方法
+            **kwargs: 传递给request的参数(params/headers 等)
+        """
+        await self.initialize()
+        url = path if path.startswith(("http://", "https://")) else f"{self.base_url}{path}"
+        
+        # 准备请求(每次尝试前检查熔断器: 其他并发请求已触发熔断时不再继续重试)
         async def _do_request():
+            if self.breaker is not None and not self.breaker.allow():
+                raise CircuitOpenError(self.breaker.name, self.breaker.retry_after)
             return await self._execute_request(method, url, **kwargs)
         
-        # 使用智能重试
-        if self.enable_smart_retry and self.retry_manager:
-            def on_retry(attempt, exception):
-                self.stats["retries_count"] += 1
-                log.debug(f"重试 {attempt}/{self.max_retries}: {exception}")
-            
-            result = await self.retry_manager.retry_with_strategy(
-                _do_request,
-                strategy=RetryStrategy.LUCKY_USER,
-                on_retry=on_retry,
-            )
-        else:
-            result = await _do_request()
+        try:
+            # 使用智能重试
+            if self.enable_smart_retry and self.retry_manager:
+                def on_retry(attempt, exception):
+                    self.stats["retries_count"] += 1
+                    log.debug(f"重试 {attempt}/{self.max_retries}: {exception}")
+                
+                status, body = await self.retry_manager.retry_with_strategy(
+                    _do_request,
+                    strategy=self.retry_strategy,
+                    on_retry=on_retry,
+                    retry_on=RETRYABLE_ERRORS + (RetryableStatusError,),
+                )
+            else:
+                status, body = await _do_request()
+        except RetryableStatusError as e:
+            status, body = e.status, e.body
+        except RETRYABLE_ERRORS:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
         
-        return result
+        if self.breaker is not None:
+            if status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        
+        # 录制模式(HLQ_CRAWL_RECORD_DIR): 保存最终响应供 benchmarks/ 离线回放
+        if http_recorder.enabled:
+            await http_recorder.record(method, url, kwargs.get("params"), status, body)
+        return status, body
     
     async def _execute_request(
         self,
         method: str,
         url: str,
         **kwargs
-    ) -> str:
+    ) -> Tuple[int, bytes]:
         """执行单次请求"""
         self.stats["total_requests"] += 1
         
         # 设置Headers
-        headers = kwargs.get('headers', {})
+        headers = {**self.headers, **kwargs.pop('headers', {})}
         headers.setdefault('User-Agent', self.user_agent)
         kwargs['headers'] = headers
         
-        # 选择最佳节点(如果启用健康探测)
-        target_ip = None
-        if self.enable_health_probe and self.health_prober:
-            best_node = self.health_prober.get_best_node()
-            if best_node:
-                target_ip = best_node.ip
-                log.debug(f"使用最佳节点: {target_ip} (健康分{best_node.health_score:.1f})")
+        try:
+            if self.executor is not None:
+                async with self.executor.request(url) as req:
+                    status, body = await self._send(method, url, **kwargs)
+                    req.ok = status < 400
+            else:
+                status, body = await self._send(method, url, **kwargs)
+        except Exception:
+            self.stats["failed_requests"] += 1
+            raise
         
-        # 使用连接池发送请求
+        if status in self.retry_statuses:
+            self.stats["failed_requests"] += 1
+            raise RetryableStatusError(status, body)
+        self.stats["successful_requests"] += 1
+        return status, body
+    
+    async def _send(self, method: str, url: str, **kwargs) -> Tuple[int, bytes]:
+        # 使用连接池发送请求(节点选择由连接池的 HealthAwareResolver 完成)
         if self.enable_connection_pool and self.connection_pool:
             async with await self.connection_pool.request(method, url, **kwargs) as resp:
-                text = await resp.text()
-                self.stats["successful_requests"] += 1
-                return text
+                return resp.status, await resp.read()
         
-        # 降级: 普通请求
-        else:
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.request(method, url, **kwargs) as resp:
-                    text = await resp.text()
-                    self.stats["successful_requests"] += 1
-                    return text
+        # 降级: 进程级注册表的共享 Session(同样复用 keep-alive 连接)
+        session = http_clients.session_for(url, ssl=self.ssl)
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
+        async with session.request(method, url, **kwargs) as resp:
+            return resp.status, await resp.read()
     
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
@@ -232,6 +345,50 @@ class AdvancedCrawlerClient:
         return result
 
 
+# 全局客户端管理: 每个主机一个共享客户端
+_clients: Dict[str, AdvancedCrawlerClient] = {}
+
+
+async def get_client(base_url: str, **kwargs) -> AdvancedCrawlerClient:
+    """
+    获取或创建某个主机的共享客户端(首次调用的参数生效)
+    
+    同一进程内的所有调用方共用连接池与健康探测; 事件循环变化时(脚本多次 asyncio.run)重新创建。
+    """
+    key = base_url.rstrip('/')
+    client = _clients.get(key)
+    loop = asyncio.get_running_loop()
+    if client is None or (client._loop is not None and client._loop is not loop):
+        client = AdvancedCrawlerClient(base_url, **kwargs)
+        _clients[key] = client
+    await client.initialize()
+    return client
+
+
+def _collect_client_metrics():
+    # Client / SmartRetryManager / SmartConnectionPool statistics per host
+    # 每个主机的客户端、重试管理器、连接池统计
+    for client in list(_clients.values()):
+        labels = {"host": client.domain}
+        stats = client.get_stats()
+        yield from gauges_from("crawler_client", stats, labels)
+        yield from gauges_from("crawler_retry", stats.get("retry_manager", {}), labels)
+        yield from gauges_from("crawler_pool", stats.get("connection_pool", {}), labels)
+
+
+metrics.register_collector(_collect_client_metrics)
+
+
+async def close_all_clients():
+    """关闭所有共享客户端"""
+    for client in list(_clients.values()):
+        try:
+            await client.close()
+        except Exception as e:
+            log.warning(f"关闭客户端失败 {client.base_url}: {e}")
+    _clients.clear()
+
+
 # 便捷函数
 async def fetch_with_advanced_client(
     url: str,
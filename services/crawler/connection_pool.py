@@ -11,15 +11,22 @@
 
 import asyncio
 import aiohttp
+from aiohttp.abc import AbstractResolver
 import time
 from typing import Optional, Dict, List, Set
 from dataclasses import dataclass, field
 from collections import defaultdict
 import logging
 
+from services.system.http_clients import http_clients
+
 log = logging.getLogger(__name__)
 
 
+class PoolExhaustedError(aiohttp.ClientConnectionError):
+    """连接池没有可用的 Session(全部连续失败); 属于连接错误, 会被重试并计入上游熔断"""
+
+
 @dataclass
 class ConnectionStats:
     """连接统计信息"""
@@ -71,6 +78,12 @@ class SmartConnectionPool:
         conn_ttl: float = 300.0,  # 连接存活时间(秒)
         health_check_interval: float = 30.0,
         keep_alive_timeout: float = 60.0,
+        ssl: Optional[bool] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        resolver: Optional[AbstractResolver] = None,
+        ttl_dns_cache: Optional[int] = None,
+        warm_up: bool = False,
+        heartbeat: bool = False,
     ):
         """
         Args:
@@ -80,6 +93,13 @@ class SmartConnectionPool:
             conn_ttl: 连接最大存活时间
             health_check_interval: 健康检查间隔
             keep_alive_timeout: Keep-Alive 超时时间
+            ssl: 传给 TCPConnector 的 ssl 参数(False 表示不校验证书)
+            timeout: 请求超时配置(默认 total=30)
+            resolver: 自定义 DNS 解析器(如 HealthAwareResolver)
+            ttl_dns_cache: DNS 缓存时间(秒, 默认使用注册表配置)
+            warm_up: 初始化时向 target_url 并发发送 pool_size 个 GET 预热连接
+            heartbeat: 健康检查时向空闲 Session 发送 HEAD 心跳
+                (两者都是对上游的后台流量, 不经过爬取执行器的速率预算和熔断器, 默认关闭)
         """
         self.target_url = target_url
         self.pool_size = pool_size
@@ -87,8 +107,15 @@ class SmartConnectionPool:
         self.conn_ttl = conn_ttl
         self.health_check_interval = health_check_interval
         self.keep_alive_timeout = keep_alive_timeout
+        self.ssl = ssl
+        self.timeout = timeout
+        self.resolver = resolver
+        self.ttl_dns_cache = ttl_dns_cache
+        self.warm_up = warm_up
+        self.heartbeat = heartbeat
         
         # 连接池
+        self._connector: Optional[aiohttp.TCPConnector] = None
         self._sessions: List[aiohttp.ClientSession] = []
         self._session_stats: Dict[int, ConnectionStats] = {}
         
@@ -104,27 +131,29 @@ class SmartConnectionPool:
         
         log.info(f"初始化连接池,大小={self.pool_size}")
         
-        # 创建连接器配置
-        connector = aiohttp.TCPConnector(
+        # 使用进程级注册表中该主机的共享连接器(长连接复用、DNS缓存), 由注册表在进程退出时关闭
+        self._connector = http_clients.connector_for(
+            self.target_url,
+            ssl=self.ssl,
+            resolver=self.resolver,
             limit=self.pool_size,
-            limit_per_host=self.pool_size,
-            ttl_dns_cache=300,  # DNS缓存5分钟
-            force_close=False,  # 重要: 启用连接复用
-            enable_cleanup_closed=True,
+            dns_cache_ttl=self.ttl_dns_cache,
         )
         
         # 超时配置
-        timeout = aiohttp.ClientTimeout(
+        timeout = self.timeout or aiohttp.ClientTimeout(
             total=30,
             connect=10,
             sock_connect=5,
             sock_read=20
         )
         
-        # 预热连接池
         for i in range(self.pool_size):
+            # 所有 Session 共用注册表的连接器(connector_owner=False),
+            # 否则关闭任意一个 Session 都会关掉整个连接器
             session = aiohttp.ClientSession(
-                connector=connector,
+                connector=self._connector,
+                connector_owner=False,
                 timeout=timeout,
                 headers={
                     'Connection': 'keep-alive',  # 关键: Keep-Alive
@@ -134,16 +163,10 @@ class SmartConnectionPool:
             
             self._sessions.append(session)
             self._session_stats[id(session)] = ConnectionStats()
-            
-            # 建立初始连接(预热)
-            try:
-                async with session.get(self.target_url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-                    await resp.text()
-                    self._session_stats[id(session)].record_success(1.0)
-                    log.debug(f"连接池 {i+1}/{self.pool_size} 预热成功")
-            except Exception as e:
-                log.warning(f"连接池 {i+1} 预热失败: {e}")
-                self._session_stats[id(session)].record_failure()
+        
+        # 并发预热: 同时发出请求才会真正建立 pool_size 条连接(串行只会复用同一条)
+        if self.warm_up:
+            await asyncio.gather(*(self._warm_up(i, session) for i, session in enumerate(self._sessions)))
         
         self._initialized = True
         
@@ -151,6 +174,17 @@ class SmartConnectionPool:
         self._health_check_task = asyncio.create_task(self._health_check_loop())
         log.info("连接池初始化完成")
     
+    async def _warm_up(self, i: int, session: aiohttp.ClientSession):
+        """建立初始连接(预热)"""
+        try:
+            async with session.get(self.target_url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                await resp.read()
+                self._session_stats[id(session)].record_success(1.0)
+                log.debug(f"连接池 {i+1}/{self.pool_size} 预热成功")
+        except Exception as e:
+            log.warning(f"连接池 {i+1} 预热失败: {e}")
+            self._session_stats[id(session)].record_failure()
+    
     async def close(self):
         """关闭连接池"""
         log.info("关闭连接池")
@@ -172,6 +206,7 @@ class SmartConnectionPool:
         
         self._sessions.clear()
         self._session_stats.clear()
+        self._connector = None  # 共享连接器由 http_clients 关闭
         self._initialized = False
     
     async def get_healthy_session(self) -> Optional[aiohttp.ClientSession]:
@@ -187,12 +222,13 @@ class SmartConnectionPool:
             await self.initialize()
         
         async with self._lock:
+            self._recycle_expired()
+            
             # 筛选健康的Session
             healthy_sessions = [
                 (session, self._session_stats[id(session)])
                 for session in self._sessions
                 if self._session_stats[id(session)].is_healthy
-                and self._session_stats[id(session)].requests_count < self.max_requests_per_conn
             ]
             
             if not healthy_sessions:
@@ -224,6 +260,22 @@ class SmartConnectionPool:
             # 返回最优的Session
             return healthy_sessions[0][0]
     
+    def _recycle_expired(self):
+        """
+        回收达到请求上限或存活时间的 Session: 重置其统计, 重新参与调度
+        (底层连接由共享连接器管理, 过期的 keep-alive 连接会被连接器自行清理)
+        """
+        current_time = time.time()
+        for session in self._sessions:
+            stats = self._session_stats[id(session)]
+            if (stats.requests_count >= self.max_requests_per_conn
+                    or current_time - stats.created_at > self.conn_ttl):
+                fresh = ConnectionStats()
+                fresh.avg_response_time = stats.avg_response_time
+                fresh.is_healthy = stats.is_healthy
+                fresh.consecutive_failures = stats.consecutive_failures
+                self._session_stats[id(session)] = fresh
+    
     async def request(
         self,
         method: str,
@@ -244,7 +296,7 @@ class SmartConnectionPool:
         session = await self.get_healthy_session()
         
         if not session:
-            raise Exception("连接池无可用连接")
+            raise PoolExhaustedError("连接池无可用连接")
         
         stats = self._session_stats[id(session)]
         start_time = time.time()
@@ -280,18 +332,15 @@ class SmartConnectionPool:
         """执行健康检查"""
         log.debug("执行连接池健康检查...")
         
+        async with self._lock:
+            self._recycle_expired()
         current_time = time.time()
         
         for session in self._sessions:
             stats = self._session_stats[id(session)]
             
-            # 检查是否超过TTL
-            if current_time - stats.created_at > self.conn_ttl:
-                log.info(f"连接{id(session)}超过TTL,重建...")
-                # TODO: 重建连接
-            
             # 检查是否长时间未使用
-            if current_time - stats.last_used > self.keep_alive_timeout:
+            if self.heartbeat and current_time - stats.last_used > self.keep_alive_timeout:
                 log.debug(f"连接{id(session)}长时间未使用,发送心跳...")
                 # 发送心跳请求
                 try:
@@ -0,0 +1,256 @@
+"""
+爬取执行器 - 按主机限制并发与请求速率
+Crawl executor: per-host concurrency cap + token-bucket request budget.
+
+每个外部请求都经过 ``crawl_executor.request(url)``：先取得该主机的并发名额，再从令牌桶取令牌，
+因此无论调用方如何 gather，同一主机的在途请求数和每秒请求数都有上限。
+``crawl_executor.crawl(name)`` 标记一次爬取（如一次剧目同步），结束时记录请求数、失败数、
+限流等待时间与延迟直方图，最近的结果可通过 ``GET /api/admin/crawl/stats`` 查看。
+
+Every outbound request goes through ``crawl_executor.request(url)``, which holds one of the host's
+concurrency slots and spends one token from its bucket, so fan-out via ``asyncio.gather`` is safe.
+``crawl_executor.crawl(name)`` scopes one crawl (e.g. one musical sync); requests made inside it —
+including in tasks it gathers — are counted into that crawl's stats (ContextVar).
+
+用法 / Usage:
+    async with crawl_executor.crawl("saoju:musical:123"):
+        results = await asyncio.gather(*(fetch(x) for x in items))
+
+    async def fetch(x):
+        async with crawl_executor.request(url) as req:
+            ...
+            if bad_status:
+                req.ok = False
+"""
+
+import asyncio
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+
+from services.config import config
+from services.system.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+# Latency histogram bucket upper bounds (ms); the last bucket is open-ended
+# 延迟直方图各桶上界（毫秒），最后一个桶无上界
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+MAX_RECENT_CRAWLS = 50
+
+_ID_SEGMENT = re.compile(r"^\d+$")
+
+
+def endpoint_label(path: str) -> str:
+    """Metric label for a request path: numeric segments collapsed so IDs don't create new series.
+    请求路径的指标标签：数字段折叠为 {id}，避免按 ID 产生大量时间序列。
+    """
+    segments = [("{id}" if _ID_SEGMENT.match(s) else s) for s in path.split("/") if s]
+    return "/" + "/".join(segments)
+
+
+class TokenBucket:
+    """令牌桶：平均 ``rate`` 个请求/秒，最多突发 ``capacity`` 个"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the time waited (s)."""
+        waited = 0.0
+        # The lock keeps waiters in FIFO order / 加锁保证等待者按先后顺序取令牌
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= 1
+        return waited
+
+
+class CrawlStats:
+    """一次爬取（或执行器全局）的请求统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+        self.throttled_ms = 0.0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.by_host: Dict[str, int] = {}
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, host: str, latency_ms: float, waited_ms: float, ok: bool):
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        self.throttled_ms += waited_ms
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.by_host[host] = self.by_host.get(host, 0) + 1
+        self.histogram[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Approximate percentile: upper bound of the bucket containing it, capped at the max seen."""
+        if not self.requests:
+            return None
+        rank = p / 100 * self.requests
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank and count:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+                return round(min(bound, self.max_ms), 1)
+        return round(self.max_ms, 1)
+
+    def summary(self) -> Dict:
+        elapsed = (self.finished or time.time()) - self.started
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 3),
+            "avg_ms": round(self.total_ms / self.requests, 1) if self.requests else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": round(self.max_ms, 1),
+            "throttled_ms": round(self.throttled_ms, 1),
+            "by_host": dict(self.by_host),
+            "histogram": {label: count for label, count in zip(labels, self.histogram) if count},
+        }
+
+
+class _HostLimits:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_concurrency: int, rate: float, burst: float):
+        self.loop = loop
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+
+
+class _Request:
+    __slots__ = ("ok",)
+
+    def __init__(self):
+        self.ok = True
+
+
+_current_crawl: ContextVar[Optional[CrawlStats]] = ContextVar("crawl_executor_current", default=None)
+
+
+class CrawlExecutor:
+    """按主机的并发上限 + 令牌桶请求预算，并按爬取统计请求数与延迟"""
+
+    def __init__(self, max_concurrency: int = 10, rate: float = 20.0, burst: float = 20.0):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self._hosts: Dict[str, _HostLimits] = {}
+        self.totals = CrawlStats("total")
+        self.recent: deque = deque(maxlen=MAX_RECENT_CRAWLS)
+
+    def _limits(self, host: str) -> _HostLimits:
+        # asyncio primitives are bound to one loop; scripts calling asyncio.run() twice get fresh ones
+        # asyncio 原语绑定事件循环；脚本多次 asyncio.run() 时重新创建
+        loop = asyncio.get_running_loop()
+        limits = self._hosts.get(host)
+        if limits is None or limits.loop is not loop:
+            limits = _HostLimits(loop, self.max_concurrency, self.rate, self.burst)
+            self._hosts[host] = limits
+        return limits
+
+    @asynccontextmanager
+    async def request(self, url: str) -> AsyncIterator[_Request]:
+        """Hold a concurrency slot and one token for ``url``'s host while the body runs.
+        Set ``req.ok = False`` for failed responses; exceptions are counted as errors automatically.
+        """
+        parsed = urlparse(url)
+        host = parsed.netloc or url
+        limits = self._limits(host)
+        req = _Request()
+        async with limits.semaphore:
+            waited = await limits.bucket.acquire()
+            limits.in_flight += 1
+            started = time.perf_counter()
+            try:
+                yield req
+            except BaseException:
+                req.ok = False
+                raise
+            finally:
+                limits.in_flight -= 1
+                latency_ms = (time.perf_counter() - started) * 1000
+                self.totals.record(host, latency_ms, waited * 1000, req.ok)
+                crawl = _current_crawl.get()
+                if crawl is not None:
+                    crawl.record(host, latency_ms, waited * 1000, req.ok)
+                labels = {"host": host, "endpoint": endpoint_label(parsed.path)}
+                metrics.observe("http_request_duration_ms", latency_ms, labels)
+                metrics.inc("http_requests_total", labels={**labels, "outcome": "ok" if req.ok else "error"})
+                if waited:
+                    metrics.observe("http_throttle_wait_ms", waited * 1000, {"host": host})
+
+    @asynccontextmanager
+    async def crawl(self, name: str) -> AsyncIterator[CrawlStats]:
+        """Scope one crawl; its summary is logged and kept in ``recent`` when it ends."""
+        stats = CrawlStats(name)
+        token = _current_crawl.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_crawl.reset(token)
+            stats.finished = time.time()
+            summary = stats.summary()
+            self.recent.append(summary)
+            log.info(
+                f"Crawl '{name}': {summary['requests']} requests ({summary['errors']} failed) "
+                f"in {summary['elapsed_s']}s, p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms, "
+                f"throttled {summary['throttled_ms']}ms"
+            )
+
+    def get_stats(self) -> Dict:
+        return {
+            "limits": {"max_concurrency": self.max_concurrency, "rate": self.rate, "burst": self.burst},
+            "in_flight": {host: limits.in_flight for host, limits in self._hosts.items()},
+            "totals": self.totals.summary(),
+            "recent": list(reversed(self.recent)),
+        }
+
+    def reset(self):
+        self.totals = CrawlStats("total")
+        self.recent.clear()
+
+
+def _collect_in_flight():
+    for host, limits in list(crawl_executor._hosts.items()):
+        yield "http_in_flight", limits.in_flight, {"host": host}
+
+
+crawl_executor = CrawlExecutor(
+    max_concurrency=config.CRAWL_MAX_CONCURRENCY_PER_HOST,
+    rate=config.CRAWL_RATE_PER_HOST,
+    burst=config.CRAWL_BURST_PER_HOST,
+)
+metrics.register_collector(_collect_in_flight)
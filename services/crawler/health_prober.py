@@ -11,6 +11,8 @@
 
 import asyncio
 import aiohttp
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
 import time
 from typing import Dict, List, Optional, Set
 from dataclasses import dataclass, field
@@ -241,7 +243,7 @@ class ServerHealthProber:
         
         # 输出统计
         available = sum(1 for n in self.nodes.values() if n.is_available())
-        log.info(f"可用节点: {available}/{len(self.nodes)}")
+        log.debug(f"可用节点: {available}/{len(self.nodes)}")
     
     async def _probe_node(self, node: ServerNode):
         """探测单个节点"""
@@ -330,6 +332,40 @@ class ServerHealthProber:
         }
 
 
+class HealthAwareResolver(AbstractResolver):
+    """
+    健康感知的 DNS 解析器 - 让 aiohttp 连接优先选择健康节点
+    
+    aiohttp 按解析结果的顺序尝试建立连接。这里把探测器认为不可用的节点排到最后、
+    其余按优先级排序, 新解析出的 IP 也会加入探测器。仍使用域名连接, TLS/SNI 不受影响。
+    """
+    
+    def __init__(self, prober: ServerHealthProber, inner: Optional[AbstractResolver] = None):
+        self.prober = prober
+        self._inner = inner or DefaultResolver()
+    
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET):
+        results = await self._inner.resolve(host, port, family)
+        if host != self.prober.target_domain:
+            return results
+        
+        for info in results:
+            ip = info["host"]
+            if ip not in self.prober.nodes and len(self.prober.nodes) < self.prober.max_nodes:
+                self.prober.nodes[ip] = ServerNode(ip=ip, port=port or 443)
+        
+        def _rank(info):
+            node = self.prober.nodes.get(info["host"])
+            if node is None:
+                return (0, 0.0)
+            return (0 if node.is_available() else 1, -node.get_priority())
+        
+        return sorted(results, key=_rank)
+    
+    async def close(self):
+        await self._inner.close()
+
+
 # 全局探测器管理
 _probers: Dict[str, ServerHealthProber] = {}
 
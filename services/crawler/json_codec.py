@@ -0,0 +1,133 @@
+"""
+爬虫响应的 JSON 解码
+JSON decoding for crawler payloads.
+
+按可用性选择后端：orjson > msgspec > 标准库 json（可用 ``HLQ_JSON_BACKEND`` 指定）。
+UTF-8 BOM 直接在字节层面跳过，无需先解码成 str 再解析；只有字节不是合法 UTF-8 时
+才回退为 ``errors="ignore"`` 解码（与原 HulaquanService 行为一致）。
+
+``decode(body, schema)`` 在安装了 msgspec 时按 schema（services/crawler/schemas.py 中的 TypedDict）
+直接解码：只构建声明过的字段，其余字段在解析时跳过，不会先生成完整的中间 dict。
+未安装 msgspec 或 schema 不匹配时退回普通解码，返回的仍是 dict，调用方代码无需区分。
+
+Backend: orjson > msgspec > stdlib json, overridable with ``HLQ_JSON_BACKEND``. The BOM is skipped on
+the raw bytes. ``decode(body, schema)`` decodes straight into a TypedDict schema with msgspec when
+available (undeclared fields are skipped by the parser); otherwise it is a plain decode — callers get
+dicts either way.
+"""
+import json
+import logging
+from typing import Any, Dict, Optional, Union
+
+from services.config import config
+
+log = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional
+    msgspec = None
+
+UTF8_BOM = b"\xef\xbb\xbf"
+
+AVAILABLE_BACKENDS = ["json"] + (["msgspec"] if msgspec else []) + (["orjson"] if orjson else [])
+
+_backend = "json"
+_msgspec_decoders: Dict[Any, Any] = {}
+
+
+def set_backend(name: Optional[str] = None) -> str:
+    """Select the decoder backend ("auto"/None picks the fastest installed one). Returns the active name."""
+    global _backend
+    if not name or name == "auto":
+        name = "orjson" if orjson else ("msgspec" if msgspec else "json")
+    if name not in AVAILABLE_BACKENDS:
+        log.warning(f"JSON backend '{name}' is not installed, using {AVAILABLE_BACKENDS[-1]}")
+        name = AVAILABLE_BACKENDS[-1]
+    _backend = name
+    return _backend
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def _strip_bom(data: Union[bytes, str]) -> Union[bytes, str]:
+    if isinstance(data, str):
+        return data[1:] if data.startswith("﻿") else data
+    return data[3:] if data.startswith(UTF8_BOM) else data
+
+
+def _loads_fast(data: Union[bytes, str]) -> Any:
+    if _backend == "orjson":
+        return orjson.loads(data)
+    if _backend == "msgspec":
+        return msgspec.json.decode(data)
+    # json.loads(bytes) sniffs the encoding first; the bodies are always UTF-8
+    # json.loads 直接处理 bytes 会先探测编码，接口返回均为 UTF-8，直接解码更快
+    return json.loads(data.decode("utf-8") if isinstance(data, bytes) else data)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode a JSON body (bytes or str), skipping a UTF-8 BOM. Raises ValueError on invalid JSON."""
+    data = _strip_bom(data)
+    try:
+        return _loads_fast(data)
+    except ValueError as e:  # json.JSONDecodeError / orjson.JSONDecodeError / UnicodeDecodeError
+        if isinstance(data, str) or _is_utf8(data):
+            raise
+        # Not valid UTF-8: drop the bad bytes and try once more (legacy Hulaquan fallback)
+        # 非法 UTF-8：忽略坏字节后再试一次（沿用呼啦圈原有回退）
+        log.warning(f"JSON body is not valid UTF-8, ignoring bad bytes ({e})")
+        return json.loads(data.decode("utf-8", errors="ignore"))
+    except Exception as e:
+        # msgspec.DecodeError is not a ValueError / msgspec 的解码异常不是 ValueError
+        if msgspec is not None and isinstance(e, msgspec.DecodeError):
+            if isinstance(data, str) or _is_utf8(data):
+                raise ValueError(str(e)) from e
+            log.warning(f"JSON body is not valid UTF-8, ignoring bad bytes ({e})")
+            return json.loads(data.decode("utf-8", errors="ignore"))
+        raise
+
+
+def _is_utf8(data: bytes) -> bool:
+    try:
+        data.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _decoder_for(schema):
+    decoder = _msgspec_decoders.get(schema)
+    if decoder is None:
+        decoder = msgspec.json.Decoder(schema)
+        _msgspec_decoders[schema] = decoder
+    return decoder
+
+
+def decode(data: Union[bytes, str], schema=None) -> Any:
+    """Decode, building only the fields declared in ``schema`` when msgspec is installed.
+    安装 msgspec 时按 schema 只构建声明的字段；否则等同于 ``loads``。
+    """
+    if schema is None or msgspec is None:
+        return loads(data)
+    stripped = _strip_bom(data)
+    try:
+        return _decoder_for(schema).decode(stripped)
+    except msgspec.ValidationError as e:
+        # Payload drifted from the schema: keep working with the full dict
+        # 数据结构与 schema 不符：退回完整解码
+        log.debug(f"Schema {getattr(schema, '__name__', schema)} mismatch, falling back to full decode: {e}")
+        return loads(stripped)
+    except (msgspec.DecodeError, UnicodeDecodeError):
+        # Malformed / non-UTF-8 body: loads() applies the fallback or raises ValueError
+        return loads(stripped)
+
+
+set_backend(config.JSON_BACKEND)
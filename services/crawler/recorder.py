@@ -0,0 +1,123 @@
+"""
+爬虫响应录制
+Record crawler responses to disk for offline replay.
+
+设置 ``HLQ_CRAWL_RECORD_DIR``（或调用 ``http_recorder.enable(dir)``）后，经过 AdvancedCrawlerClient 的每个响应
+（getevent / getEventDetails / search_day / 扫剧目录等）按主机写入::
+
+    <dir>/<host>/<endpoint>__<hash>.json   原始响应体（含 BOM 等原样保存）
+    <dir>/<host>/index.jsonl               每行一条：请求 key、状态码、文件名、录制时间
+
+请求 key 为 ``METHOD path?sorted-query``，回放端（benchmarks/replay_server.py）用同一函数计算 key 查找响应。
+文件名以接口名开头，可直接作为 ``benchmarks/bench_json_decode.py --fixtures <dir>/<host>`` 的输入。
+
+Every response fetched through AdvancedCrawlerClient is stored as a raw body file plus one index line
+keyed by ``request_key``; benchmarks/replay_server.py serves them back by the same key.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from services.config import config
+
+log = logging.getLogger(__name__)
+
+INDEX_FILE = "index.jsonl"
+
+
+def request_key(method: str, url: str, params: Optional[Dict] = None) -> str:
+    """``METHOD path?query`` with query parameters (URL + ``params``) sorted, so equal requests share a key."""
+    parsed = urlparse(url)
+    query = parse_qsl(parsed.query, keep_blank_values=True)
+    if params:
+        query.extend((str(k), str(v)) for k, v in params.items())
+    return f"{method.upper()} {parsed.path or '/'}?{urlencode(sorted(query))}"
+
+
+def fixture_name(key: str) -> str:
+    """``getEventDetails__1a2b3c4d5e.json``: endpoint name (for humans / bench_json_decode) + key hash."""
+    path = key.split(" ", 1)[-1].split("?", 1)[0]
+    segments = [s for s in path.split("/") if s]
+    endpoint = (segments[-1] if segments else "root").replace(".html", "")
+    return f"{endpoint}__{hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]}.json"
+
+
+def load_index(host_dir: str) -> Dict[str, Dict]:
+    """key -> index entry for one host directory (later recordings of the same key win)."""
+    entries: Dict[str, Dict] = {}
+    path = os.path.join(host_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                entries[entry["key"]] = entry
+    return entries
+
+
+def recorded_hosts(directory: str) -> Iterable[Tuple[str, str]]:
+    """(host, host_dir) for every host recorded under ``directory``."""
+    for name in sorted(os.listdir(directory)):
+        host_dir = os.path.join(directory, name)
+        if os.path.isfile(os.path.join(host_dir, INDEX_FILE)):
+            yield name, host_dir
+
+
+class HttpRecorder:
+    """把响应写入录制目录（仅在启用时生效）"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def enable(self, directory: str):
+        self.directory = directory
+
+    def disable(self):
+        self.directory = None
+
+    def _write(self, host: str, key: str, status: int, body: bytes):
+        host_dir = os.path.join(self.directory, host)
+        os.makedirs(host_dir, exist_ok=True)
+        name = fixture_name(key)
+        with open(os.path.join(host_dir, name), "wb") as f:
+            f.write(body)
+        entry = {
+            "key": key,
+            "status": status,
+            "file": name,
+            "size": len(body),
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock, open(os.path.join(host_dir, INDEX_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    async def record(self, method: str, url: str, params: Optional[Dict], status: int, body: bytes):
+        if not self.enabled:
+            return
+        parsed = urlparse(url)
+        host = parsed.netloc or "unknown"
+        key = request_key(method, url, params)
+        try:
+            # Catalogue bodies are several MB; keep the disk write off the event loop
+            # 目录类响应有数 MB，写盘放到线程池
+            await asyncio.get_running_loop().run_in_executor(None, self._write, host, key, status, body)
+            self.recorded += 1
+        except Exception as e:
+            log.warning(f"Failed to record {key}: {e}")
+
+
+http_recorder = HttpRecorder(config.CRAWL_RECORD_DIR)
@@ -0,0 +1,71 @@
+"""
+爬虫响应的类型化 schema（供 json_codec.decode 使用）
+Typed schemas for crawler payloads, used by ``json_codec.decode``.
+
+只声明同步代码实际读取的字段：安装 msgspec 时未声明的字段在解析阶段直接跳过。
+字段类型多为 Any —— 上游接口会把数字写成字符串（或反过来），转换仍由原有代码完成。
+全部为 ``total=False`` 的 TypedDict，解码结果仍是 dict，消费端的 ``.get()`` 写法无需修改。
+
+Only fields the sync code reads are declared; with msgspec installed the rest are skipped by the
+parser. Types are mostly Any because the upstream APIs mix strings and numbers.
+"""
+from typing import Any, List, TypedDict
+
+
+# --- Hulaquan: /site/getevent.html?filter=recommendation ---
+
+class EventBasicRef(TypedDict, total=False):
+    id: Any
+
+
+class RecommendedEvent(TypedDict, total=False):
+    timeMark: Any
+    basic_info: EventBasicRef
+
+
+class RecommendationPage(TypedDict, total=False):
+    events: List[RecommendedEvent]
+
+
+# --- Hulaquan: /event/getEventDetails.html ---
+
+class EventBasicInfo(TypedDict, total=False):
+    title: Any
+    location: Any
+    start_time: Any
+    end_time: Any
+
+
+class TicketDetail(TypedDict, total=False):
+    id: Any
+    title: Any
+    total_ticket: Any
+    left_ticket_count: Any
+    ticket_price: Any
+    status: Any
+    start_time: Any
+    valid_from: Any
+
+
+class EventDetails(TypedDict, total=False):
+    basic_info: EventBasicInfo
+    ticket_details: List[TicketDetail]
+
+
+# --- Saoju: /yyj/api/search_day/ ---
+
+class SaojuCastEntry(TypedDict, total=False):
+    artist: Any
+    role: Any
+
+
+class SaojuDayShow(TypedDict, total=False):
+    musical: Any
+    time: Any
+    city: Any
+    theatre: Any
+    cast: List[SaojuCastEntry]
+
+
+class SaojuDayShows(TypedDict, total=False):
+    show_list: List[SaojuDayShow]
@@ -12,7 +12,7 @@
 import asyncio
 import random
 import time
-from typing import Optional, Callable, Any, Dict
+from typing import Optional, Callable, Any, Dict, Tuple, Type
 from dataclasses import dataclass
 from enum import Enum
 import logging
@@ -158,6 +158,7 @@ class SmartRetryManager:
         *args,
         strategy: RetryStrategy = RetryStrategy.LUCKY_USER,
         on_retry: Optional[Callable[[int, Exception], None]] = None,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
         **kwargs
     ) -> Any:
         """
@@ -167,6 +168,7 @@ class SmartRetryManager:
             func: 要执行的异步函数
             strategy: 重试策略
             on_retry: 重试时的回调函数(attempt, exception)
+            retry_on: 只重试这些异常类型,其他异常直接抛出
         
         Returns:
             函数执行结果
@@ -195,6 +197,8 @@ class SmartRetryManager:
                 return result
             
             except Exception as e:
+                if not isinstance(e, retry_on):
+                    raise
                 last_exception = e
                 consecutive_failures += 1
                 self._record_failure()
@@ -1,56 +1,260 @@
 """Database engine/session helpers for SQLModel.
 SQLModel 的数据库引擎/会话帮助程序。
+
+Two engines per database file:
+每个数据库文件对应两个引擎：
+
+- Writer (``get_engine``): one steady pooled connection shared by the write paths, plus a small
+  overflow for concurrent / nested sessions and request-scoped ``Session(get_engine())``
+  dependencies. Concurrent writers are serialized by SQLite itself: the transaction begins at the
+  first write statement and waits on ``busy_timeout`` for the write lock. There is deliberately no
+  process-wide Python lock, which would block the event loop whenever a coroutine opened a write
+  session while a sync transaction was running in a worker thread; async code runs its write
+  sessions on ``services.db.executor.db_executor`` instead. A session whose transaction is opened
+  by some other statement (e.g. DML on a TEMP table) and then reads main tables before writing must
+  start with ``BEGIN IMMEDIATE``: upgrading that read snapshot after another connection committed
+  fails with SQLITE_BUSY at once, without waiting (see ``services/saoju/show_cdc.py``).
+  写引擎：常驻单连接（另有少量溢出连接供并发/嵌套会话使用）；并发写由 SQLite 写锁与 busy_timeout 串行化，
+  不使用进程级 Python 锁（否则协程中打开写会话会在同步事务期间阻塞整个事件循环）。
+- Reader (``get_read_engine`` / ``session_scope(readonly=True)``): a pool of ``query_only``
+  connections with a large page cache and mmap. In WAL mode readers never wait for the writer.
+  读引擎：只读连接池（query_only、大缓存、mmap），WAL 模式下读不会被写阻塞。
 """
 
 from __future__ import annotations
 
+import threading
+import time
 from contextlib import contextmanager
 from functools import lru_cache
 from pathlib import Path
-from typing import Iterator, Optional
+from typing import Dict, Iterator, Optional, Tuple
 
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
 from sqlmodel import Session, create_engine
 
+from services.config import config
+from services.system.metrics import gauges_from, metrics as process_metrics
+
+from .profiler import profiler
+
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
-DEFAULT_DB_PATH = PROJECT_ROOT / "data" / "musicalbot.db"
+# HLQ_DB_PATH points the whole process at another file (e.g. a scratch DB for benchmarks)
+# HLQ_DB_PATH 可将整个进程指向其他数据库文件（如基准测试用的临时库）
+DEFAULT_DB_PATH = Path(config.DB_PATH) if config.DB_PATH else PROJECT_ROOT / "data" / "musicalbot.db"
+
+# Writer: 1 steady connection (+ overflow for concurrent / nested / request-scoped sessions, which
+# then wait on SQLite's write lock up to WRITER_BUSY_TIMEOUT_MS)
+# 写引擎：1 个常驻连接（溢出连接供并发、嵌套和请求级会话使用，写入时在 SQLite 写锁上最多等待 busy_timeout）
+WRITER_POOL_SIZE = 1
+WRITER_MAX_OVERFLOW = 4
+WRITER_BUSY_TIMEOUT_MS = 30000
+# Checkpoint every ~4MB of WAL (1000 pages * 4KB) instead of letting it grow during long syncs
+# 每约 4MB WAL（1000 页）做一次检查点，避免长同步期间 WAL 持续膨胀
+WRITER_WAL_AUTOCHECKPOINT = 1000
 
+# Reader pool
+# 读连接池
+READER_POOL_SIZE = 8
+READER_MAX_OVERFLOW = 8
+READER_BUSY_TIMEOUT_MS = 5000
+READER_CACHE_SIZE_KIB = 64 * 1024  # negative cache_size is KiB => 64MB per connection
+READER_MMAP_SIZE = 256 * 1024 * 1024
+
+POOL_TIMEOUT_SECONDS = 60
 
 def _ensure_parent(path: Path) -> Path:
     path.parent.mkdir(parents=True, exist_ok=True)
     return path
 
 
-def _create_engine(db_path: Path, *, echo: bool = False):
+class PoolMetrics:
+    """Checkout/wait counters for one engine's pool (exposed via get_pool_metrics)."""
+
+    def __init__(self, role: str):
+        self.role = role
+        self.checkouts = 0
+        self.connects = 0
+        self.max_checkout_wait_ms = 0.0
+        self.total_checkout_wait_ms = 0.0
+        self.max_hold_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, wait_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_checkout_wait_ms += wait_ms
+            self.max_checkout_wait_ms = max(self.max_checkout_wait_ms, wait_ms)
+
+    def record_hold(self, hold_ms: float):
+        with self._lock:
+            self.max_hold_ms = max(self.max_hold_ms, hold_ms)
+
+    def as_dict(self) -> Dict:
+        return {
+            "role": self.role,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "avg_checkout_wait_ms": round(self.total_checkout_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "max_checkout_wait_ms": round(self.max_checkout_wait_ms, 3),
+            "max_hold_ms": round(self.max_hold_ms, 3),
+        }
+
+
+# (role, db path) -> (engine, metrics)
+_engines: Dict[Tuple[str, str], Tuple[object, PoolMetrics]] = {}
+
+
+def _timed_pool_class(metrics: PoolMetrics):
+    """QueuePool subclass recording how long callers wait for a connection."""
+
+    class TimedQueuePool(QueuePool):
+        def _do_get(self):
+            started = time.perf_counter()
+            conn = super()._do_get()
+            wait_ms = (time.perf_counter() - started) * 1000
+            metrics.record_wait(wait_ms)
+            process_metrics.observe("db_checkout_wait_ms", wait_ms, {"role": metrics.role})
+            return conn
+
+    return TimedQueuePool
+
+
+def _create_engine(db_path: Path, *, echo: bool = False, readonly: bool = False):
     url = f"sqlite:///{db_path}"
+    role = "read" if readonly else "write"
+    metrics = PoolMetrics(role)
     engine = create_engine(
         url,
         echo=echo,
-        connect_args={"check_same_thread": False, "timeout": 60},
+        connect_args={"check_same_thread": False, "timeout": POOL_TIMEOUT_SECONDS},
+        poolclass=_timed_pool_class(metrics),
+        pool_size=READER_POOL_SIZE if readonly else WRITER_POOL_SIZE,
+        max_overflow=READER_MAX_OVERFLOW if readonly else WRITER_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT_SECONDS,
     )
-    # 确保 WAL 模式和外键约束开启
-    with engine.begin() as conn:
-        conn.exec_driver_sql("PRAGMA journal_mode=WAL;")
-        conn.exec_driver_sql("PRAGMA synchronous=NORMAL;")
-        conn.exec_driver_sql("PRAGMA foreign_keys = ON;")
+    _engines[(role, str(db_path))] = (engine, metrics)
+    profiler.install(engine)
+
+    # Pragmas are per-connection, so apply them on every new DBAPI connection
+    # PRAGMA 是连接级的，必须在每个新连接上设置
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, conn_record):
+        metrics.connects += 1
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute("PRAGMA foreign_keys = ON;")
+            if readonly:
+                cursor.execute(f"PRAGMA busy_timeout = {READER_BUSY_TIMEOUT_MS};")
+                cursor.execute(f"PRAGMA cache_size = -{READER_CACHE_SIZE_KIB};")
+                cursor.execute(f"PRAGMA mmap_size = {READER_MMAP_SIZE};")
+                cursor.execute("PRAGMA temp_store = MEMORY;")
+                cursor.execute("PRAGMA query_only = ON;")
+            else:
+                # 确保 WAL 模式
+                cursor.execute("PRAGMA journal_mode=WAL;")
+                cursor.execute("PRAGMA synchronous=NORMAL;")
+                cursor.execute(f"PRAGMA busy_timeout = {WRITER_BUSY_TIMEOUT_MS};")
+                cursor.execute(f"PRAGMA wal_autocheckpoint = {WRITER_WAL_AUTOCHECKPOINT};")
+                cursor.execute("PRAGMA temp_store = MEMORY;")
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        conn_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, conn_record):
+        started = conn_record.info.pop("checked_out_at", None)
+        if started is not None:
+            hold_ms = (time.perf_counter() - started) * 1000
+            metrics.record_hold(hold_ms)
+            process_metrics.observe("db_connection_hold_ms", hold_ms, {"role": role})
+
+    if not readonly:
+        # Open one connection now so WAL is in place before any reader connects
+        # 立即建立一个连接，确保读连接建立前 WAL 已启用
+        with engine.connect():
+            pass
     return engine
 
 
-@lru_cache(maxsize=1)
+def _resolve_path(db_path: Optional[str]) -> Path:
+    return Path(db_path) if db_path else DEFAULT_DB_PATH
+
+
+@lru_cache(maxsize=4)
+def _writer_engine(path: Path, echo: bool):
+    return _create_engine(_ensure_parent(path), echo=echo)
+
+
+@lru_cache(maxsize=4)
+def _reader_engine(path: Path):
+    # Make sure the writer (and therefore WAL + the database file) exists first
+    # 先确保写引擎（及 WAL 模式、数据库文件）已创建
+    _writer_engine(path, False)
+    return _create_engine(path, readonly=True)
+
+
 def get_engine(db_path: Optional[str] = None, *, echo: Optional[bool] = None):
-    path = Path(db_path) if db_path else DEFAULT_DB_PATH
-    echo_flag = echo if echo is not None else False
-    return _create_engine(_ensure_parent(path), echo=echo_flag)
+    """Writer engine (also used by create_all / migrations)."""
+    return _writer_engine(_resolve_path(db_path), bool(echo))
+
+
+def get_read_engine(db_path: Optional[str] = None):
+    """Read-only engine backing ``session_scope(readonly=True)``."""
+    return _reader_engine(_resolve_path(db_path))
+
+
+def get_pool_metrics() -> Dict[str, Dict]:
+    """Pool status + checkout/wait counters for every engine created in this process.
+    返回当前进程内所有引擎的连接池状态与等待统计。
+    """
+    result = {}
+    for (role, path), (engine, metrics) in _engines.items():
+        pool = engine.pool
+        result[f"{role}:{Path(path).name}"] = {
+            **metrics.as_dict(),
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checked_in": pool.checkedin(),
+        }
+    return result
+
+
+def _collect_pool_metrics():
+    for name, stats in get_pool_metrics().items():
+        yield from gauges_from("db_pool", stats, {"pool": name})
+
+
+process_metrics.register_collector(_collect_pool_metrics)
 
 
 @contextmanager
-def session_scope(db_path: Optional[str] = None) -> Iterator[Session]:
+def session_scope(db_path: Optional[str] = None, *, readonly: bool = False) -> Iterator[Session]:
+    """Transactional session. ``readonly=True`` uses the reader pool and never commits.
+    事务会话；``readonly=True`` 使用只读连接池且不提交。
+    """
+    if readonly:
+        session = Session(get_read_engine(db_path), autoflush=False)
+        try:
+            with profiler.track_scope("session_scope(readonly)"):
+                yield session
+        finally:
+            session.close()
+        return
+
     engine = get_engine(db_path)
-    session = Session(engine)
-    try:
-        yield session
-        session.commit()
-    except Exception:
-        session.rollback()
-        raise
-    finally:
-        session.close()
+    with profiler.track_scope("session_scope"):
+        session = Session(engine)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
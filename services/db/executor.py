@@ -0,0 +1,93 @@
+"""Dedicated thread pool for blocking database work called from async code.
+异步代码中阻塞数据库操作专用的线程池。
+
+``session_scope()`` is synchronous: running it inside a coroutine blocks the event loop (and every
+web request) for the whole query. Async call sites hand the sync function to ``db_executor.run``
+instead. The pool is separate from the loop's default executor, so DB work neither queues behind
+nor starves other ``run_in_executor(None, ...)`` / ``asyncio.to_thread`` users, and its size
+(``HLQ_DB_EXECUTOR_WORKERS``) bounds how many threads hold reader connections at once.
+``session_scope()`` 是同步的，在协程中直接调用会阻塞事件循环；异步调用方改用 ``db_executor.run``。
+该线程池独立于默认线程池，线程数上限同时约束了同时占用数据库连接的线程数。
+
+Queue wait and run time are exported as ``db_executor_wait_ms`` / ``db_executor_run_ms`` (label ``fn``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from services.config import config
+from services.system.metrics import gauges_from, metrics
+
+T = TypeVar("T")
+
+
+class DbExecutor:
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.active = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Created lazily so importing this module never starts threads
+        # 延迟创建，仅导入模块时不启动线程
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._pool
+
+    def _call(self, fn: Callable[..., T], queued_at: float, label: str) -> T:
+        started = time.perf_counter()
+        metrics.observe("db_executor_wait_ms", (started - queued_at) * 1000, {"fn": label})
+        with self._lock:
+            self.active += 1
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.active -= 1
+            metrics.observe("db_executor_run_ms", (time.perf_counter() - started) * 1000, {"fn": label})
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn(*args, **kwargs)`` on the DB pool and await its result.
+        在数据库线程池中执行 ``fn`` 并等待结果。
+        """
+        label = getattr(fn, "__name__", type(fn).__name__)
+        with self._lock:
+            self.submitted += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor(), self._call, partial(fn, *args, **kwargs), time.perf_counter(), label
+        )
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def get_stats(self) -> Dict:
+        pool = self._pool
+        return {
+            "max_workers": self.max_workers,
+            "threads": len(pool._threads) if pool else 0,
+            "active": self.active,
+            # Work items not yet picked up by a thread / 尚未被线程取走的任务数
+            "queued": pool._work_queue.qsize() if pool else 0,
+            "submitted": self.submitted,
+        }
+
+    def collect_metrics(self):
+        yield from gauges_from("db_executor", self.get_stats())
+
+
+db_executor = DbExecutor(config.DB_EXECUTOR_WORKERS)
+metrics.register_collector(db_executor.collect_metrics)
@@ -7,10 +7,14 @@ from typing import Optional
 from sqlmodel import SQLModel
 
 from .connection import get_engine
+from .migrations import migrate
 from .models import *  # noqa: F401,F403
 
 
 def init_db(db_path: Optional[str] = None):
     engine = get_engine(db_path)
     SQLModel.metadata.create_all(engine)
+    # Bring existing databases up to date (no-op on fresh ones, see services/db/migrations.py)
+    # 升级已有数据库结构（新库为空操作）
+    migrate(db_path)
     return engine
@@ -0,0 +1,261 @@
+"""Versioned schema migrations.
+版本化的数据库结构迁移。
+
+Each ``Migration`` has fast DDL ``steps`` (run in one short write transaction) and optional
+``Backfill``s. Backfills walk the table in rowid ranges, one short transaction per batch, and store
+their cursor in ``InternalMetadata`` in the same transaction as the UPDATE. Live writers (the sync
+loop, the bot process) interleave between batches, and an interrupted backfill resumes where it
+stopped. The applied version is stored under ``schema_version``.
+每个迁移包含快速的 DDL 步骤和可选的分批回填。回填按 rowid 区间分批执行，每批一个短事务，
+游标与 UPDATE 在同一事务中写入 InternalMetadata，因此线上写入可在批次之间穿插，中断后可续跑。
+
+DDL steps must be idempotent: ``create_all`` already builds fresh databases at the latest schema,
+so on a new install every migration runs as a no-op and only records the version.
+DDL 步骤必须幂等：新库由 create_all 直接建成最新结构，迁移只记录版本号。
+
+Adding a migration: append to ``MIGRATIONS`` with the next version number. Run ahead of a deploy with
+``python scripts/migrate.py`` (``init_db`` also applies pending migrations at startup).
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, SQLModel
+
+from services.utils.timezone import now as timezone_now
+
+from .connection import session_scope
+from .models.base import InternalMetadata
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION_KEY = "schema_version"
+DEFAULT_BATCH_SIZE = 2000
+# Pause between backfill batches so other writers get the lock
+# 回填批次之间的间隔，让其他写入方拿到写锁
+DEFAULT_BATCH_PAUSE_SECONDS = 0.05
+
+
+@dataclass
+class Backfill:
+    """Batched ``UPDATE {table} SET {set_clause} WHERE {where}`` over rowid ranges."""
+
+    table: str
+    set_clause: str
+    where: str = "1 = 1"
+    batch_size: int = DEFAULT_BATCH_SIZE
+    pause_seconds: float = DEFAULT_BATCH_PAUSE_SECONDS
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    steps: List[Callable[[Connection], None]] = field(default_factory=list)
+    backfills: List[Backfill] = field(default_factory=list)
+
+
+# --- DDL helpers (idempotent) ---
+
+def _columns(conn: Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()]
+
+
+def add_column(table: str, column: str, definition: str) -> Callable[[Connection], None]:
+    def _step(conn: Connection):
+        if column not in _columns(conn, table):
+            log.info(f"Adding column {table}.{column}")
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    _step.__name__ = f"add_column_{table}_{column}"
+    return _step
+
+
+def create_index(name: str, table: str, *columns: str) -> Callable[[Connection], None]:
+    def _step(conn: Connection):
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    _step.__name__ = f"create_index_{name}"
+    return _step
+
+
+def ensure_indexes(conn: Connection) -> List[str]:
+    """Create indexes declared on the models but missing from existing tables (``index_advisor --fix``).
+    Depends on the current models, so migrations list their indexes with ``create_index`` instead.
+    为已存在的表补建模型中声明但数据库中缺失的索引（create_all 只在建表时建索引）。
+    """
+    created = []
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in existing_tables or not table.indexes:
+            continue
+        present = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in present:
+                continue
+            index.create(conn, checkfirst=True)
+            created.append(index.name)
+            log.info(f"Created missing index {index.name} on {table.name}")
+    return created
+
+
+# --- Registry ---
+
+MIGRATIONS: List[Migration] = [
+    # Formerly scripts/update_db_schema.py
+    Migration(1, "user_auth_and_notification_columns", steps=[
+        add_column("user", "auth_provider", "VARCHAR(32) DEFAULT 'qq'"),
+        add_column("user", "auth_id", "VARCHAR(128)"),
+        add_column("user", "email", "VARCHAR(255)"),
+        add_column("user", "avatar_url", "VARCHAR(512)"),
+        add_column("user", "bot_interaction_mode", "VARCHAR(20) DEFAULT 'hybrid'"),
+        add_column("user", "notification_freq", "VARCHAR(20) DEFAULT 'realtime'"),
+        add_column("user", "is_muted", "BOOLEAN DEFAULT 0 NOT NULL"),
+        add_column("user", "allow_broadcast", "BOOLEAN DEFAULT 1 NOT NULL"),
+        add_column("user", "silent_hours", "VARCHAR(32)"),
+        add_column("user", "last_notified_at", "DATETIME"),
+    ]),
+    Migration(2, "hulaquan_resolved_city", steps=[
+        add_column("hulaquanevent", "resolved_city", "VARCHAR"),
+        add_column("hulaquanevent", "resolved_city_rule", "VARCHAR"),
+        create_index("ix_hulaquanevent_resolved_city", "hulaquanevent", "resolved_city"),
+        add_column("hulaquanticket", "resolved_city", "VARCHAR"),
+        add_column("hulaquanticket", "resolved_city_rule", "VARCHAR"),
+        create_index("ix_hulaquanticket_resolved_city", "hulaquanticket", "resolved_city"),
+    ]),
+    # Formerly scripts/fix_enum_case.py (SubscriptionFrequency values are upper case)
+    Migration(3, "notification_freq_upper_case", backfills=[
+        Backfill("user", "notification_freq = UPPER(notification_freq)",
+                 "notification_freq IN ('realtime', 'hourly', 'daily')"),
+    ]),
+    # Hot-query indexes declared on the models (see scripts/index_advisor.py). Listed explicitly so the
+    # migration stays fixed when later models declare more indexes; those get their own migration.
+    # 显式列出，避免之后模型新增索引时改变本迁移的内容
+    Migration(4, "hot_query_indexes", steps=[
+        create_index("ix_hulaquanticket_session_time", "hulaquanticket", "session_time"),
+        create_index("ix_ticketupdatelog_type_created_session", "ticketupdatelog",
+                     "change_type", "created_at", "session_time"),
+        create_index("ix_sendqueue_status_created_retry", "sendqueue", "status", "created_at", "next_retry_at"),
+        create_index("ix_saojushow_date_city", "saojushow", "date", "city"),
+        create_index("ix_ticketcastassociation_cast_ticket", "ticketcastassociation", "cast_id", "ticket_id"),
+    ]),
+    # Metric rows are written by services/system/metrics.py every flush interval
+    Migration(5, "metric_time_index", steps=[
+        create_index("ix_metric_name_created", "metric", "name", "created_at"),
+    ]),
+]
+
+
+# --- Runner ---
+
+def _get_meta(session: Session, key: str) -> Optional[str]:
+    meta = session.get(InternalMetadata, key)
+    return meta.value if meta else None
+
+
+def _set_meta(session: Session, key: str, value: str):
+    meta = session.get(InternalMetadata, key)
+    if meta is None:
+        meta = InternalMetadata(key=key, value=value)
+    else:
+        meta.value = value
+        meta.updated_at = timezone_now()
+    session.add(meta)
+
+
+def get_schema_version(db_path: Optional[str] = None) -> int:
+    with session_scope(db_path, readonly=True) as session:
+        value = _get_meta(session, SCHEMA_VERSION_KEY)
+    return int(value) if value else 0
+
+
+def pending_migrations(db_path: Optional[str] = None, target: Optional[int] = None) -> List[Migration]:
+    current = get_schema_version(db_path)
+    return [
+        m for m in sorted(MIGRATIONS, key=lambda m: m.version)
+        if m.version > current and (target is None or m.version <= target)
+    ]
+
+
+def run_backfill(backfill: Backfill, cursor_key: str, db_path: Optional[str] = None,
+                 batch_size: Optional[int] = None) -> int:
+    """Run one backfill in rowid batches; resumes from the cursor stored under ``cursor_key``.
+    按 rowid 分批执行回填；从 cursor_key 记录的位置续跑。返回更新的行数。
+    """
+    batch_size = batch_size or backfill.batch_size
+    table, where = backfill.table, backfill.where
+
+    with session_scope(db_path, readonly=True) as session:
+        last = int(_get_meta(session, cursor_key) or 0)
+        bounds = session.connection().execute(
+            text(f"SELECT MIN(rowid), MAX(rowid), COUNT(*) FROM {table} WHERE rowid > :last AND ({where})"),
+            {"last": last},
+        ).one()
+    low, high, total = bounds
+    if not total:
+        return 0
+
+    log.info(f"Backfill {table}: {total} rows to update (resuming after rowid {last})")
+    last = max(last, low - 1)
+    updated = 0
+    batches = 0
+    started = time.perf_counter()
+    while last < high:
+        upper = last + batch_size
+        with session_scope(db_path) as session:
+            result = session.connection().execute(
+                text(f"UPDATE {table} SET {backfill.set_clause} "
+                     f"WHERE rowid > :low AND rowid <= :high AND ({where})"),
+                {"low": last, "high": upper},
+            )
+            _set_meta(session, cursor_key, str(upper))
+        updated += result.rowcount or 0
+        batches += 1
+        last = upper
+        if batches % 10 == 0 or last >= high:
+            elapsed = time.perf_counter() - started
+            rate = updated / elapsed if elapsed > 0 else 0.0
+            log.info(f"Backfill {table}: {updated}/{total} rows ({rate:.0f} rows/s)")
+        if backfill.pause_seconds:
+            time.sleep(backfill.pause_seconds)
+    return updated
+
+
+def apply_migration(migration: Migration, db_path: Optional[str] = None,
+                    batch_size: Optional[int] = None):
+    started = time.perf_counter()
+    log.info(f"Applying migration {migration.version:04d}_{migration.name}")
+
+    if migration.steps:
+        with session_scope(db_path) as session:
+            conn = session.connection()
+            for step in migration.steps:
+                step(conn)
+
+    for i, backfill in enumerate(migration.backfills):
+        run_backfill(backfill, f"migration:{migration.version}:backfill:{i}", db_path, batch_size)
+
+    with session_scope(db_path) as session:
+        _set_meta(session, SCHEMA_VERSION_KEY, str(migration.version))
+        for i in range(len(migration.backfills)):
+            meta = session.get(InternalMetadata, f"migration:{migration.version}:backfill:{i}")
+            if meta:
+                session.delete(meta)
+    log.info(f"Migration {migration.version:04d} applied in {time.perf_counter() - started:.2f}s")
+
+
+def migrate(db_path: Optional[str] = None, target: Optional[int] = None,
+            batch_size: Optional[int] = None) -> List[int]:
+    """Apply pending migrations in order; returns the applied versions.
+    按顺序执行待执行的迁移，返回已执行的版本号。
+    """
+    applied = []
+    for migration in pending_migrations(db_path, target):
+        apply_migration(migration, db_path, batch_size)
+        applied.append(migration.version)
+    return applied
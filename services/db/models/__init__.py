@@ -37,6 +37,7 @@ from services.hulaquan.tables import (
     TicketCastAssociation,
     HulaquanAlias,
     TicketUpdateLog,
+    TicketStockSeries,
 )
 
 __all__ = [
@@ -59,6 +60,7 @@ __all__ = [
     "PlaySourceLink",
     "SaojuCache",
     "TicketUpdateLog",
+    "TicketStockSeries",
     "HulaquanEvent",
     "HulaquanTicket",
     "HulaquanCast",
@@ -3,7 +3,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import JSON, Column
+from sqlalchemy import JSON, Column, Index
 from sqlmodel import Field, SQLModel
 
 from .base import SendQueueStatus, TimeStamped, utcnow
@@ -16,6 +16,12 @@ class Metric(TimeStamped, SQLModel, table=True):
     labels: Optional[dict] = Field(default=None, sa_column=Column(JSON, nullable=True))
     labels_hash: Optional[str] = Field(default=None, index=True, max_length=64)
 
+    __table_args__ = (
+        # Time-series reads (name + time window) and retention pruning
+        # 时间序列查询（按名称 + 时间窗口）与过期清理
+        Index("ix_metric_name_created", "name", "created_at"),
+    )
+
 
 class ErrorLog(TimeStamped, SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -47,3 +53,9 @@ class SendQueue(TimeStamped, SQLModel, table=True):
     
     # Reference (for deduplication)
     ref_id: Optional[str] = Field(default=None, max_length=64, index=True, description="e.g. TicketUpdateLog.id")
+
+    __table_args__ = (
+        # Consumer poll: status = pending, oldest first, next_retry_at checked inside the index
+        # 消费轮询：status 等值、按 created_at 顺序读取，next_retry_at 在索引内判断
+        Index("ix_sendqueue_status_created_retry", "status", "created_at", "next_retry_at"),
+    )
@@ -0,0 +1,254 @@
+"""Opt-in SQL query profiler and slow-query log.
+可选开启的 SQL 查询分析器与慢查询日志。
+
+Hooks ``before_cursor_execute`` / ``after_cursor_execute`` on every engine created by
+services/db/connection.py (and the async read engine). When enabled it records, per normalized
+statement fingerprint: call count, total/max time and the calling code locations. Each
+``session_scope`` is tracked too, so the same fingerprint executed more than
+``n_plus_one_threshold`` times inside one scope is reported as an N+1 pattern.
+在 connection.py 创建的引擎上挂载游标事件。开启后按规范化语句指纹记录调用次数、总耗时/最大耗时
+和调用位置；并按 session_scope 统计，同一指纹在一个会话中执行超过阈值即判定为 N+1。
+
+Enable with ``HLQ_DB_PROFILE=true`` (see services/config.py) or at runtime via
+``POST /api/admin/db/profiler``. When disabled the listeners return immediately.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import TimedRotatingFileHandler
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+
+from services.config import config
+
+log = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+_PROJECT_PREFIX = str(PROJECT_ROOT) + os.sep
+# Frames from these paths are skipped when looking for the calling code location
+# 查找调用位置时跳过这些路径的栈帧
+_SKIP_PATH_PARTS = (os.sep + "site-packages" + os.sep, os.sep + "services" + os.sep + "db" + os.sep)
+
+MAX_FINGERPRINTS = 2000
+MAX_LOCATIONS_PER_FINGERPRINT = 5
+
+_WS_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIMIT_RE = re.compile(r"\bLIMIT \? OFFSET \?", re.IGNORECASE)
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so that calls differing only in literals/IN-list length match.
+    规范化 SQL：仅字面量或 IN 列表长度不同的语句视为同一指纹。
+    """
+    fp = _WS_RE.sub(" ", statement).strip()
+    fp = _STRING_RE.sub("?", fp)
+    fp = _NUMBER_RE.sub("?", fp)
+    fp = _IN_LIST_RE.sub("(?...)", fp)
+    fp = _LIMIT_RE.sub("LIMIT ?", fp)
+    return fp
+
+
+def _caller_location() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_PREFIX) and not any(part in filename for part in _SKIP_PATH_PARTS):
+            return f"{filename[len(_PROJECT_PREFIX):]}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+class _QueryStats:
+    __slots__ = ("count", "total_ms", "max_ms", "locations")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.locations: Counter = Counter()
+
+
+class _ScopeTracker:
+    """Per-session_scope fingerprint counts used for N+1 detection."""
+
+    __slots__ = ("label", "counts", "locations")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.counts: Counter = Counter()
+        self.locations: Dict[str, str] = {}
+
+
+_current_scope: ContextVar[Optional[_ScopeTracker]] = ContextVar("db_profiler_scope", default=None)
+
+
+class QueryProfiler:
+    """进程内查询统计"""
+
+    def __init__(self, enabled: bool = False, slow_ms: float = 200.0, n_plus_one_threshold: int = 10):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._stats: Dict[str, _QueryStats] = {}
+        self._slow: deque = deque(maxlen=200)
+        self._n_plus_one: deque = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._slow_log = logging.getLogger("services.db.slow_query")
+        self._file_handler_ready = False
+
+    # --- Engine hooks ---
+
+    def install(self, engine):
+        """Attach cursor listeners to a (sync) engine. For async engines pass ``engine.sync_engine``."""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if self.enabled:
+                conn.info.setdefault("_profiler_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            if not self.enabled:
+                return
+            starts = conn.info.get("_profiler_start")
+            if not starts:
+                return
+            elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+            self.record(statement, elapsed_ms)
+
+    def record(self, statement: str, elapsed_ms: float):
+        fp = fingerprint(statement)
+        location = _caller_location()
+
+        with self._lock:
+            stats = self._stats.get(fp)
+            if stats is None:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    return
+                stats = self._stats[fp] = _QueryStats()
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            if location in stats.locations or len(stats.locations) < MAX_LOCATIONS_PER_FINGERPRINT:
+                stats.locations[location] += 1
+
+        scope = _current_scope.get()
+        if scope is not None:
+            scope.counts[fp] += 1
+            scope.locations.setdefault(fp, location)
+
+        if elapsed_ms >= self.slow_ms:
+            entry = {
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "ms": round(elapsed_ms, 2),
+                "fingerprint": fp,
+                "location": location,
+            }
+            self._slow.append(entry)
+            self._ensure_file_handler()
+            self._slow_log.warning(f"🐢 Slow query {elapsed_ms:.1f}ms at {location}: {fp[:300]}")
+
+    # --- Session scopes (N+1 detection) ---
+
+    @contextmanager
+    def track_scope(self, label: str = "session_scope") -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        tracker = _ScopeTracker(label)
+        token = _current_scope.set(tracker)
+        try:
+            yield
+        finally:
+            _current_scope.reset(token)
+            self._check_n_plus_one(tracker)
+
+    def _check_n_plus_one(self, tracker: _ScopeTracker):
+        for fp, count in tracker.counts.items():
+            if count > self.n_plus_one_threshold:
+                entry = {
+                    "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "scope": tracker.label,
+                    "count": count,
+                    "fingerprint": fp,
+                    "location": tracker.locations.get(fp, "<unknown>"),
+                }
+                self._n_plus_one.append(entry)
+                self._ensure_file_handler()
+                self._slow_log.warning(
+                    f"🔁 N+1 suspected: {count}x in one {tracker.label} at {entry['location']}: {fp[:200]}"
+                )
+
+    # --- Reporting ---
+
+    def _ensure_file_handler(self):
+        """Slow/N+1 findings also go to logs/db.log (viewable via /api/admin/logs?file=db.log)."""
+        if self._file_handler_ready:
+            return
+        self._file_handler_ready = True
+        try:
+            log_dir = PROJECT_ROOT / "logs"
+            log_dir.mkdir(exist_ok=True)
+            handler = TimedRotatingFileHandler(
+                filename=log_dir / "db.log", when="midnight", interval=1, backupCount=7, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+            self._slow_log.addHandler(handler)
+        except Exception as e:
+            log.warning(f"Failed to attach db.log handler: {e}")
+
+    def report(self, top: int = 50, order_by: str = "total_ms") -> Dict:
+        with self._lock:
+            rows: List[Dict] = [
+                {
+                    "fingerprint": fp,
+                    "count": s.count,
+                    "total_ms": round(s.total_ms, 2),
+                    "avg_ms": round(s.total_ms / s.count, 3) if s.count else 0.0,
+                    "max_ms": round(s.max_ms, 2),
+                    "locations": dict(s.locations.most_common(MAX_LOCATIONS_PER_FINGERPRINT)),
+                }
+                for fp, s in self._stats.items()
+            ]
+        if order_by not in ("total_ms", "count", "max_ms", "avg_ms"):
+            order_by = "total_ms"
+        rows.sort(key=lambda r: r[order_by], reverse=True)
+        return {
+            "enabled": self.enabled,
+            "since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self._started_at)),
+            "slow_ms": self.slow_ms,
+            "n_plus_one_threshold": self.n_plus_one_threshold,
+            "fingerprints": len(rows),
+            "queries": rows[:top],
+            "slow_queries": list(self._slow)[::-1],
+            "n_plus_one": list(self._n_plus_one)[::-1],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._n_plus_one.clear()
+            self._started_at = time.time()
+
+
+profiler = QueryProfiler(
+    enabled=config.DB_PROFILE,
+    slow_ms=config.DB_SLOW_QUERY_MS,
+    n_plus_one_threshold=config.DB_N_PLUS_ONE_THRESHOLD,
+)
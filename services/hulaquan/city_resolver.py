@@ -1,8 +1,34 @@
+import hashlib
 import json
 import os
-from typing import Dict, List, Optional
+import re
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+from services.hulaquan.keyword_automaton import KeywordAutomaton
+from services.hulaquan.utils import CITIES
+
+# Rule tags persisted alongside resolved_city (HulaquanEvent / HulaquanTicket)
+# 与 resolved_city 一起持久化的规则标记
+RULE_VENUE_KEYWORD = "venue_keyword"
+RULE_TITLE_KEYWORD = "title_keyword"
+RULE_TICKET_CITY = "ticket_city"
+RULE_TICKET_TITLE_TEXT = "ticket_title_text"
+RULE_EVENT_TITLE_TEXT = "event_title_text"
+RULE_LOCATION_TEXT = "location_text"
+RULE_VENUE_FALLBACK = "venue_fallback"
+
+# Keyword groups compiled into the automaton
+# 编译进自动机的关键词分组
+_GROUP_VENUE = "venue"
+_GROUP_TITLE = "title"
+_GROUP_FALLBACK = "fallback"
+_GROUP_CITY = "city"
+
+_BRACKETS_PATTERN = re.compile(r'《.*?》')
+_SCAN_CACHE_SIZE = 4096
+
+
 class CityResolver:
     """Helper class to resolve city from venue name or title using configurable rules."""
     
@@ -23,54 +49,224 @@ class CityResolver:
             self.config_path = str(potential_path)
         else:
             self.config_path = config_path
+
+        # Legacy venue -> city fallback rules (used to live in HulaquanService)
+        # 旧版场馆 -> 城市兜底规则（原先位于 HulaquanService）
+        self.fallback_path = str(Path(__file__).parent / "venue_rules.json")
             
         self.venue_rules: Dict[str, List[str]] = {}
         self.title_rules: Dict[str, List[str]] = {}
+        self.fallback_rules: Dict[str, str] = {}
+        self.fingerprint: str = ""
+        self._mtimes: Tuple[float, float] = (0.0, 0.0)
+        self._automaton: Optional[KeywordAutomaton] = None
+        self._scan_cache: Dict[str, Dict[str, Optional[str]]] = {}
         self._load_config()
 
+    def _current_mtimes(self) -> Tuple[float, float]:
+        def _mtime(path: str) -> float:
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0.0
+        return (_mtime(self.config_path), _mtime(self.fallback_path))
+
     def _load_config(self):
+        digest = hashlib.sha1()
+        self._mtimes = self._current_mtimes()
         try:
             if not os.path.exists(self.config_path):
                 print(f"Warning: CityResolver config not found at {self.config_path}")
-                return
-
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            else:
+                with open(self.config_path, 'rb') as f:
+                    raw = f.read()
+                digest.update(raw)
+                data = json.loads(raw.decode('utf-8'))
                 self.venue_rules = data.get("venue_keywords", {})
                 self.title_rules = data.get("title_keywords", {})
         except Exception as e:
             print(f"Error loading CityResolver config: {e}")
 
+        try:
+            if os.path.exists(self.fallback_path):
+                with open(self.fallback_path, 'rb') as f:
+                    raw = f.read()
+                digest.update(raw)
+                self.fallback_rules = json.loads(raw.decode('utf-8')).get("rules", {})
+        except Exception as e:
+            print(f"Error loading venue fallback rules: {e}")
+
+        self.fingerprint = digest.hexdigest()
+        self._compile()
+
+    def _compile(self):
+        """Compile venue/title/fallback keywords and CITIES into one automaton.
+        将场馆/标题/兜底关键词与 CITIES 编译为一个自动机。
+        Payload is (group, rank, city); lower rank wins inside a group, mirroring dict order.
+        """
+        keywords = []
+        for group, rules in ((_GROUP_VENUE, self.venue_rules), (_GROUP_TITLE, self.title_rules)):
+            for rank, (city, kws) in enumerate(rules.items()):
+                for kw in kws:
+                    keywords.append((kw, (group, rank, city)))
+        for rank, (kw, city) in enumerate(self.fallback_rules.items()):
+            keywords.append((kw, (_GROUP_FALLBACK, rank, city)))
+        for rank, city in enumerate(CITIES):
+            keywords.append((city, (_GROUP_CITY, rank, city)))
+
+        self._automaton = KeywordAutomaton(keywords)
+        self._scan_cache = {}
+
+    def _scan(self, text: str) -> Dict[str, Optional[str]]:
+        """Single linear pass over `text`, returning the winning city per group.
+        对文本做单次线性扫描，返回每个分组命中的城市。
+        Keys: venue / title / fallback (priority order), text (leftmost CITIES match, ties broken
+        by CITIES order like the regex alternation in detect_city_in_text) and text_outside_brackets (same as extract_title_info).
+        """
+        cached = self._scan_cache.get(text)
+        if cached is not None:
+            return cached
+
+        best_rank: Dict[str, int] = {}
+        result: Dict[str, Optional[str]] = {
+            _GROUP_VENUE: None, _GROUP_TITLE: None, _GROUP_FALLBACK: None,
+            "text": None, "text_outside_brackets": None,
+        }
+        city_hits = []
+        for start, end, (group, rank, city) in self._automaton.find_all(text):
+            if group == _GROUP_CITY:
+                city_hits.append((start, end, rank, city))
+            elif rank < best_rank.get(group, rank + 1):
+                best_rank[group] = rank
+                result[group] = city
+
+        if city_hits:
+            city_hits.sort(key=lambda hit: (hit[0], hit[2]))
+            result["text"] = city_hits[0][3]
+
+            # Mask every occurrence of the first 《...》 block, like extract_title_info does
+            # 与 extract_title_info 一致：屏蔽第一个书名号内容的所有出现位置
+            masked = []
+            brackets_match = _BRACKETS_PATTERN.search(text)
+            if brackets_match:
+                block = brackets_match.group(0)
+                pos = text.find(block)
+                while pos != -1:
+                    masked.append((pos, pos + len(block)))
+                    pos = text.find(block, pos + len(block))
+            for start, end, _, city in city_hits:
+                if not any(start < m_end and end > m_start for m_start, m_end in masked):
+                    result["text_outside_brackets"] = city
+                    break
+
+        if len(self._scan_cache) >= _SCAN_CACHE_SIZE:
+            self._scan_cache.clear()
+        self._scan_cache[text] = result
+        return result
+
+    def reload_if_changed(self) -> bool:
+        """Reload rules if either mapping file changed on disk. Returns True if reloaded.
+        如果映射文件在磁盘上发生变化则重新加载，返回是否重新加载。
+        """
+        if self._current_mtimes() == self._mtimes:
+            return False
+        old_fingerprint = self.fingerprint
+        self._load_config()
+        return self.fingerprint != old_fingerprint
+
     def from_venue(self, location: str) -> Optional[str]:
         if not location:
             return None
-        
-        for city, keywords in self.venue_rules.items():
-            for kw in keywords:
-                if kw in location:
-                    return city
-        return None
+        return self._scan(location)[_GROUP_VENUE]
 
     def from_title(self, title: str) -> Optional[str]:
         if not title:
             return None
-            
-        for city, keywords in self.title_rules.items():
-            for kw in keywords:
-                if kw in title:
-                    return city
-        return None
+        return self._scan(title)[_GROUP_TITLE]
 
     def resolve_from_text(self, text: str) -> Optional[str]:
         """Generic method to resolve city from any text (venue or title)."""
         if not text:
             return None
         
-        # Try rules
-        c = self.from_venue(text)
-        if c: return c
-        
-        c = self.from_title(text)
-        if c: return c
-            
-        return None
+        # One pass covers both rule sets; venue rules take priority
+        # 单次扫描同时覆盖两类规则，场馆规则优先
+        matches = self._scan(text)
+        return matches[_GROUP_VENUE] or matches[_GROUP_TITLE]
+
+    def from_fallback(self, location: str) -> Optional[str]:
+        if not location:
+            return None
+        return self._scan(location)[_GROUP_FALLBACK]
+
+    def resolve_ticket_city(
+        self,
+        ticket_title: str,
+        ticket_city: Optional[str],
+        event_title: str,
+        location: Optional[str],
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Resolve the canonical city of a ticket. Returns (city, rule).
+        解析票据的标准城市，返回 (城市, 命中规则)。
+        Order:
+        1. Config Rules (Venue)
+        2. Config Rules (Title) - ticket title then event title
+        3. DB City
+        4. Ticket Title Extraction
+        5. Event Title Extraction
+        6. Event Location Extraction
+        """
+        # Texts are scanned lazily, in the order the rules consult them
+        # 按规则顺序惰性扫描文本
+        location_m = self._scan(location) if location else {}
+        city = location_m.get(_GROUP_VENUE)
+        if city: return city, RULE_VENUE_KEYWORD
+
+        ticket_m = self._scan(ticket_title) if ticket_title else {}
+        city = ticket_m.get(_GROUP_TITLE)
+        if city: return city, RULE_TITLE_KEYWORD
+
+        event_m = self._scan(event_title) if event_title else {}
+        city = event_m.get(_GROUP_TITLE)
+        if city: return city, RULE_TITLE_KEYWORD
+
+        if ticket_city:
+            return ticket_city, RULE_TICKET_CITY
+
+        city = ticket_m.get("text_outside_brackets")
+        if city: return city, RULE_TICKET_TITLE_TEXT
+
+        city = event_m.get("text_outside_brackets")
+        if city: return city, RULE_EVENT_TITLE_TEXT
+
+        city = location_m.get("text")
+        if city: return city, RULE_LOCATION_TEXT
+
+        return None, None
+
+    def resolve_event_city(
+        self,
+        event_title: str,
+        location: Optional[str],
+        ticket_cities: List[Optional[str]],
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Resolve the canonical city of an event. Returns (city, rule).
+        解析演出的标准城市，返回 (城市, 命中规则)。
+        Order: event title text -> location text -> first ticket city -> venue fallback rules.
+        """
+        location_m = self._scan(location) if location else {}
+        event_m = self._scan(event_title) if event_title else {}
+
+        city = event_m.get("text_outside_brackets")
+        if city: return city, RULE_EVENT_TITLE_TEXT
+
+        city = location_m.get("text")
+        if city: return city, RULE_LOCATION_TEXT
+
+        for city in ticket_cities:
+            if city: return city, RULE_TICKET_CITY
+
+        city = location_m.get(_GROUP_FALLBACK)
+        if city: return city, RULE_VENUE_FALLBACK
+
+        return None, None
@@ -0,0 +1,122 @@
+"""
+Aho–Corasick multi-pattern keyword matcher.
+Aho–Corasick 多模式关键词匹配器。
+
+All keywords are compiled once into a trie with failure links, so finding every
+occurrence of every keyword in a text is a single linear pass over the text
+(instead of `len(keywords)` substring scans).
+所有关键词一次性编译为带失败指针的字典树，单次线性扫描即可找出文本中所有关键词的出现位置。
+
+While the automaton sits in the root state, a compiled character-class regex (prefilter)
+jumps straight to the next character that can start a keyword, so the Python-level loop
+only runs over "interesting" stretches of the text.
+自动机处于根状态时，用预编译的字符集正则（预过滤器）直接跳到下一个可能作为关键词开头的字符，
+Python 循环只处理可能命中的片段。
+"""
+import re
+from collections import deque
+from typing import Dict, Generic, Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class KeywordAutomaton(Generic[T]):
+    """Compiled Aho–Corasick automaton mapping keywords to payloads.
+
+    用法:
+        automaton = KeywordAutomaton([("上海", "SH"), ("北京", "BJ")])
+        for start, end, payload in automaton.iter_matches("北京·上海巡演"):
+            ...
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, T]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: list of (keyword_length, payload) ending at this state (incl. via failure links)
+        # 每个状态：在此结束的 (关键词长度, 载荷) 列表（包含失败链继承的输出）
+        self._output: List[List[Tuple[int, T]]] = [[]]
+        self._alphabet = set()
+        self.size = 0
+
+        for keyword, payload in keywords:
+            if not keyword:
+                continue
+            self._insert(keyword, payload)
+            self.size += 1
+        self._build_failure_links()
+        self._prefilter = self._build_prefilter()
+
+    def _insert(self, keyword: str, payload: T):
+        state = 0
+        for ch in keyword:
+            self._alphabet.add(ch)
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._output[state].append((len(keyword), payload))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # Inherit outputs of the failure state (suffix keywords)
+                # 继承失败状态的输出（后缀关键词）
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def _build_prefilter(self):
+        first_chars = sorted(self._goto[0])
+        if not first_chars:
+            return None
+        return re.compile("[" + "".join(re.escape(ch) for ch in first_chars) + "]")
+
+    def find_all(self, text: str) -> List[Tuple[int, int, T]]:
+        """Return (start, end, payload) for every keyword occurrence, in order of end position."""
+        matches: List[Tuple[int, int, T]] = []
+        if not text or self._prefilter is None:
+            return matches
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        alphabet = self._alphabet
+        skip_to = self._prefilter.search
+        n = len(text)
+        state = 0
+        i = 0
+        while i < n:
+            if not state:
+                # Root state: jump to the next possible keyword start
+                # 根状态：跳到下一个可能的关键词起点
+                hit = skip_to(text, i)
+                if hit is None:
+                    break
+                i = hit.start()
+            ch = text[i]
+            i += 1
+            if ch not in alphabet:
+                state = 0
+                continue
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            if output[state]:
+                for length, payload in output[state]:
+                    matches.append((i - length, i, payload))
+        return matches
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, T]]:
+        """Yield (start, end, payload) for every keyword occurrence, in order of end position."""
+        return iter(self.find_all(text))
@@ -0,0 +1,133 @@
+"""
+最近票务动态内存环形缓冲
+In-memory ring buffer of recent TicketUpdates, one bounded deque per change type.
+
+启动时从 TicketUpdateLog 预热，之后由同步写入方追加；/api/tickets/recent-updates 直接从内存读取，
+并复用每条记录预编码的 JSON。数据库只在冷启动（或首次请求某个未预热的类型）时访问；
+另外，若某类型过滤掉已过期场次后不足请求条数、而缓冲曾淘汰过记录（数据库中可能还有），则从数据库重新载入该类型。
+Seeded from TicketUpdateLog at startup and appended to by the sync writer, so the recent-updates
+endpoint is served from memory with pre-encoded JSON. The DB is hit for cold starts, and to refill a
+type whose upcoming rows fall short of the requested count after the buffer has dropped rows.
+"""
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from services.hulaquan.models import TicketUpdate
+
+# Rows returned per change type (matches the previous per-type DB query limit)
+# 每种类型返回的条数（与之前按类型查询数据库的上限一致）
+DEFAULT_PER_TYPE = 20
+
+
+def _naive(dt: Optional[datetime]) -> Optional[datetime]:
+    # DB rows come back naive (Beijing time); writer-side objects are tz-aware
+    # 数据库读出的时间不带时区（北京时间），写入方的对象带时区
+    return dt.replace(tzinfo=None) if dt is not None and dt.tzinfo is not None else dt
+
+
+class RecentUpdatesBuffer:
+    """票务动态环形缓冲（线程安全：写入方在线程池中追加）"""
+
+    def __init__(self, capacity_per_type: int = 100):
+        # Capacity > DEFAULT_PER_TYPE so that past sessions filtered out at read time still leave enough rows
+        # 容量大于单类型返回数，读取时过滤掉已过期场次后仍有足够的数据
+        self.capacity_per_type = capacity_per_type
+        self._buffers: Dict[str, Deque[Tuple[TicketUpdate, str]]] = {}
+        self._seeded: Set[str] = set()
+        # Types whose buffer holds every upcoming DB row (seed returned < capacity, nothing evicted since)
+        # 缓冲包含数据库中全部未过期记录的类型（预热不足容量且之后未淘汰）
+        self._complete: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(update: TicketUpdate) -> Tuple[TicketUpdate, str]:
+        if (update.created_at and update.created_at.tzinfo) or (update.session_time and update.session_time.tzinfo):
+            update = update.model_copy(update={
+                "created_at": _naive(update.created_at),
+                "session_time": _naive(update.session_time),
+            })
+        return update, update.model_dump_json()
+
+    def _buffer(self, change_type: str) -> Deque[Tuple[TicketUpdate, str]]:
+        buf = self._buffers.get(change_type)
+        if buf is None:
+            buf = self._buffers[change_type] = deque(maxlen=self.capacity_per_type)
+        return buf
+
+    def missing_types(self, change_types: Iterable[str]) -> List[str]:
+        return [t for t in change_types if t not in self._seeded]
+
+    def seed(self, change_type: str, updates: List[TicketUpdate], refill: bool = False,
+             now: Optional[datetime] = None):
+        """Load DB rows (newest first, sessions from ``now`` on) for a type. Items appended after the
+        rows were queried are kept on top, except past sessions the query filtered out.
+        ``refill`` replaces an already seeded buffer.
+        从数据库载入某类型的记录（按时间倒序，仅未过期场次），查询后追加的未过期记录保留在最新位置；refill 时替换已有缓冲。
+        """
+        items = [self._normalize(u) for u in reversed(updates)]
+        now = _naive(now)
+        with self._lock:
+            if change_type in self._seeded and not refill:
+                return
+            latest = items[-1][0].created_at if items else None
+            pending = [
+                item for item in self._buffers.get(change_type, ())
+                if (latest is None or (item[0].created_at and item[0].created_at > latest))
+                and (now is None or item[0].session_time is None or item[0].session_time >= now)
+            ]
+            buf = deque(items, maxlen=self.capacity_per_type)
+            buf.extend(pending)
+            self._buffers[change_type] = buf
+            self._seeded.add(change_type)
+            if len(updates) < self.capacity_per_type and len(buf) < self.capacity_per_type:
+                self._complete.add(change_type)
+            else:
+                self._complete.discard(change_type)
+
+    def append(self, updates: Iterable[TicketUpdate]):
+        """Append freshly committed updates (called by the sync writer)."""
+        items = [self._normalize(u) for u in updates]
+        with self._lock:
+            for item in items:
+                buf = self._buffer(item[0].change_type)
+                if len(buf) == buf.maxlen:
+                    # The oldest row is evicted; the DB may now hold upcoming rows the buffer lacks
+                    # 最旧的记录被淘汰，数据库中可能有缓冲里没有的未过期记录
+                    self._complete.discard(item[0].change_type)
+                buf.append(item)
+
+    def _upcoming(self, change_type: str, now: datetime, per_type: int) -> List[Tuple[TicketUpdate, str]]:
+        taken = []
+        for item in reversed(self._buffers.get(change_type, ())):
+            session_time = item[0].session_time
+            if session_time is not None and session_time < now:
+                continue
+            taken.append(item)
+            if len(taken) >= per_type:
+                break
+        return taken
+
+    def short_types(self, change_types: Iterable[str], now: datetime,
+                    per_type: int = DEFAULT_PER_TYPE) -> List[str]:
+        """Types with fewer than `per_type` upcoming rows that the DB may still have (need a refill).
+        未过期记录不足 per_type 条、且数据库中可能还有更多记录的类型（需要重新载入）。
+        """
+        now = _naive(now)
+        with self._lock:
+            return [
+                t for t in dict.fromkeys(change_types)
+                if t not in self._complete and len(self._upcoming(t, now, per_type)) < per_type
+            ]
+
+    def snapshot(self, change_types: Iterable[str], now: datetime,
+                 per_type: int = DEFAULT_PER_TYPE) -> List[Tuple[TicketUpdate, str]]:
+        """Newest `per_type` upcoming updates of each type, merged newest first."""
+        now = _naive(now)
+        results: List[Tuple[TicketUpdate, str]] = []
+        with self._lock:
+            for change_type in dict.fromkeys(change_types):
+                results.extend(self._upcoming(change_type, now, per_type))
+        results.sort(key=lambda item: item[0].created_at or datetime.min, reverse=True)
+        return results
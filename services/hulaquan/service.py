@@ -1,6 +1,8 @@
 import asyncio
 import json
 import logging
+import math
+import time
 import traceback
 import ssl
 from datetime import datetime, timedelta
@@ -8,9 +10,16 @@ from typing import List, Dict, Optional, Tuple, Set
 
 import aiohttp
 from sqlmodel import Session, select, or_, and_, col
-from sqlalchemy.orm import joinedload
-
+from sqlalchemy.orm import selectinload
+
+from services.crawler.advanced_client import RETRY_STATUSES, AdvancedCrawlerClient, get_client
+from services.config import config
+from services.crawler import json_codec
+from services.crawler.crawl_executor import crawl_executor
+from services.crawler.schemas import EventDetails, RecommendationPage
+from services.crawler.smart_retry import RetryConfig, RetryStrategy
 from services.db.connection import session_scope
+from services.db.executor import db_executor
 from services.hulaquan.tables import (
     HulaquanEvent, 
     HulaquanTicket, 
@@ -27,13 +36,35 @@ from services.hulaquan.models import (
     TicketUpdate,
     SearchResult
 )
-from services.hulaquan.utils import standardize_datetime, extract_title_info, extract_text_in_brackets, detect_city_in_text
+from services.hulaquan.utils import standardize_datetime, extract_title_info, extract_text_in_brackets
 from services.saoju.service import SaojuService
 from services.hulaquan.city_resolver import CityResolver
+from services.hulaquan.ticket_feed import TicketUpdateBroadcaster
+from services.hulaquan import stock_series
+from services.hulaquan.recent_updates import RecentUpdatesBuffer
+from services.db.models.base import InternalMetadata
+from services.system import data_version
+from services.system.network_health import CircuitOpenError, upstream_monitor
 from services.utils.timezone import now as timezone_now
 
 log = logging.getLogger(__name__)
 
+# A rejected page size is not retried for this long (the server's limit may change)
+# 被拒绝的分页大小在此时间内不再尝试（服务端上限可能变化）
+PAGE_SIZE_CEILING_TTL = 6 * 3600
+
+
+class RecommendationPageError(Exception):
+    """A recommendation page failed (HTTP error, undecodable body); unlike a rejection it says nothing about the page size."""
+
+# InternalMetadata key storing the fingerprint of the city mapping used for resolved_city
+# 存储 resolved_city 所用城市映射指纹的 InternalMetadata 键
+CITY_MAPPING_METADATA_KEY = "city_mapping_fingerprint"
+
+# Change types served by /api/tickets/recent-updates when none are requested
+# 未指定类型时票务动态接口返回的核心类型
+RECENT_UPDATE_CORE_TYPES = ['new', 'pending', 'restock', 'back']
+
 class HulaquanService:
     BASE_URL = "https://clubz.cloudsation.com"
     DEFAULT_HEADERS = {
@@ -44,36 +75,18 @@ class HulaquanService:
     def __init__(self):
         self._db_write_lock = asyncio.Lock()  # Lock for SQLite writes
         self._fetch_semaphore = asyncio.Semaphore(5)  # Concurrency limit for Hulaquan API
-        self._session: Optional[aiohttp.ClientSession] = None
+        self.ticket_feed = TicketUpdateBroadcaster()  # Live push for /api/tickets/stream & /ws
+        self.recent_updates = RecentUpdatesBuffer()  # Ring buffer behind /api/tickets/recent-updates
         self._saoju = SaojuService()
         self._city_resolver = CityResolver()
+        # Recommendation page size learned across sync cycles (see _discover_events)
+        # 跨同步周期学习到的推荐列表分页大小
+        self._page_size = self._round_page_size(config.RECOMMEND_PAGE_SIZE)
+        self._page_size_ceiling: Optional[Tuple[int, float]] = None  # (smallest rejected size, when)
         
     @property
     def saoju(self) -> SaojuService:
         return self._saoju
-        
-        # Load venue rules
-        self.venue_rules = {}
-        try:
-            import json
-            from pathlib import Path
-            rule_path = Path(__file__).parent / "venue_rules.json"
-            if rule_path.exists():
-                with open(rule_path, 'r', encoding='utf-8') as f:
-                    self.venue_rules = json.load(f).get("rules", {})
-        except Exception as e:
-            log.error(f"Failed to load venue rules: {e}")
-
-    def _apply_city_rules(self, city: Optional[str], venue: Optional[str]) -> Optional[str]:
-        if city:
-            return city
-        if not venue:
-            return None
-        
-        for key, val in self.venue_rules.items():
-            if key in venue:
-                return val
-        return None
 
     async def __aenter__(self):
         await self._ensure_session()
@@ -84,48 +97,67 @@ class HulaquanService:
         await self.close()
         await self._saoju.close()
 
-    async def _ensure_session(self):
-        if self._session is None or self._session.closed:
-            connector = aiohttp.TCPConnector(ssl=False)
-            timeout = aiohttp.ClientTimeout(total=90, connect=20)
-            self._session = aiohttp.ClientSession(
-                headers=self.DEFAULT_HEADERS,
-                connector=connector,
-                timeout=timeout
-            )
+    async def _ensure_session(self) -> AdvancedCrawlerClient:
+        # Process-wide client for the Hulaquan API: keep-alive pool, adaptive retry; health-aware DNS
+        # ordering only with HLQ_CRAWL_BACKGROUND_PROBES (it probes every upstream IP in the background)
+        # 进程内共享的呼啦圈 API 客户端：长连接复用、自适应重试；健康节点优先需开启 HLQ_CRAWL_BACKGROUND_PROBES
+        return await get_client(
+            self.BASE_URL,
+            pool_size=8,
+            enable_health_probe=config.CRAWL_BACKGROUND_PROBES,
+            enable_keepalive_probes=config.CRAWL_BACKGROUND_PROBES,
+            headers=self.DEFAULT_HEADERS,
+            ssl=False,
+            timeout=aiohttp.ClientTimeout(total=90, connect=20),
+            retry_config=RetryConfig(max_retries=2, base_delay=0.5, max_delay=5.0, give_up_probability=0.0),
+            retry_strategy=RetryStrategy.EXPONENTIAL_BACKOFF,
+            retry_statuses=RETRY_STATUSES,
+            executor=crawl_executor,
+            breaker=upstream_monitor.breaker(data_version.HULAQUAN, probe_url=self.BASE_URL, ssl=False),
+        )
 
     async def close(self):
-        if self._session and not self._session.closed:
-            await self._session.close()
+        # Shared client is closed by close_all_clients() at process shutdown
+        # 共享客户端由进程关闭时的 close_all_clients() 统一关闭
+        pass
+
+    async def _run_read(self, query_fn, *args):
+        """Run a read-only ORM query function `query_fn(session, *args)` on the DB executor.
+        在数据库线程池中执行只读 ORM 查询函数 `query_fn(session, *args)`。
+        Row building, relationship loads and result shaping all happen in the query function, so it
+        must not run on the event loop.
+        """
+        return await db_executor.run(self._read_in_thread, query_fn, *args)
 
-    async def _fetch_json(self, url: str) -> Optional[Dict]:
+    @staticmethod
+    def _read_in_thread(query_fn, *args):
+        with session_scope(readonly=True) as session:
+            return query_fn(session, *args)
+
+    async def _fetch_json(self, url: str, schema=None) -> Optional[Dict]:
         """Helper to fetch and parse JSON from API (handles BOM).
         从 API 获取和解析 JSON 的帮助程序（处理 BOM）。
+
+        ``schema`` (services/crawler/schemas.py) limits decoding to the fields we read when msgspec is installed.
         """
-        await self._ensure_session()
         try:
-            async with self._session.get(url) as response:
-                if response.status != 200:
-                    log.error(f"API Error {response.status}: {url}")
-                    return None
-                
-                # Read as bytes first to handle BOM properly via utf-8-sig
-                # 首先读取为字节，以便通过 utf-8-sig 正确处理 BOM
-                content = await response.read()
-                try:
-                    text = content.decode('utf-8-sig')
-                    return json.loads(text)
-                except Exception as e:
-                    log.error(f"JSON decode error for {url}: {e}")
-                    # Fallback
-                    # 回退
-                    text = content.decode('utf-8', errors='ignore')
-                    return json.loads(text)
-        except (aiohttp.ClientConnectorError, ConnectionResetError, ssl.SSLError, asyncio.TimeoutError, TimeoutError) as e:
-            # Fail Fast: Close session and re-raise to abort retry loops
-            # 快速失败：关闭会话并重新引发以中止重试循环
-            log.warning(f"Connection failed for {url}: {type(e).__name__}: {e} - Closing session.")
-            await self.close()
+            client = await self._ensure_session()
+            status, content = await client.fetch_bytes(url)
+            if status != 200:
+                log.error(f"API Error {status}: {url}")
+                return None
+            
+            # BOM is skipped on the raw bytes; invalid UTF-8 falls back to errors="ignore" inside the codec
+            # BOM 在字节层面跳过；非法 UTF-8 由 json_codec 回退为忽略坏字节
+            return json_codec.decode(content, schema)
+        except CircuitOpenError:
+            # Upstream breaker is open: fail fast without a request / 上游熔断中：不发请求直接失败
+            raise
+        except (aiohttp.ClientConnectionError, ConnectionResetError, ssl.SSLError, asyncio.TimeoutError, TimeoutError) as e:
+            # Fail Fast once the client's retries are exhausted: re-raise to abort retry loops.
+            # The shared keep-alive pool is kept, so other in-flight fetches are unaffected.
+            # 客户端重试耗尽后快速失败并重新抛出以中止重试循环；共享连接池保持不变，不影响其他在途请求
+            log.warning(f"Connection failed for {url}: {type(e).__name__}: {e}")
             raise e
         except Exception as e:
             log.error(f"Error fetching {url}: {e}")
@@ -147,33 +179,37 @@ class HulaquanService:
         except Exception as e:
             log.warning(f"Failed to prefetch Saoju artist indexes: {e}")
 
-        # 1. Fetch recommended events with retry logic (legacy behavior)
-        # 1. 使用重试逻辑获取推荐事件（旧有行为）
-        limit = 95
-        data = None
-        while limit >= 10:
-            url = f"{self.BASE_URL}/site/getevent.html?filter=recommendation&access_token=&limit={limit}&page=0"
-            try:
-                data = await self._fetch_json(url)
-            except (aiohttp.ClientConnectorError, ConnectionResetError, ssl.SSLError, asyncio.TimeoutError, TimeoutError):
-                log.warning("Hulaquan unreachable (connection/timeout issue), aborting sync.")
-                data = None
-                break
-            
-            if data is False or data is None:
-                log.warning(f"API returned {data} for limit {limit}, retrying with smaller limit...")
-                limit -= 5
-                continue
-            break
+        # 1. Discover recommended events: concurrent pages with a learned page size
+        # 1. 发现推荐事件：以学习到的分页大小并发抓取多页
+        try:
+            events = await self._discover_events()
+        except (aiohttp.ClientConnectionError, ConnectionResetError, ssl.SSLError, asyncio.TimeoutError, TimeoutError):
+            log.warning("Hulaquan unreachable (connection/timeout issue), aborting sync.")
+            return []
+        except CircuitOpenError as e:
+            log.warning(f"Hulaquan circuit open, aborting sync: {e}")
+            return []
+        except RecommendationPageError as e:
+            log.error(f"Failed to fetch event recommendations: {e}")
+            return []
         
-        if not data or "events" not in data:
-            log.error(f"Failed to fetch event recommendations after retries. Last limit: {limit}")
+        if not events:
+            log.error("Failed to fetch event recommendations.")
             return []
 
         # Filter events by timeMark (following legacy logic)
         # 通过 timeMark 过滤事件（沿用旧有逻辑）
-        basic_infos = [e["basic_info"] for e in data["events"] if e.get("timeMark", 0) > 0]
+        basic_infos = [e["basic_info"] for e in events if e.get("timeMark", 0) > 0]
         event_ids = [str(e["id"]) for e in basic_infos]
+
+        # Fastest-selling events first, so their updates go out earliest in the cycle
+        # 售出速度最快的事件优先抓取，其更新在本轮中最先发出
+        try:
+            hot = await self.get_hot_events(window_hours=24, limit=len(event_ids))
+            rank = {h["event_id"]: i for i, h in enumerate(hot)}
+            event_ids.sort(key=lambda eid: rank.get(eid, len(rank)))
+        except Exception as e:
+            log.warning(f"Failed to rank hot events: {e}")
         
         updates = []
         
@@ -196,10 +232,136 @@ class HulaquanService:
         log.info(f"Synchronization complete. Detected {len(updates)} updates.")
         return updates
 
+    @staticmethod
+    def _round_page_size(size: int) -> int:
+        # Page sizes are multiples of the minimum, so a rejected page splits into aligned minimum pages
+        # 分页大小取最小值的整数倍，被拒绝的页可拆成偏移对齐的最小页
+        step = config.RECOMMEND_PAGE_SIZE_MIN
+        return max(step, min(size, config.RECOMMEND_MAX_EVENTS) // step * step)
+
+    async def _fetch_recommendation_page(self, size: int, page: int) -> Optional[List[Dict]]:
+        """One recommendation page (events ``page*size`` .. ``page*size+size``).
+        Returns None only when the server rejects the size (HTTP 200 without events); HTTP errors and
+        undecodable bodies raise RecommendationPageError and network errors propagate, so neither
+        shrinks the learned page size.
+        仅当服务端以 200 返回空数据（拒绝该分页大小）时返回 None；HTTP 错误、无法解码与网络错误均抛出异常。
+        """
+        url = f"{self.BASE_URL}/site/getevent.html?filter=recommendation&access_token=&limit={size}&page={page}"
+        client = await self._ensure_session()
+        status, content = await client.fetch_bytes(url)
+        if status != 200:
+            raise RecommendationPageError(f"HTTP {status}: {url}")
+        try:
+            data = json_codec.decode(content, RecommendationPage)
+        except ValueError as e:
+            raise RecommendationPageError(f"Undecodable response: {url}: {e}") from e
+        if not data or "events" not in data:
+            return None
+        return data["events"] or []
+
+    async def _fetch_recommendation_range(self, size: int, page: int) -> Tuple[List[Dict], bool, bool]:
+        """Returns (events, rejected, complete).
+        A rejected page is re-requested as minimum-size pages covering the same offsets;
+        ``complete`` is False when some of those failed too. Errors on the page itself propagate.
+        被拒绝的页按最小分页大小拆分重取（偏移相同）；拆分后仍有失败时 complete 为 False。
+        """
+        events = await self._fetch_recommendation_page(size, page)
+        if events is not None:
+            return events, False, True
+        step = config.RECOMMEND_PAGE_SIZE_MIN
+        if size <= step:
+            return [], True, False
+
+        parts = size // step
+        results = await asyncio.gather(
+            *(self._fetch_recommendation_page(step, page * parts + i) for i in range(parts)),
+            return_exceptions=True,
+        )
+        events = []
+        for part in results:
+            if part is None or isinstance(part, BaseException):
+                return events, True, False
+            events.extend(part)
+            if len(part) < step:
+                break
+        return events, True, True
+
+    async def _discover_events(self) -> List[Dict]:
+        """
+        Fetch the recommendation list as concurrent pages and merge them (deduplicated by event id).
+        以并发分页的方式获取推荐列表并合并（按事件 ID 去重）。
+
+        Replaces the legacy single ``limit=95`` request that walked down to 10 on every falsy reply
+        (up to 18 sequential large requests). The page size is learned across cycles: a rejected page halves it
+        and remembers the rejected size for PAGE_SIZE_CEILING_TTL; a clean cycle grows it by one step
+        below that ceiling. A page that fails (network / HTTP error) is skipped, the others still count,
+        and the page size is left alone.
+        取代旧的 limit=95 逐级递减重试；分页大小跨周期学习：被拒绝时减半并记住上限，顺利时逐步增大。
+        单页失败（网络/HTTP 错误）不影响其余页，也不改变分页大小。
+        """
+        step = config.RECOMMEND_PAGE_SIZE_MIN
+        max_events = config.RECOMMEND_MAX_EVENTS
+        size = self._page_size
+        pages = math.ceil(max_events / size)
+
+        results = await asyncio.gather(
+            *(self._fetch_recommendation_range(size, page) for page in range(pages)),
+            return_exceptions=True,
+        )
+
+        events: List[Dict] = []
+        seen: Set[str] = set()
+        rejected = False
+        lost = 0
+        errors = []
+        for result in results:
+            if isinstance(result, BaseException):
+                errors.append(result)
+                continue
+            page_events, page_rejected, complete = result
+            rejected = rejected or page_rejected
+            for event in page_events:
+                event_id = str(event.get("basic_info", {}).get("id", ""))
+                if event_id and event_id not in seen:
+                    seen.add(event_id)
+                    events.append(event)
+            if not complete:
+                lost += 1
+            elif len(page_events) < size:
+                break  # Last page / 最后一页
+
+        if not events and errors:
+            # Nothing usable: let sync_all_data treat it as the upstream being down
+            # 没有可用结果：按上游不可用处理
+            raise errors[0]
+
+        # Learn the page size / 学习分页大小
+        now_ts = time.time()
+        if self._page_size_ceiling and now_ts - self._page_size_ceiling[1] > PAGE_SIZE_CEILING_TTL:
+            self._page_size_ceiling = None
+        if rejected:
+            ceiling = min(size, self._page_size_ceiling[0]) if self._page_size_ceiling else size
+            self._page_size_ceiling = (ceiling, now_ts)
+            self._page_size = self._round_page_size(size // 2)
+        elif not errors and not lost:
+            limit = self._page_size_ceiling[0] - step if self._page_size_ceiling else max_events
+            self._page_size = self._round_page_size(max(size, min(size + step, limit)))
+
+        if errors or lost:
+            log.warning(f"Recommendation discovery: {len(errors) + lost}/{pages} page(s) failed, "
+                        f"continuing with {len(events)} events")
+        log.info(f"Discovered {len(events)} recommended events ({pages} pages of {size}; next page size {self._page_size})")
+        return events[:max_events]
+
     async def _sync_event_wrapper(self, event_id: str) -> List[TicketUpdate]:
         """Exception-safe wrapper for gather."""
         try:
             return await self._sync_event_details(event_id)
+        except CircuitOpenError:
+            # Breaker opened mid-sync; the remaining events are retried next cycle
+            # 同步途中触发熔断，剩余事件下一轮再同步
+            log.debug(f"Skipping event {event_id}: Hulaquan circuit open")
+            return []
         except Exception as e:
             log.error(f"Error syncing event {event_id}: {e}")
             log.error(traceback.format_exc())
@@ -209,15 +371,14 @@ class HulaquanService:
         """Fetch and sync a single event's details and tickets."""
         async with self._fetch_semaphore:
             detail_url = f"{self.BASE_URL}/event/getEventDetails.html?id={event_id}"
-            data = await self._fetch_json(detail_url)
+            data = await self._fetch_json(detail_url, EventDetails)
         
         if not data:
             return []
 
         # Phase 1: Read local context (Fast DB Read)
         # 阶段 1：读取本地上下文（快速数据库读取）
-        loop = asyncio.get_running_loop()
-        ctx = await loop.run_in_executor(None, self._get_sync_context_sync, event_id)
+        ctx = await self._run_read(self._get_sync_context_query, event_id)
         
         # Phase 2: Enrich with Saoju Data (Pure DB Lookup - safe for concurrency)
         # 阶段 2：充实 Saoju 数据（纯数据库查找 - 并发安全）
@@ -225,29 +386,32 @@ class HulaquanService:
         
         # Phase 3: Write Updates (Serialized DB Write)
         # 阶段 3：写入更新（串行数据库写入以避免锁定）
+        loop = asyncio.get_running_loop()
         async with self._db_write_lock:
             return await loop.run_in_executor(None, self._save_synced_data_sync, event_id, data, enrichment)
 
-    def _get_sync_context_sync(self, event_id: str) -> Dict:
+    def _get_sync_context_query(self, session: Session, event_id: str) -> Dict:
         """Read relevant local state before sync."""
-        with session_scope() as session:
-            event = session.get(HulaquanEvent, event_id)
-            if not event:
-                return {"exists": False}
+        event = session.get(
+            HulaquanEvent, event_id,
+            options=[selectinload(HulaquanEvent.tickets).selectinload(HulaquanTicket.cast_members)],
+        )
+        if not event:
+            return {"exists": False}
             
-            # Map ticket ID -> {city, has_casts}
-            tickets_ctx = {}
-            for t in event.tickets:
-                has_casts = len(t.cast_members) > 0
-                tickets_ctx[t.id] = {"city": t.city, "has_casts": has_casts}
+        # Map ticket ID -> {city, has_casts}
+        tickets_ctx = {}
+        for t in event.tickets:
+            has_casts = len(t.cast_members) > 0
+            tickets_ctx[t.id] = {"city": t.city, "has_casts": has_casts}
                 
-            return {
-                "exists": True,
-                "title": event.title,
-                "location": event.location, # Added location
-                "saoju_musical_id": event.saoju_musical_id,
-                "tickets": tickets_ctx
-            }
+        return {
+            "exists": True,
+            "title": event.title,
+            "location": event.location, # Added location
+            "saoju_musical_id": event.saoju_musical_id,
+            "tickets": tickets_ctx
+        }
 
     async def _enrich_ticket_data_async(self, event_id: str, data: dict, ctx: dict) -> Dict:
         """Perfom all Saoju lookups without holding DB lock."""
@@ -275,10 +439,11 @@ class HulaquanService:
         if not event_city_hint:
              event_city_hint = self._city_resolver.resolve_from_text(title)
 
+        search_name = extract_text_in_brackets(title, keep_brackets=False)
+
         # 1. Auto-Link Musical ID if missing
         if not res["saoju_musical_id"]:
             try:
-                search_name = extract_text_in_brackets(title, keep_brackets=False)
                 mid = await self._saoju.resolve_musical_id_by_name(search_name)
                 if mid:
                     res["saoju_musical_id"] = mid
@@ -286,8 +451,8 @@ class HulaquanService:
                 log.warning(f"Failed to auto-link musical ID for {title}: {e}")
 
         # 2. Process Tickets for City/Casts
-        ticket_details = data.get("ticket_details", [])
-        for t_data in ticket_details:
+        tickets = []  # (tid, title, session_time, current_city, has_casts)
+        for t_data in data.get("ticket_details", []):
             tid = str(t_data.get("id"))
             if not tid: continue
             
@@ -296,12 +461,20 @@ class HulaquanService:
             
             # Context for this ticket
             t_ctx = ctx.get("tickets", {}).get(tid, {})
-            current_city = t_ctx.get("city")
-            has_casts = t_ctx.get("has_casts", False)
-            
-            # Parse time
-            session_time = self._parse_api_date(t_data.get("start_time"))
-            
+            tickets.append((tid, t_title, self._parse_api_date(t_data.get("start_time")),
+                            t_ctx.get("city"), t_ctx.get("has_casts", False)))
+
+        # One Saoju range query for every session that may need a city or casts, matched in memory below
+        # 需要城市或卡司的场次一次性批量查询扫剧排期，之后逐票在内存中匹配
+        show_index = None
+        lookup_times = [t[2] for t in tickets if t[2] and (not t[3] or not t[4])]
+        if lookup_times and self._saoju:
+            try:
+                show_index = await self._saoju.build_session_index(search_name, lookup_times)
+            except Exception as e:
+                log.warning(f"Saoju session lookup failed for {event_id}: {e}")
+
+        for tid, t_title, session_time, current_city, has_casts in tickets:
             enrich_t = {}
             
             # City Logic
@@ -318,43 +491,23 @@ class HulaquanService:
                      current_city = city_from_title
                      enrich_t["city"] = current_city
             
-            # If still no city, try Saoju or Event Hint
-            if not current_city and session_time and self._saoju:
-                try:
-                    search_name = extract_text_in_brackets(title, keep_brackets=False)
-                    date_str = session_time.strftime("%Y-%m-%d")
-                    time_str = session_time.strftime("%H:%M")
-                    
-                    # Use Event Hint if available to narrow search
-                    search_city = event_city_hint
-                    
-                    saoju_match = await self._saoju.search_for_musical_by_date(
-                        search_name, date_str, time_str, city=search_city, musical_id=res["saoju_musical_id"]
-                    )
-                    
-                    if saoju_match and saoju_match.get("city"):
-                        enrich_t["city"] = saoju_match.get("city")
-                        current_city = enrich_t["city"]
-                except Exception as e:
-                    pass
+            # If still no city, try Saoju (narrowed by the event hint when available)
+            if not current_city and show_index:
+                saoju_match = show_index.match(session_time, event_city_hint)
+                if saoju_match and saoju_match.city:
+                    enrich_t["city"] = saoju_match.city
+                    current_city = enrich_t["city"]
             
             # Fallback: If we didn't find specific match but have an event hint, assume event city
             if not current_city and event_city_hint:
                 current_city = event_city_hint
                 enrich_t["city"] = current_city
                 
-            # Cast Logic
-            if not has_casts and session_time:
-                 try:
-                    search_name = extract_text_in_brackets(title, keep_brackets=False)
-                    # Use potentially newly found city
-                    c_data = await self._saoju.get_cast_for_hulaquan_session(
-                        search_name, session_time, current_city
-                    )
-                    if c_data:
-                        enrich_t["casts"] = c_data
-                 except Exception as e:
-                    pass
+            # Cast Logic (use the potentially newly found city)
+            if not has_casts and show_index:
+                c_data = show_index.cast(session_time, current_city)
+                if c_data:
+                    enrich_t["casts"] = c_data
             
             if enrich_t:
                 res["tickets"][tid] = enrich_t
@@ -364,6 +517,7 @@ class HulaquanService:
     def _save_synced_data_sync(self, event_id: str, data: dict, enrichment: dict) -> List[TicketUpdate]:
         """Perform all DB writes in a single fast transaction."""
         updates = []
+        stock_points: List[stock_series.StockPoint] = []
         with session_scope() as session:
             # 1. Sync Event
             b_info = data.get("basic_info", {})
@@ -503,6 +657,11 @@ class HulaquanService:
                         ))
                     # ----------------------
 
+                # Stock curve: one point per change (compared before overwriting)
+                # 余票曲线：仅在变化时记录一个点（在覆盖前比较）
+                if is_new or ticket.stock != left_ticket or ticket.total_ticket != total_ticket:
+                    stock_points.append((tid, left_ticket, total_ticket))
+
                 # Updates
                 ticket.title = title
                 ticket.stock = left_ticket
@@ -566,8 +725,11 @@ class HulaquanService:
                             session.add(existing_assoc)
 
 
+            stock_series.append_points(session, event_id, stock_points)
+
             # Write updates to TicketUpdateLog table for persistence
             # 将更新写入 TicketUpdateLog 表以持久化
+            feed_items = []
             for update in updates:
                 # CRITICAL FIX: If cast_names is empty, try to get it from DB
                 # 关键修复：如果 cast_names 为空，尝试从数据库获取
@@ -659,6 +821,12 @@ class HulaquanService:
                     valid_from=update.valid_from
                 )
                 session.add(log_entry)
+                # Live feed gets the same shape as /api/tickets/recent-updates rows
+                # 实时推送的数据与 /api/tickets/recent-updates 返回的行保持一致
+                feed_items.append(update.model_copy(update={
+                    "cast_names": final_cast_names or None,
+                    "created_at": log_entry.created_at,
+                }))
 
             # 3. Cleanup Orphaned Tickets (Diff Cleanup)
             # 3. 清理孤儿票据（差集清理）
@@ -683,9 +851,90 @@ class HulaquanService:
                     log.info(f"Removing orphaned ticket {db_t.id} ({db_t.title}) from event {event_id}")
                     session.delete(db_t)
 
+            # 4. City Resolution (resolved once here so read paths only read a column)
+            # 4. 城市解析（在写入时解析一次，读路径只读列）
+            live_tickets = [t for t in db_tickets if t.id in api_ticket_ids]
+            self._resolve_cities_sync(session, event, live_tickets)
+
             session.commit()
+        # Invalidate cached API responses (web/middleware/response_cache.py)
+        # 使已缓存的 API 响应失效
+        data_version.bump(data_version.HULAQUAN)
+        self.recent_updates.append(feed_items)
+        self.ticket_feed.publish_threadsafe(feed_items)
         return updates
 
+    def _resolve_cities_sync(self, session: Session, event: HulaquanEvent, tickets: List[HulaquanTicket]) -> int:
+        """City-resolution stage: persist canonical city (plus rule) on event and its tickets.
+        城市解析阶段：将标准城市（及命中规则）写入演出及其票据。
+        Returns the number of rows whose resolution changed.
+        """
+        changed = 0
+        live_cities = []
+        for t in tickets:
+            city, rule = self._city_resolver.resolve_ticket_city(t.title, t.city, event.title, event.location)
+            if t.resolved_city != city or t.resolved_city_rule != rule:
+                t.resolved_city = city
+                t.resolved_city_rule = rule
+                session.add(t)
+                changed += 1
+            if t.status != "expired":
+                live_cities.append(t.city)
+
+        city, rule = self._city_resolver.resolve_event_city(event.title, event.location, live_cities)
+        if event.resolved_city != city or event.resolved_city_rule != rule:
+            event.resolved_city = city
+            event.resolved_city_rule = rule
+            session.add(event)
+            changed += 1
+        return changed
+
+    async def refresh_resolved_cities(self, force: bool = False) -> int:
+        """
+        Background re-resolution job: re-resolve every stored city when the mapping changes.
+        后台重解析任务：城市映射文件变化时重新解析所有已存储的城市。
+        Returns the number of rows updated (0 when the mapping is unchanged).
+        """
+        loop = asyncio.get_running_loop()
+        async with self._db_write_lock:
+            return await loop.run_in_executor(None, self._refresh_resolved_cities_sync, force)
+
+    def _refresh_resolved_cities_sync(self, force: bool = False, batch_size: int = 50) -> int:
+
+        self._city_resolver.reload_if_changed()
+        fingerprint = self._city_resolver.fingerprint
+
+        with session_scope() as session:
+            meta = session.get(InternalMetadata, CITY_MAPPING_METADATA_KEY)
+            if not force and meta and meta.value == fingerprint:
+                return 0
+            event_ids = list(session.exec(select(HulaquanEvent.id)).all())
+
+        log.info(f"City mapping changed, re-resolving cities for {len(event_ids)} events...")
+        changed = 0
+        # Short per-batch transactions to avoid holding the SQLite writer
+        # 分批短事务，避免长时间占用 SQLite 写锁
+        for i in range(0, len(event_ids), batch_size):
+            batch = event_ids[i:i + batch_size]
+            with session_scope() as session:
+                stmt = select(HulaquanEvent).options(selectinload(HulaquanEvent.tickets)).where(HulaquanEvent.id.in_(batch))
+                for event in session.exec(stmt).all():
+                    changed += self._resolve_cities_sync(session, event, event.tickets)
+
+        with session_scope() as session:
+            meta = session.get(InternalMetadata, CITY_MAPPING_METADATA_KEY)
+            if not meta:
+                meta = InternalMetadata(key=CITY_MAPPING_METADATA_KEY, value=fingerprint)
+            else:
+                meta.value = fingerprint
+                meta.updated_at = timezone_now()
+            session.add(meta)
+
+        if changed:
+            data_version.bump(data_version.HULAQUAN)
+        log.info(f"City re-resolution complete. Updated {changed} rows.")
+        return changed
+
     def _parse_api_date(self, date_str: Optional[str]) -> Optional[datetime]:
         if not date_str:
             return None
@@ -698,8 +947,7 @@ class HulaquanService:
         """Search events by title query (case-insensitive).
         按标题查询搜索事件（不区分大小写）。
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._search_events_sync, query)
+        return await self._run_read(self._search_events_query, query)
 
     async def search_events_smart(self, query: str) -> List[EventInfo]:
         """
@@ -732,80 +980,20 @@ class HulaquanService:
         
         return results
 
-    def _search_events_sync(self, query: str) -> List[EventInfo]:
-        with session_scope() as session:
-            statement = select(HulaquanEvent).where(HulaquanEvent.title.contains(query))
-            events = session.exec(statement).all()
-            
-            result = []
-            for event in events:
-                # Load tickets
-                # 加载票据
-                tickets = []
-                for t in event.tickets:
-                    if t.status == "expired": continue
-                    
-                    # Fetch cast info
-                    # 获取演员信息
-                    cast_infos = []
-                    stmt_c = (
-                        select(HulaquanCast, TicketCastAssociation.role)
-                        .join(TicketCastAssociation)
-                        .where(TicketCastAssociation.ticket_id == t.id)
-                        .order_by(TicketCastAssociation.rank, HulaquanCast.name)
-                    )
-                    cast_results = session.exec(stmt_c).all()
-                    for c_obj, role in cast_results:
-                        cast_infos.append(CastInfo(name=c_obj.name, role=role))
-
-                    tickets.append(TicketInfo(
-                        id=t.id,
-                        title=t.title,
-                        session_time=t.session_time,
-                        price=t.price,
-                        stock=t.stock,
-                        total_ticket=t.total_ticket,
-                        city=t.city,
-                        status=t.status,
-                        valid_from=t.valid_from,
-                        cast=cast_infos
-                    ))
-                
-                result.append(self._format_event_info(event, tickets))
-            return result
-            
-    async def search_actors(self, query: str) -> List[CastInfo]:
-        """Search actors by name (case-insensitive)."""
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._search_actors_sync, query)
-    
-    def _search_actors_sync(self, query: str) -> List[CastInfo]:
-        from sqlmodel import col
-        with session_scope() as session:
-            # Simple contains search
-            stmt = select(HulaquanCast).where(col(HulaquanCast.name).contains(query))
-            artists = session.exec(stmt).all()
-            return [CastInfo(name=a.name, role="") for a in artists]
-
-    async def get_event(self, event_id: str) -> Optional[EventInfo]:
-        """Get single event details by ID.
-        按 ID 获取单个事件详情。
-        """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._get_event_sync, event_id)
-
-    def _get_event_sync(self, event_id: str) -> Optional[EventInfo]:
-        with session_scope() as session:
-            event = session.get(HulaquanEvent, event_id)
-            if not event:
-                return None
+    def _search_events_query(self, session: Session, query: str) -> List[EventInfo]:
+        statement = select(HulaquanEvent).where(HulaquanEvent.title.contains(query))
+        events = session.exec(statement).all()
             
+        result = []
+        for event in events:
             # Load tickets
+            # 加载票据
             tickets = []
             for t in event.tickets:
                 if t.status == "expired": continue
-                
+                    
                 # Fetch cast info
+                # 获取演员信息
                 cast_infos = []
                 stmt_c = (
                     select(HulaquanCast, TicketCastAssociation.role)
@@ -829,26 +1017,71 @@ class HulaquanService:
                     valid_from=t.valid_from,
                     cast=cast_infos
                 ))
+                
+            result.append(self._format_event_info(event, tickets))
+        return result
+            
+    async def search_actors(self, query: str) -> List[CastInfo]:
+        """Search actors by name (case-insensitive)."""
+        return await self._run_read(self._search_actors_query, query)
+    
+    def _search_actors_query(self, session: Session, query: str) -> List[CastInfo]:
+        from sqlmodel import col
+        # Simple contains search
+        stmt = select(HulaquanCast).where(col(HulaquanCast.name).contains(query))
+        artists = session.exec(stmt).all()
+        return [CastInfo(name=a.name, role="") for a in artists]
+
+    async def get_event(self, event_id: str) -> Optional[EventInfo]:
+        """Get single event details by ID.
+        按 ID 获取单个事件详情。
+        """
+        return await self._run_read(self._get_event_query, event_id)
+
+    def _get_event_query(self, session: Session, event_id: str) -> Optional[EventInfo]:
+        event = session.get(HulaquanEvent, event_id)
+        if not event:
+            return None
             
-            return self._format_event_info(event, tickets)
+        # Load tickets
+        tickets = []
+        for t in event.tickets:
+            if t.status == "expired": continue
+                
+            # Fetch cast info
+            cast_infos = []
+            stmt_c = (
+                select(HulaquanCast, TicketCastAssociation.role)
+                .join(TicketCastAssociation)
+                .where(TicketCastAssociation.ticket_id == t.id)
+                .order_by(TicketCastAssociation.rank, HulaquanCast.name)
+            )
+            cast_results = session.exec(stmt_c).all()
+            for c_obj, role in cast_results:
+                cast_infos.append(CastInfo(name=c_obj.name, role=role))
+
+            tickets.append(TicketInfo(
+                id=t.id,
+                title=t.title,
+                session_time=t.session_time,
+                price=t.price,
+                stock=t.stock,
+                total_ticket=t.total_ticket,
+                city=t.city,
+                status=t.status,
+                valid_from=t.valid_from,
+                cast=cast_infos
+            ))
+            
+        return self._format_event_info(event, tickets)
 
     def _format_event_info(self, event: HulaquanEvent, tickets: List[TicketInfo]) -> EventInfo:
         """Helper to format HulaquanEvent into EventInfo with calculated fields.
         将 HulaquanEvent 格式化为带有计算字段的 EventInfo 的帮助程序。
         """
-        # 1. City Extraction
-        city = extract_title_info(event.title).get("city")
-        if not city and event.location:
-            city = detect_city_in_text(event.location)
-        if not city and tickets:
-            for t in tickets:
-                if t.city:
-                    city = t.city
-                    break
-        
-        # Fallback: Inference from Venue Rules
-        if not city:
-            city = self._apply_city_rules(city, event.location)
+        # 1. City (resolved at write time by _resolve_cities_sync)
+        # 1. 城市（由写入阶段 _resolve_cities_sync 解析）
+        city = event.resolved_city
         
         # 2. Stock and Price Calculation
         total_stock = sum(t.stock for t in tickets)
@@ -898,192 +1131,156 @@ class HulaquanService:
             tickets=tickets
         )
         
-    def _enrich_ticket_city(self, ticket: HulaquanTicket, event: HulaquanEvent) -> Optional[str]:
-        """Resolve city for a ticket using multiple fallback strategies.
-        Order:
-        1. Config Rules (Venue)
-        2. Config Rules (Title)
-        3. DB City
-        4. Ticket Title Extraction
-        5. Event Title Extraction
-        6. Event Location Extraction
-        """
-        # 1. Config Rules (Venue)
-        if event.location:
-            city = self._city_resolver.from_venue(event.location)
-            if city: return city
-
-        # 2. Config Rules (Title) - Check ticket title then event title
-        city = self._city_resolver.from_title(ticket.title)
-        if city: return city
-        
-        city = self._city_resolver.from_title(event.title)
-        if city: return city
-
-        # 3. Existing DB City
-        if ticket.city:
-            return ticket.city
-
-        # 4 & 5. Text Extraction (Title)
-        info = extract_title_info(ticket.title)
-        if info.get("city"): return info.get("city")
-        
-        info = extract_title_info(event.title)
-        if info.get("city"): return info.get("city")
-
-        # 6. Text Extraction (Location)
-        if event.location:
-            city = detect_city_in_text(event.location)
-            if city: return city
-            
-        return None
-
     async def get_events_by_date(self, check_date: datetime, city: Optional[str] = None) -> List[TicketInfo]:
         """Get tickets performing on a specific date.
         获取特定日期演出的票据。
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._get_events_by_date_sync, check_date, city)
+        return await self._run_read(self._get_events_by_date_query, check_date, city)
 
-    def _get_events_by_date_sync(self, check_date: datetime, city: Optional[str] = None) -> List[TicketInfo]:
+    def _get_events_by_date_query(self, session: Session, check_date: datetime, city: Optional[str] = None) -> List[TicketInfo]:
         start_of_day = check_date.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = start_of_day + timedelta(days=1)
         
-        with session_scope() as session:
-            # Optimized: Eager load Event to prevent N+1 queries
-            statement = (
-                select(HulaquanTicket)
-                .options(joinedload(HulaquanTicket.event))
-                .where(
-                    HulaquanTicket.session_time >= start_of_day,
-                    HulaquanTicket.session_time < end_of_day
-                )
+        # City is a stored column now, so the Event join is no longer needed
+        # 城市已持久化为列，无需再关联 Event
+        statement = (
+            select(HulaquanTicket)
+            .where(
+                HulaquanTicket.session_time >= start_of_day,
+                HulaquanTicket.session_time < end_of_day
             )
-            if city:
-                statement = statement.where(HulaquanTicket.city == city)
+        )
+        if city:
+            statement = statement.where(HulaquanTicket.resolved_city == city)
             
-            tickets = session.exec(statement).all()
-            if not tickets:
-                return []
+        tickets = session.exec(statement).all()
+        if not tickets:
+            return []
             
-            # Optimized: Bulk fetch Casts for all retrieved tickets
-            # This reduces N queries to 1 query
-            tids = [t.id for t in tickets]
-            cast_map = {} # tid -> List[CastInfo]
+        # Optimized: Bulk fetch Casts for all retrieved tickets
+        # This reduces N queries to 1 query
+        tids = [t.id for t in tickets]
+        cast_map = {} # tid -> List[CastInfo]
             
-            if tids:
-                stmt_c = (
-                    select(TicketCastAssociation.ticket_id, HulaquanCast.name, TicketCastAssociation.role)
-                    .join(HulaquanCast)
-                    .where(TicketCastAssociation.ticket_id.in_(tids))
-                )
-                cast_rows = session.exec(stmt_c).all()
-                for tid, cname, role in cast_rows:
-                    if tid not in cast_map:
-                        cast_map[tid] = []
-                    cast_map[tid].append(CastInfo(name=cname, role=role))
+        if tids:
+            stmt_c = (
+                select(TicketCastAssociation.ticket_id, HulaquanCast.name, TicketCastAssociation.role)
+                .join(HulaquanCast)
+                .where(TicketCastAssociation.ticket_id.in_(tids))
+            )
+            cast_rows = session.exec(stmt_c).all()
+            for tid, cname, role in cast_rows:
+                if tid not in cast_map:
+                    cast_map[tid] = []
+                cast_map[tid].append(CastInfo(name=cname, role=role))
 
-            result = []
+        result = []
             
-            for t in tickets:
-                # No filtering for expired tickets here as requested for Date View
+        for t in tickets:
+            # No filtering for expired tickets here as requested for Date View
                 
-                # Event is already eager loaded via joinedload
-                event = t.event
+            # City resolved at write time
+            final_city = t.resolved_city or t.city
                 
-                # Enrich City
-                final_city = self._enrich_ticket_city(t, event) if event else t.city
+            # Use pre-fetched cast info
+            cast_infos = cast_map.get(t.id, [])
                 
-                # Use pre-fetched cast info
-                cast_infos = cast_map.get(t.id, [])
-                
-                result.append(TicketInfo(
-                    id=t.id,
-                    event_id=t.event_id,
-                    title=t.title,
-                    session_time=t.session_time,
-                    price=t.price,
-                    stock=t.stock,
-                    total_ticket=t.total_ticket,
-                    city=final_city,
-                    status=t.status,
-                    valid_from=t.valid_from,
-                    cast=cast_infos
-                ))
-            return result
+            result.append(TicketInfo(
+                id=t.id,
+                event_id=t.event_id,
+                title=t.title,
+                session_time=t.session_time,
+                price=t.price,
+                stock=t.stock,
+                total_ticket=t.total_ticket,
+                city=final_city,
+                status=t.status,
+                valid_from=t.valid_from,
+                cast=cast_infos
+            ))
+        return result
+
+
 
 
+    async def get_event_stock_stats(self, event_id: str, window_hours: float = 24,
+                                    include_points: bool = False) -> Dict:
+        """Sell-out velocity, time to sell-out and restocks of one event (services/hulaquan/stock_series.py)."""
+        return await self._run_read(stock_series.event_stock_stats, event_id, window_hours, include_points)
 
+    async def get_hot_events(self, window_hours: float = 24, limit: int = 20) -> List[Dict]:
+        """Events ranked by sell-out velocity over the last ``window_hours``."""
+        return await self._run_read(stock_series.hot_events, window_hours, limit)
 
     async def get_all_events(self) -> List[EventInfo]:
         """Get all known events."""
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._get_all_events_sync)
-
-    def _get_all_events_sync(self) -> List[EventInfo]:
-        with session_scope() as session:
-            events = session.exec(select(HulaquanEvent)).all()
-            results = []
-            for e in events:
-                # We need to process tickets to get stock/price for filtering
-                processed_tickets = []
-                # In list view, we don't necessarily need full ticket details for all events, 
-                # but we need them for total_stock calculation if we want precision.
-                # However, for the list view, we can just pass empty tickets to _format_event_info 
-                # if it can handle it, or just fetch them.
-                # Let's fetch them since we need total_stock.
+        return await self._run_read(self._get_all_events_query)
+
+    def _get_all_events_query(self, session: Session) -> List[EventInfo]:
+        # Tickets of every event in one extra query instead of a lazy load per event
+        # 一次查询加载所有事件的票务，避免逐个事件懒加载
+        events = session.exec(select(HulaquanEvent).options(selectinload(HulaquanEvent.tickets))).all()
+        results = []
+        for e in events:
+            # We need to process tickets to get stock/price for filtering
+            processed_tickets = []
+            # In list view, we don't necessarily need full ticket details for all events, 
+            # but we need them for total_stock calculation if we want precision.
+            # However, for the list view, we can just pass empty tickets to _format_event_info 
+            # if it can handle it, or just fetch them.
+            # Let's fetch them since we need total_stock.
                 
-                # To avoid heavy DB load in get_all_events, we can optimize later.
-                # For now, let's keep it consistent.
+            # To avoid heavy DB load in get_all_events, we can optimize later.
+            # For now, let's keep it consistent.
                 
-                # Actually, let's just use the logic from get_all_events but cleaner.
+            # Actually, let's just use the logic from get_all_events but cleaner.
                 
-                # Filter Expired: Skip events where all sessions are in the past
-                # 过滤已过期：跳过所有场次均已过期的演出
-                all_sessions = [t.session_time for t in e.tickets if t.session_time]
-                if all_sessions:
-                    # Check if the latest session is still in the past
-                    # 检查最晚的场次是否仍在过去
-                    # Using naive comparison assuming session_time is naive (local) and system is local
-                    if max(all_sessions) < datetime.now():
-                        continue
-
-                # Calculate basic info
-                total_stock = sum(t.stock for t in e.tickets)
+            # Filter Expired: Skip events where all sessions are in the past
+            # 过滤已过期：跳过所有场次均已过期的演出
+            all_sessions = [t.session_time for t in e.tickets if t.session_time]
+            if all_sessions:
+                # Check if the latest session is still in the past
+                # 检查最晚的场次是否仍在过去
+                # Using naive comparison assuming session_time is naive (local) and system is local
+                if max(all_sessions) < datetime.now():
+                    continue
+
+            # Calculate basic info
+            total_stock = sum(t.stock for t in e.tickets)
                 
-                if total_stock > 0:
-                    # For performance in list, we might not want to hydrate all CastInfo.
-                    # But _format_event_info expects TicketInfo list.
-                    # Let's just do a simplified version here or call _format_event_info with minimal ticket info.
+            if total_stock > 0:
+                # For performance in list, we might not want to hydrate all CastInfo.
+                # But _format_event_info expects TicketInfo list.
+                # Let's just do a simplified version here or call _format_event_info with minimal ticket info.
                     
-                    tickets_minimal = [TicketInfo(
-                        id=t.id, title=t.title, session_time=t.session_time, 
-                        price=t.price, stock=t.stock, total_ticket=t.total_ticket, 
-                        city=t.city, status=t.status
-                    ) for t in e.tickets if t.status != "expired"]
+                tickets_minimal = [TicketInfo(
+                    id=t.id, title=t.title, session_time=t.session_time, 
+                    price=t.price, stock=t.stock, total_ticket=t.total_ticket, 
+                    city=t.city, status=t.status
+                ) for t in e.tickets if t.status != "expired"]
                     
-                    results.append(self._format_event_info(e, tickets_minimal))
+                results.append(self._format_event_info(e, tickets_minimal))
             
-            # Sort Logic:
-            # 1. City Count (Popular cities first)
-            # 2. Update Time (Recently updated first)
+        # Sort Logic:
+        # 1. City Count (Popular cities first)
+        # 2. Update Time (Recently updated first)
             
-            # Compute City Counts
-            city_counts = {}
-            for r in results:
-                c = r.city or "其他"
-                city_counts[c] = city_counts.get(c, 0) + 1
+        # Compute City Counts
+        city_counts = {}
+        for r in results:
+            c = r.city or "其他"
+            city_counts[c] = city_counts.get(c, 0) + 1
             
-            # Sort
-            def sort_key(item):
-                c_count = city_counts.get(item.city or "其他", 0)
-                # Ensure update_time is comparable (handle None)
-                u_time = item.update_time.timestamp() if item.update_time else 0
-                return (c_count, u_time)
+        # Sort
+        def sort_key(item):
+            c_count = city_counts.get(item.city or "其他", 0)
+            # Ensure update_time is comparable (handle None)
+            u_time = item.update_time.timestamp() if item.update_time else 0
+            return (c_count, u_time)
 
-            results.sort(key=sort_key, reverse=True)
+        results.sort(key=sort_key, reverse=True)
 
-            return results
+        return results
 
     async def fix_legacy_data(self):
         """
@@ -1141,12 +1338,10 @@ class HulaquanService:
         """Get all theater aliases.
         获取所有剧院别名。
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._get_aliases_sync)
+        return await self._run_read(self._get_aliases_query)
 
-    def _get_aliases_sync(self) -> List[HulaquanAlias]:
-        with session_scope() as session:
-            return session.exec(select(HulaquanAlias)).all()
+    def _get_aliases_query(self, session: Session) -> List[HulaquanAlias]:
+        return session.exec(select(HulaquanAlias)).all()
 
     async def add_alias(self, event_id: str, alias: str, search_name: Optional[str] = None):
         """Add or update an alias for an event.
@@ -1172,6 +1367,7 @@ class HulaquanService:
                     alias_obj.search_names = ",".join(curr_names)
             
             session.commit()
+        data_version.bump(data_version.HULAQUAN)
 
 
 
@@ -1180,175 +1376,175 @@ class HulaquanService:
         Try to find event ID by title or alias.
         Returns (id, title) or None.
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._get_event_id_by_name_sync, name)
-
-    def _get_event_id_by_name_sync(self, name: str) -> Optional[Tuple[str, str]]:
-        with session_scope() as session:
-            # 1. Exact title match
-            # 1. 精确标题匹配
-            stmt = select(HulaquanEvent).where(HulaquanEvent.title == name)
-            event = session.exec(stmt).first()
-            if event:
-                return event.id, event.title
-            
-            # 2. Alias match
-            # 2. 别名匹配
-            stmt_a = select(HulaquanAlias).where(HulaquanAlias.alias == name)
-            alias = session.exec(stmt_a).first()
-            if alias:
-                stmt_e = select(HulaquanEvent).where(HulaquanEvent.id == alias.event_id)
-                event = session.exec(stmt_e).first()
-                if event:
-                    return event.id, event.title
+        return await self._run_read(self._get_event_id_by_name_query, name)
+
+    def _get_event_id_by_name_query(self, session: Session, name: str) -> Optional[Tuple[str, str]]:
+        # 1. Exact title match
+        # 1. 精确标题匹配
+        stmt = select(HulaquanEvent).where(HulaquanEvent.title == name)
+        event = session.exec(stmt).first()
+        if event:
+            return event.id, event.title
             
-            # 3. Partial title match
-            # 3. 部分标题匹配
-            stmt_p = select(HulaquanEvent).where(HulaquanEvent.title.contains(name))
-            event = session.exec(stmt_p).first()
+        # 2. Alias match
+        # 2. 别名匹配
+        stmt_a = select(HulaquanAlias).where(HulaquanAlias.alias == name)
+        alias = session.exec(stmt_a).first()
+        if alias:
+            stmt_e = select(HulaquanEvent).where(HulaquanEvent.id == alias.event_id)
+            event = session.exec(stmt_e).first()
             if event:
                 return event.id, event.title
+            
+        # 3. Partial title match
+        # 3. 部分标题匹配
+        stmt_p = select(HulaquanEvent).where(HulaquanEvent.title.contains(name))
+        event = session.exec(stmt_p).first()
+        if event:
+            return event.id, event.title
                 
-            return None
+        return None
     async def get_event_details_by_id(self, event_id: str) -> List[EventInfo]:
         """Get full details for a single event by ID.
         按 ID 获取单个事件的完整详细信息。
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._get_event_details_by_id_sync, event_id)
+        return await self._run_read(self._get_event_details_by_id_query, event_id)
 
-    def _get_event_details_by_id_sync(self, event_id: str) -> List[EventInfo]:
-        from sqlalchemy.orm import selectinload
-        with session_scope() as session:
-            # Optimized: Eager load tickets to avoid N+1 if accessed
-            stmt = select(HulaquanEvent).options(selectinload(HulaquanEvent.tickets)).where(HulaquanEvent.id == event_id)
-            event = session.exec(stmt).first()
+    def _get_event_details_by_id_query(self, session: Session, event_id: str) -> List[EventInfo]:
+        # Optimized: Eager load tickets to avoid N+1 if accessed
+        stmt = select(HulaquanEvent).options(selectinload(HulaquanEvent.tickets)).where(HulaquanEvent.id == event_id)
+        event = session.exec(stmt).first()
             
-            if not event:
-                return []
+        if not event:
+            return []
             
-            # Optimized: Bulk fetch Casts for all tickets of this event
-            tickets_list = event.tickets
-            tids = [t.id for t in tickets_list if t.status != TicketStatus.EXPIRED]
+        # Optimized: Bulk fetch Casts for all tickets of this event
+        tickets_list = event.tickets
+        tids = [t.id for t in tickets_list if t.status != TicketStatus.EXPIRED]
             
-            cast_map = {}
-            if tids:
-                stmt_c = (
-                    select(TicketCastAssociation.ticket_id, HulaquanCast.name, TicketCastAssociation.role)
-                    .join(HulaquanCast)
-                    .where(TicketCastAssociation.ticket_id.in_(tids))
-                )
-                cast_rows = session.exec(stmt_c).all()
-                for tid, cname, role in cast_rows:
-                    if tid not in cast_map:
-                        cast_map[tid] = []
-                    cast_map[tid].append(CastInfo(name=cname, role=role))
+        cast_map = {}
+        if tids:
+            stmt_c = (
+                select(TicketCastAssociation.ticket_id, HulaquanCast.name, TicketCastAssociation.role)
+                .join(HulaquanCast)
+                .where(TicketCastAssociation.ticket_id.in_(tids))
+            )
+            cast_rows = session.exec(stmt_c).all()
+            for tid, cname, role in cast_rows:
+                if tid not in cast_map:
+                    cast_map[tid] = []
+                cast_map[tid].append(CastInfo(name=cname, role=role))
             
-            tickets = []
-            for t in tickets_list:
-                if t.status == TicketStatus.EXPIRED: continue
+        tickets = []
+        for t in tickets_list:
+            if t.status == TicketStatus.EXPIRED: continue
                 
-                # Fetch cast info (from map)
-                cast_infos = cast_map.get(t.id, [])
-
-                tickets.append(TicketInfo(
-                    id=t.id,
-                    title=t.title,
-                    session_time=t.session_time,
-                    price=t.price,
-                    stock=t.stock,
-                    total_ticket=t.total_ticket,
-                    city=t.city,
-                    status=t.status,
-                    valid_from=t.valid_from,
-                    cast=cast_infos
-                ))
+            # Fetch cast info (from map)
+            cast_infos = cast_map.get(t.id, [])
+
+            tickets.append(TicketInfo(
+                id=t.id,
+                title=t.title,
+                session_time=t.session_time,
+                price=t.price,
+                stock=t.stock,
+                total_ticket=t.total_ticket,
+                city=t.city,
+                status=t.status,
+                valid_from=t.valid_from,
+                cast=cast_infos
+            ))
             
-            return [self._format_event_info(event, tickets)]
+        return [self._format_event_info(event, tickets)]
 
     async def search_co_casts(self, cast_names: List[str]) -> List[Dict]:
         """
         Find tickets where ALL specified casts are performing together.
         查找所有指定演员共同演出的票据，返回扁平化数据以适配前端统计。
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._search_co_casts_sync, cast_names)
+        return await self._run_read(self._search_co_casts_query, cast_names)
 
-    def _search_co_casts_sync(self, cast_names: List[str]) -> List[Dict]:
+    def _search_co_casts_query(self, session: Session, cast_names: List[str]) -> List[Dict]:
         if not cast_names:
             return []
             
-        with session_scope() as session:
-            # Find tickets for each cast
-            ticket_sets = []
-            for cast_name in cast_names:
-                stmt = select(TicketCastAssociation.ticket_id).join(HulaquanCast).where(HulaquanCast.name == cast_name)
-                tids = set(session.exec(stmt).all())
-                ticket_sets.append(tids)
-            
-            if not ticket_sets:
-                return []
+        # Tickets of every requested cast in one query / 一次查询所有指定演员的票据
+        ticket_sets = {name: set() for name in cast_names}
+        stmt = (
+            select(TicketCastAssociation.ticket_id, HulaquanCast.name)
+            .join(HulaquanCast)
+            .where(col(HulaquanCast.name).in_(cast_names))
+        )
+        for tid, name in session.exec(stmt).all():
+            ticket_sets[name].add(tid)
                 
-            # Intersect to find common tickets
-            common_tids = set.intersection(*ticket_sets)
-            if not common_tids:
-                return []
+        # Intersect to find common tickets
+        common_tids = set.intersection(*ticket_sets.values())
+        if not common_tids:
+            return []
+
+        # Tickets (+ their events) and the full cast of every common ticket: two queries in total
+        # 共同票据（含所属事件）及其完整卡司：共两次查询
+        tickets = session.exec(
+            select(HulaquanTicket)
+            .where(col(HulaquanTicket.id).in_(common_tids))
+            .options(selectinload(HulaquanTicket.event))
+        ).all()
+        casts_by_ticket: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        stmt_c = (
+            select(TicketCastAssociation.ticket_id, HulaquanCast.name, TicketCastAssociation.role)
+            .join(HulaquanCast)
+            .where(col(TicketCastAssociation.ticket_id).in_(common_tids))
+        )
+        for tid, name, role in session.exec(stmt_c).all():
+            casts_by_ticket.setdefault(tid, []).append((name, role))
             
-            # Fetch ticket details and format
-            results = []
-            for tid in sorted(list(common_tids)):
-                t = session.get(HulaquanTicket, tid)
-                if not t: continue
-                
-                # Fetch cast info for this ticket to get roles
-                stmt_c = (
-                    select(HulaquanCast, TicketCastAssociation.role)
-                    .join(TicketCastAssociation)
-                    .where(TicketCastAssociation.ticket_id == t.id)
-                )
-                cast_results = session.exec(stmt_c).all()
+        # Fetch ticket details and format
+        results = []
+        for t in sorted(tickets, key=lambda t: t.id):
+            cast_results = casts_by_ticket.get(t.id, [])
                 
-                # Map artist name to role
-                role_map = {c_obj.name: role for c_obj, role in cast_results}
+            # Map artist name to role
+            role_map = {name: role for name, role in cast_results}
                 
-                # Order roles based on cast_names
-                ordered_roles = [role_map.get(name, '未知角色') for name in cast_names]
-                role_str = " & ".join(ordered_roles)
+            # Order roles based on cast_names
+            ordered_roles = [role_map.get(name, '未知角色') for name in cast_names]
+            role_str = " & ".join(ordered_roles)
                 
-                # Other casts
-                others = [c_obj.name for c_obj, _ in cast_results if c_obj.name not in cast_names]
+            # Other casts
+            others = [name for name, _ in cast_results if name not in cast_names]
                 
-                # Clean Title
-                clean_title = t.title
-                if t.event:
-                    clean_title = extract_text_in_brackets(t.event.title, keep_brackets=False) or t.event.title
+            # Clean Title
+            clean_title = t.title
+            if t.event:
+                clean_title = extract_text_in_brackets(t.event.title, keep_brackets=False) or t.event.title
                 
-                # Date Formatting
-                dt = t.session_time
-                date_str = "-"
-                year = timezone_now().year
-                if dt:
-                    year = dt.year
-                    weekday_str = ['一', '二', '三', '四', '五', '六', '日'][dt.weekday()]
-                    date_str = f"{dt.month:02d}月{dt.day:02d}日 星期{weekday_str} {dt.strftime('%H:%M')}"
+            # Date Formatting
+            dt = t.session_time
+            date_str = "-"
+            year = timezone_now().year
+            if dt:
+                year = dt.year
+                weekday_str = ['一', '二', '三', '四', '五', '六', '日'][dt.weekday()]
+                date_str = f"{dt.month:02d}月{dt.day:02d}日 星期{weekday_str} {dt.strftime('%H:%M')}"
                 
-                # Enrich City using service logic
-                final_city = self._enrich_ticket_city(t, t.event) if t.event else t.city
-
-                results.append({
-                    "date": date_str,
-                    "year": year,
-                    "title": clean_title,
-                    "role": role_str,
-                    "others": others,
-                    "city": final_city or "未知城市",
-                    "location": (t.event.location if t.event else None) or "未知剧场",
-                    "_raw_time": dt.isoformat() if dt else ""
-                })
+            # City resolved at write time
+            final_city = t.resolved_city or t.city
+
+            results.append({
+                "date": date_str,
+                "year": year,
+                "title": clean_title,
+                "role": role_str,
+                "others": others,
+                "city": final_city or "未知城市",
+                "location": (t.event.location if t.event else None) or "未知剧场",
+                "_raw_time": dt.isoformat() if dt else ""
+            })
             
-            # Sort by time
-            results.sort(key=lambda x: x.get("_raw_time", ""))
-            return results
+        # Sort by time
+        results.sort(key=lambda x: x.get("_raw_time", ""))
+        return results
 
     async def get_recent_updates(
         self,
@@ -1356,94 +1552,83 @@ class HulaquanService:
         change_types: Optional[List[str]] = None
     ) -> List[TicketUpdate]:
         """
-        Get recent ticket updates from the database.
-        从数据库获取最近的票务更新。
+        Get recent ticket updates (served from the in-memory ring buffer).
+        获取最近的票务更新（从内存环形缓冲读取）。
         
         Args:
-            limit: Maximum number of updates to return (default 20, max 100)
+            limit: Updates returned per change type (default 20, max 100)
             change_types: List of change types to filter (e.g. ["new", "restock"])
         
         Returns:
             List of TicketUpdate objects with detailed fields
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._get_recent_updates_sync, limit, change_types)
-    
-    def _get_recent_updates_sync(self, limit: int, change_types: Optional[List[str]]) -> List[TicketUpdate]:
-        # Cap limit to 100 for global safety, but we will use it per-type if types not specified
-        limit = min(limit, 100)
-        
-        with session_scope() as session:
-            now = timezone_now()
-            
-            # Helper to fetch updates for a set of types
-            def fetch_type_updates(types_to_fetch, sub_limit):
-                # We use outerjoin to HulaquanTicket to keep logs even if the ticket record is deleted
-                # Using TicketUpdateLog.session_time for filtering to avoid dependency on the joined table
-                stmt = select(TicketUpdateLog, HulaquanTicket).outerjoin(
-                    HulaquanTicket, TicketUpdateLog.ticket_id == HulaquanTicket.id
-                ).where(
-                    or_(
-                        TicketUpdateLog.session_time >= now,
-                        TicketUpdateLog.session_time == None
-                    )
+        return [u for u, _ in await self._recent_update_items(change_types, limit)]
+
+    async def get_recent_updates_json(self, change_types: Optional[List[str]] = None, limit: int = 20) -> str:
+        """Same as get_recent_updates, as a pre-encoded `{"results": [...]}` body.
+        与 get_recent_updates 相同，但直接返回预编码的 JSON 响应体。
+        """
+        items = await self._recent_update_items(change_types, limit)
+        return '{"results":[' + ",".join(payload for _, payload in items) + ']}'
+
+    async def warm_recent_updates(self):
+        """Seed the ring buffer for the core types at startup."""
+        await self._recent_update_items(None)
+
+    async def _recent_update_items(self, change_types: Optional[List[str]], limit: int = 20):
+        # If no specific types requested, serve the 4 core types (20 each, 80-item buffer)
+        # 未指定类型时返回 4 个核心类型（每类 20 条）
+        types = change_types or RECENT_UPDATE_CORE_TYPES
+        per_type = max(1, min(limit, self.recent_updates.capacity_per_type))
+        missing = self.recent_updates.missing_types(types)
+        if missing:
+            # Cold start for these types: load from TicketUpdateLog once
+            # 这些类型尚未预热：从 TicketUpdateLog 载入一次
+            await self._run_read(self._seed_recent_updates_query, missing)
+        now = timezone_now()
+        short = self.recent_updates.short_types(types, now, per_type)
+        if short:
+            # Past sessions filtered out left too few rows and older ones were evicted: reload from the DB
+            # 过滤掉已过期场次后不足且缓冲曾淘汰过记录：从数据库重新载入
+            await self._run_read(self._seed_recent_updates_query, short, True)
+        return self.recent_updates.snapshot(types, now, per_type)
+
+    def _seed_recent_updates_query(self, session: Session, change_types: List[str], refill: bool = False):
+        now = timezone_now()
+        for ctype in change_types:
+            # We use outerjoin to HulaquanTicket to keep logs even if the ticket record is deleted
+            # Using TicketUpdateLog.session_time for filtering to avoid dependency on the joined table
+            stmt = select(TicketUpdateLog, HulaquanTicket).outerjoin(
+                HulaquanTicket, TicketUpdateLog.ticket_id == HulaquanTicket.id
+            ).where(
+                TicketUpdateLog.change_type == ctype,
+                or_(
+                    TicketUpdateLog.session_time >= now,
+                    TicketUpdateLog.session_time == None
                 )
-                
-                if types_to_fetch:
-                    stmt = stmt.where(TicketUpdateLog.change_type.in_(types_to_fetch))
-                
-                stmt = stmt.order_by(col(TicketUpdateLog.created_at).desc()).limit(sub_limit)
-                return session.exec(stmt).all()
+            ).order_by(col(TicketUpdateLog.created_at).desc()).limit(self.recent_updates.capacity_per_type)
 
-            all_results = []
-            
-            if not change_types:
-                # If no specific types requested by frontend (unlikely in current implementation)
-                # we group by our 4 core types and get 20 for each to build the 80-item buffer
-                core_types = ['new', 'pending', 'restock', 'back']
-                for ctype in core_types:
-                    all_results.extend(fetch_type_updates([ctype], 20))
-            else:
-                # If specific types requested (e.g. user toggled pills)
-                # We still fetch 20 for EACH requested type to ensure depth
-                for ctype in change_types:
-                    all_results.extend(fetch_type_updates([ctype], 20))
-
-            # Deduplicate by ID just in case (though log IDs should be unique)
-            seen_ids = set()
-            unique_results = []
-            for log_item, t_item in all_results:
-                if log_item.id not in seen_ids:
-                    unique_results.append((log_item, t_item))
-                    seen_ids.add(log_item.id)
-
-            # Sort the combined buffer by created_at DESC
-            unique_results.sort(key=lambda x: x[0].created_at, reverse=True)
-            
-            # Convert to TicketUpdate objects
             updates = []
-            # We don't slice yet, let frontend handle the 20-row limit for groups
-            for log, ticket in unique_results:
+            for log_item, ticket in session.exec(stmt).all():
                 cast_names_list = None
-                if log.cast_names:
+                if log_item.cast_names:
                     try:
-                        cast_names_list = json.loads(log.cast_names)
+                        cast_names_list = json.loads(log_item.cast_names)
                     except Exception:
                         pass
-                
+                    
                 updates.append(TicketUpdate(
-                    ticket_id=log.ticket_id,
-                    event_id=log.event_id,
-                    event_title=log.event_title,
-                    change_type=log.change_type,
-                    message=log.message,
-                    session_time=log.session_time,
-                    price=log.price,
-                    stock=log.stock, 
-                    total_ticket=log.total_ticket,
+                    ticket_id=log_item.ticket_id,
+                    event_id=log_item.event_id,
+                    event_title=log_item.event_title,
+                    change_type=log_item.change_type,
+                    message=log_item.message,
+                    session_time=log_item.session_time,
+                    price=log_item.price,
+                    stock=log_item.stock, 
+                    total_ticket=log_item.total_ticket,
                     cast_names=cast_names_list,
-                    created_at=log.created_at,
-                    valid_from=log.valid_from or (ticket.valid_from if ticket else None) 
+                    created_at=log_item.created_at,
+                    valid_from=log_item.valid_from or (ticket.valid_from if ticket else None) 
                 ))
-            
-            return updates
+            self.recent_updates.seed(ctype, updates, refill=refill, now=now)
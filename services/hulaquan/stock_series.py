@@ -0,0 +1,304 @@
+"""
+票务余票时间序列
+Ticket stock time series.
+
+HulaquanTicket 只保存最新的 stock / total_ticket，TicketUpdateLog 只记录状态转换；这里为每张票保存完整的
+(时间, 余票, 总票数) 曲线，供售罄速度、预计售罄时间、回流频率等分析使用，无需扫描日志。
+HulaquanTicket only holds the latest stock; this keeps the whole (ts, stock, total) curve per ticket.
+
+存储（TicketStockSeries）：
+- 仅在余票或总票数变化时追加一个点（新票记录初始点），与票务写入在同一事务中完成
+- 列式：三列各为一个字节数组，值按与前一个点的差分、zigzag + varint 编码（首个差分相对 0），
+  典型一点共占约 3–6 字节
+- 每 CHUNK_POINTS 个点封存为一块，之后只追加到新块，单次追加改写的数据量有上限
+- ``last_ts`` 建有索引：热度排行只读取窗口内有变化的块
+
+Each point is appended only on change, in the same transaction as the ticket write. Columns are
+zigzag-varint delta arrays; chunks of CHUNK_POINTS points are sealed so an append rewrites at most one
+small chunk. ``hot_events`` reads only chunks whose ``last_ts`` falls inside the window.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+from sqlmodel import Session, col, func, select
+
+from services.hulaquan.tables import HulaquanEvent, TicketStockSeries
+
+log = logging.getLogger(__name__)
+
+# Points per chunk before it is sealed / 每块最多点数，写满后封存
+CHUNK_POINTS = 256
+
+# Velocity windows shorter than this are stretched to it, so one early sale doesn't look like a rush
+# 速度计算的最短时间跨度，避免刚开始记录时个别销量被放大
+MIN_VELOCITY_SPAN_SECONDS = 3600
+
+StockPoint = Tuple[str, int, int]  # (ticket_id, stock, total_ticket)
+
+
+# --- Encoding / 编码 ---
+
+def encode_deltas(values: Iterable[int], previous: int = 0) -> bytes:
+    """Zigzag-varint encode ``values`` as differences from their predecessor (the first from ``previous``)."""
+    out = bytearray()
+    for value in values:
+        delta = value - previous
+        previous = value
+        zigzag = (delta << 1) ^ (delta >> 63)
+        while zigzag >= 0x80:
+            out.append((zigzag & 0x7F) | 0x80)
+            zigzag >>= 7
+        out.append(zigzag)
+    return bytes(out)
+
+
+def decode_deltas(data: bytes) -> List[int]:
+    values = []
+    current = 0
+    zigzag = 0
+    shift = 0
+    for byte in data:
+        zigzag |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        current += (zigzag >> 1) ^ -(zigzag & 1)
+        values.append(current)
+        zigzag = 0
+        shift = 0
+    return values
+
+
+@dataclass
+class StockSeries:
+    ticket_id: str
+    event_id: str
+    ts: List[int] = field(default_factory=list)
+    stock: List[int] = field(default_factory=list)
+    total: List[int] = field(default_factory=list)
+    # (ts, stock, total) of the point just before ts[0] when earlier chunks were not loaded
+    # 未加载更早的块时，ts[0] 之前最后一个点 (时间, 余票, 总票数)
+    baseline: Optional[Tuple[int, int, int]] = None
+
+    def extend(self, row: TicketStockSeries):
+        self.ts.extend(decode_deltas(row.ts_deltas))
+        self.stock.extend(decode_deltas(row.stock_deltas))
+        self.total.extend(decode_deltas(row.total_deltas))
+
+
+# --- Writes / 写入 ---
+
+def append_points(session: Session, event_id: str, points: Sequence[StockPoint], ts: Optional[int] = None) -> int:
+    """Append changed (ticket_id, stock, total) points for one event inside the caller's transaction.
+    Points equal to the ticket's last recorded values are skipped. Returns the number appended.
+    在调用方事务中为一个事件追加变化点；与上一个点相同的值会被跳过。
+    """
+    if not points:
+        return 0
+    ts = int(ts if ts is not None else time.time())
+    ticket_ids = [p[0] for p in points]
+
+    open_rows: Dict[str, TicketStockSeries] = {
+        row.ticket_id: row
+        for row in session.exec(
+            select(TicketStockSeries).where(
+                col(TicketStockSeries.ticket_id).in_(ticket_ids),
+                TicketStockSeries.count < CHUNK_POINTS,
+            )
+        ).all()
+    }
+    # Tickets whose latest chunk is sealed continue in a new one / 最新块已封存的票在新块中继续
+    missing = [tid for tid in ticket_ids if tid not in open_rows]
+    sealed: Dict[str, Tuple[int, int, int]] = {}  # ticket_id -> (chunk, last_stock, last_total)
+    if missing:
+        # SQLite takes bare columns next to MAX() from the row holding the maximum
+        # SQLite 中与 MAX() 并列的普通列取自最大值所在行
+        sealed = {
+            ticket_id: (chunk, last_stock, last_total)
+            for ticket_id, chunk, last_stock, last_total in session.exec(
+                select(TicketStockSeries.ticket_id, func.max(TicketStockSeries.chunk),
+                       TicketStockSeries.last_stock, TicketStockSeries.last_total)
+                .where(col(TicketStockSeries.ticket_id).in_(missing))
+                .group_by(TicketStockSeries.ticket_id)
+            ).all()
+        }
+
+    appended = 0
+    for ticket_id, stock, total in points:
+        row = open_rows.get(ticket_id)
+        if row is None:
+            last = sealed.get(ticket_id)
+            if last is not None and last[1:] == (stock, total):
+                continue  # Unchanged since the sealed chunk's last point / 与已封存块的最后一个点相同
+            row = TicketStockSeries(ticket_id=ticket_id, chunk=0 if last is None else last[0] + 1,
+                                    event_id=event_id, first_ts=ts)
+            open_rows[ticket_id] = row
+        elif row.last_stock == stock and row.last_total == total:
+            continue
+
+        if row.count:
+            prev_ts, prev_stock, prev_total = row.last_ts, row.last_stock, row.last_total
+        else:
+            prev_ts = prev_stock = prev_total = 0
+        row.ts_deltas = (row.ts_deltas or b"") + encode_deltas([ts], prev_ts)
+        row.stock_deltas = (row.stock_deltas or b"") + encode_deltas([stock], prev_stock)
+        row.total_deltas = (row.total_deltas or b"") + encode_deltas([total], prev_total)
+        row.count += 1
+        row.last_ts, row.last_stock, row.last_total = ts, stock, total
+        session.add(row)
+        appended += 1
+    return appended
+
+
+# --- Reads / 读取 ---
+
+def load_series(
+    session: Session,
+    *,
+    event_id: Optional[str] = None,
+    ticket_ids: Optional[Sequence[str]] = None,
+    since_ts: Optional[int] = None,
+) -> Dict[str, StockSeries]:
+    """Decode the curves of an event / tickets; ``since_ts`` skips chunks that ended before it.
+
+    When chunks are skipped, the last point of the chunk before the first loaded one (its ``last_*``
+    columns, no decoding needed) becomes ``StockSeries.baseline``, so a change across the boundary counts.
+    跳过的块中最后一个点作为 baseline，跨块边界的变化也会被计入。
+    """
+    stmt = select(TicketStockSeries)
+    if event_id is not None:
+        stmt = stmt.where(TicketStockSeries.event_id == event_id)
+    if ticket_ids is not None:
+        stmt = stmt.where(col(TicketStockSeries.ticket_id).in_(list(ticket_ids)))
+    if since_ts is not None:
+        stmt = stmt.where(TicketStockSeries.last_ts >= since_ts)
+    stmt = stmt.order_by(TicketStockSeries.ticket_id, TicketStockSeries.chunk)
+
+    result: Dict[str, StockSeries] = {}
+    previous_chunks: List[Tuple[str, int]] = []
+    for row in session.exec(stmt).all():
+        series = result.get(row.ticket_id)
+        if series is None:
+            series = result[row.ticket_id] = StockSeries(row.ticket_id, row.event_id)
+            if row.chunk > 0:
+                previous_chunks.append((row.ticket_id, row.chunk - 1))
+        series.extend(row)
+
+    # Chunked to stay under SQLite's bound-parameter limit / 分块查询，避免超过 SQLite 参数上限
+    for i in range(0, len(previous_chunks), 400):
+        baselines = session.exec(
+            select(TicketStockSeries.ticket_id, TicketStockSeries.last_ts,
+                   TicketStockSeries.last_stock, TicketStockSeries.last_total)
+            .where(tuple_(TicketStockSeries.ticket_id, TicketStockSeries.chunk).in_(previous_chunks[i:i + 400]))
+        ).all()
+        for ticket_id, last_ts, last_stock, last_total in baselines:
+            result[ticket_id].baseline = (last_ts, last_stock, last_total)
+    return result
+
+
+def ticket_trend(series: StockSeries, since_ts: int, now_ts: int) -> Dict:
+    """Sold tickets, restocks and sell-out velocity of one ticket over ``[since_ts, now_ts]``.
+
+    - sold: sum of stock decreases between consecutive points inside the window (the first loaded
+      point is compared with ``series.baseline`` when earlier chunks were skipped)
+    - restocks: stock going 0 -> positive, or total_ticket increasing
+    - velocity_per_hour: sold / window span (at least MIN_VELOCITY_SPAN_SECONDS)
+    - hours_to_sellout: current stock / velocity (0 when sold out, None without sales)
+    """
+    sold = 0
+    restocks = 0
+    for i in range(len(series.ts)):
+        if series.ts[i] < since_ts:
+            continue
+        if i:
+            prev_stock, prev_total = series.stock[i - 1], series.total[i - 1]
+        elif series.baseline:
+            _, prev_stock, prev_total = series.baseline
+        else:
+            continue
+        stock = series.stock[i]
+        if stock < prev_stock:
+            sold += prev_stock - stock
+        if (prev_stock == 0 and stock > 0) or series.total[i] > prev_total:
+            restocks += 1
+
+    current = series.stock[-1] if series.stock else 0
+    first_ts = series.baseline[0] if series.baseline else (series.ts[0] if series.ts else since_ts)
+    start = max(since_ts, first_ts)
+    span = max(now_ts - start, MIN_VELOCITY_SPAN_SECONDS)
+    velocity = sold * 3600 / span
+    return {
+        "ticket_id": series.ticket_id,
+        "stock": current,
+        "total": series.total[-1] if series.total else 0,
+        "sold": sold,
+        "restocks": restocks,
+        "velocity_per_hour": round(velocity, 3),
+        "hours_to_sellout": _hours_to_sellout(current, velocity),
+        "points": len(series.ts),
+    }
+
+
+def _hours_to_sellout(stock: int, velocity: float) -> Optional[float]:
+    if stock <= 0:
+        return 0.0
+    if velocity <= 0:
+        return None
+    return round(stock / velocity, 2)
+
+
+def _aggregate(trends: List[Dict]) -> Dict:
+    stock = sum(t["stock"] for t in trends)
+    velocity = sum(t["velocity_per_hour"] for t in trends)
+    return {
+        "stock": stock,
+        "total": sum(t["total"] for t in trends),
+        "sold": sum(t["sold"] for t in trends),
+        "restocks": sum(t["restocks"] for t in trends),
+        "velocity_per_hour": round(velocity, 3),
+        "hours_to_sellout": _hours_to_sellout(stock, velocity),
+        "tickets": len(trends),
+    }
+
+
+def event_stock_stats(session: Session, event_id: str, window_hours: float = 24,
+                      include_points: bool = False) -> Dict:
+    """Per-event sell-out velocity, time to sell-out and restock count (+ per-ticket breakdown)."""
+    now_ts = int(time.time())
+    since_ts = now_ts - int(window_hours * 3600)
+    series = load_series(session, event_id=event_id)
+    trends = []
+    for ticket_id in sorted(series):
+        trend = ticket_trend(series[ticket_id], since_ts, now_ts)
+        if include_points:
+            s = series[ticket_id]
+            trend["curve"] = {"ts": s.ts, "stock": s.stock, "total": s.total}
+        trends.append(trend)
+    return {"event_id": event_id, "window_hours": window_hours, **_aggregate(trends), "by_ticket": trends}
+
+
+def hot_events(session: Session, window_hours: float = 24, limit: int = 20) -> List[Dict]:
+    """Events ranked by sell-out velocity over the window (reads only chunks changed inside it).
+    按窗口内售出速度排序的热门事件（只读取窗口内有变化的块）。
+    """
+    now_ts = int(time.time())
+    since_ts = now_ts - int(window_hours * 3600)
+    by_event: Dict[str, List[Dict]] = {}
+    for s in load_series(session, since_ts=since_ts).values():
+        by_event.setdefault(s.event_id, []).append(ticket_trend(s, since_ts, now_ts))
+
+    ranked = [{"event_id": event_id, **_aggregate(trends)} for event_id, trends in by_event.items()]
+    ranked = [r for r in ranked if r["sold"] or r["restocks"]]
+    ranked.sort(key=lambda r: (r["velocity_per_hour"], r["restocks"]), reverse=True)
+    ranked = ranked[:limit]
+
+    titles = dict(session.exec(
+        select(HulaquanEvent.id, HulaquanEvent.title)
+        .where(col(HulaquanEvent.id).in_([r["event_id"] for r in ranked]))
+    ).all()) if ranked else {}
+    for r in ranked:
+        r["title"] = titles.get(r["event_id"], "")
+    return ranked
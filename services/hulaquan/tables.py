@@ -1,6 +1,7 @@
 from typing import Optional, List
 from enum import Enum
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from services.utils.timezone import now as timezone_now
 
@@ -19,6 +20,12 @@ class TicketCastAssociation(SQLModel, table=True):
     rank: int = Field(default=999)  # 角色排序序号，越小越靠前
     # 角色排序序号，越小越靠前
 
+    __table_args__ = (
+        # Actor -> tickets lookups (co-cast search); the PK only covers ticket_id-first access
+        # 演员 -> 场次查询（同场演员搜索）；主键只覆盖以 ticket_id 开头的访问
+        Index("ix_ticketcastassociation_cast_ticket", "cast_id", "ticket_id"),
+    )
+
 class HulaquanEvent(SQLModel, table=True):
     id: str = Field(primary_key=True) # e.g. "3911"
     # 例如 "3911"
@@ -36,6 +43,11 @@ class HulaquanEvent(SQLModel, table=True):
     saoju_musical_id: Optional[str] = Field(default=None, index=True)
     last_synced_at: Optional[datetime] = None
 
+    # City resolved once at write time (see CityResolver.resolve_event_city)
+    # 写入时解析一次的标准城市
+    resolved_city: Optional[str] = Field(default=None, index=True)
+    resolved_city_rule: Optional[str] = None # e.g. "event_title_text"
+
     tickets: List["HulaquanTicket"] = Relationship(back_populates="event")
 
 class HulaquanTicket(SQLModel, table=True):
@@ -45,12 +57,17 @@ class HulaquanTicket(SQLModel, table=True):
     
     title: str # Original full title line
     # 原始完整标题行
-    session_time: Optional[datetime] = None # Parsed from start_time
-    # 从 start_time 解析
+    session_time: Optional[datetime] = Field(default=None, index=True) # Parsed from start_time
+    # 从 start_time 解析（按日期查看演出时使用范围查询）
     price: float = 0
     stock: int = 0
     total_ticket: int = 0
     city: Optional[str] = None
+
+    # City resolved once at write time (see CityResolver.resolve_ticket_city)
+    # 写入时解析一次的标准城市
+    resolved_city: Optional[str] = Field(default=None, index=True)
+    resolved_city_rule: Optional[str] = None # e.g. "venue_keyword"
     
     status: str = Field(default="active") # active, sold_out, pending
 
@@ -59,6 +76,24 @@ class HulaquanTicket(SQLModel, table=True):
     event: Optional[HulaquanEvent] = Relationship(back_populates="tickets")
     cast_members: List["HulaquanCast"] = Relationship(back_populates="tickets", link_model=TicketCastAssociation)
 
+class TicketStockSeries(SQLModel, table=True):
+    """Append-only stock curve of one ticket, stored in chunks (see services/hulaquan/stock_series.py).
+    单张票的余票曲线（只追加、按块存储）：时间戳 / 余票 / 总票数三列各为差分编码的字节数组，仅在变化时追加。
+    """
+    ticket_id: str = Field(primary_key=True)
+    chunk: int = Field(default=0, primary_key=True)
+    event_id: str = Field(index=True)
+    count: int = 0 # points in this chunk
+    # 本块的点数
+    first_ts: int = 0 # epoch seconds
+    last_ts: int = Field(default=0, index=True)
+    last_stock: int = 0
+    last_total: int = 0
+    ts_deltas: bytes = b""
+    stock_deltas: bytes = b""
+    total_deltas: bytes = b""
+
+
 class HulaquanCast(SQLModel, table=True):
     id: int = Field(primary_key=True)
     name: str = Field(index=True) # e.g. "丁辰西"
@@ -91,6 +126,12 @@ class SaojuShow(SQLModel, table=True):
     source: str = "api_unknown" # "csv_history", "api_daily", "api_tour"
     updated_at: datetime = Field(default_factory=timezone_now)
 
+    __table_args__ = (
+        # Day/city lookups; the PK is (date, musical_name, city) so city can't narrow the range
+        # 按日期+城市查询；主键为 (date, musical_name, city)，城市条件无法利用主键收窄范围
+        Index("ix_saojushow_date_city", "date", "city"),
+    )
+
 
 class SaojuChangeLog(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -101,6 +142,17 @@ class SaojuChangeLog(SQLModel, table=True):
     details: str # JSON or text summary
 
 
+class SaojuDayFingerprint(SQLModel, table=True):
+    """Hash of one day's normalized search_day show_list (incremental Saoju sync)."""
+    date: str = Field(primary_key=True) # "2026-01-01"
+    content_hash: str
+    show_count: int = 0
+    fetched_at: datetime = Field(default_factory=timezone_now) # last successful fetch
+    # 最近一次成功抓取
+    changed_at: datetime = Field(default_factory=timezone_now) # last time the hash changed
+    # 最近一次内容变化
+
+
 class HulaquanSearchLog(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=timezone_now)
@@ -133,3 +185,9 @@ class TicketUpdateLog(SQLModel, table=True):
     valid_from: Optional[str] = None
     
     created_at: datetime = Field(default_factory=timezone_now, index=True)
+
+    __table_args__ = (
+        # Recent updates: equality on change_type, newest first, session_time filtered from the index
+        # 最近动态：change_type 等值 + created_at 倒序，session_time 过滤无需回表
+        Index("ix_ticketupdatelog_type_created_session", "change_type", "created_at", "session_time"),
+    )
@@ -0,0 +1,118 @@
+"""
+票务动态实时推送（进程内广播）
+In-process broadcaster for live TicketUpdate fan-out.
+
+同步写入方在提交后发布新的 TicketUpdate，SSE / WebSocket 订阅者按演出/类型/演员过滤接收。
+每条更新只序列化一次，再分发给所有匹配的订阅者。
+The sync writer publishes committed TicketUpdates; SSE/WebSocket subscribers receive the ones
+matching their event/type/actor filters. Each update is JSON-encoded once per publish.
+"""
+import asyncio
+import logging
+from typing import Iterable, List, Optional, Set, Tuple
+
+from services.hulaquan.models import TicketUpdate
+
+log = logging.getLogger(__name__)
+
+
+class TicketFeedSubscription:
+    """A single subscriber: bounded queue of (TicketUpdate, encoded_json) plus its filters."""
+
+    def __init__(self, feed: "TicketUpdateBroadcaster", event_ids: Optional[Set[str]] = None,
+                 change_types: Optional[Set[str]] = None, actors: Optional[Set[str]] = None,
+                 queue_size: int = 256):
+        self._feed = feed
+        self.event_ids = event_ids or None
+        self.change_types = change_types or None
+        self.actors = actors or None
+        self.queue: "asyncio.Queue[Tuple[TicketUpdate, str]]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def matches(self, update: TicketUpdate) -> bool:
+        if self.event_ids and update.event_id not in self.event_ids:
+            return False
+        if self.change_types and update.change_type not in self.change_types:
+            return False
+        if self.actors and not self.actors.intersection(update.cast_names or ()):
+            return False
+        return True
+
+    def offer(self, item: Tuple[TicketUpdate, str]):
+        # Slow consumer: drop the oldest item instead of blocking the publisher
+        # 慢消费者：丢弃最旧的消息，而不是阻塞发布方
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(item)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Tuple[TicketUpdate, str]]:
+        """Next (update, json) or None on timeout (callers use the gap to send heartbeats)."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self._feed.unsubscribe(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TicketUpdateBroadcaster:
+    """票务动态广播器"""
+
+    def __init__(self):
+        self._subscribers: List[TicketFeedSubscription] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, event_ids: Optional[Iterable[str]] = None,
+                  change_types: Optional[Iterable[str]] = None,
+                  actors: Optional[Iterable[str]] = None) -> TicketFeedSubscription:
+        """Register a subscriber. Must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        sub = TicketFeedSubscription(
+            self,
+            event_ids=set(event_ids) if event_ids else None,
+            change_types=set(change_types) if change_types else None,
+            actors=set(actors) if actors else None,
+        )
+        self._subscribers.append(sub)
+        log.info(f"Ticket feed subscriber joined ({len(self._subscribers)} active)")
+        return sub
+
+    def unsubscribe(self, sub: TicketFeedSubscription):
+        if sub in self._subscribers:
+            self._subscribers.remove(sub)
+            log.info(f"Ticket feed subscriber left ({len(self._subscribers)} active, dropped {sub.dropped})")
+
+    def publish(self, updates: Iterable[TicketUpdate]):
+        """Fan out updates to matching subscribers. Must be called from the event loop."""
+        if not self._subscribers:
+            return
+        for update in updates:
+            item = (update, update.model_dump_json())
+            self.published += 1
+            for sub in list(self._subscribers):
+                if sub.matches(update):
+                    sub.offer(item)
+
+    def publish_threadsafe(self, updates: List[TicketUpdate]):
+        """Publish from a worker thread (e.g. the sync writer running in an executor).
+        从工作线程发布（例如在线程池中运行的同步写入方）。
+        """
+        if not updates or not self._subscribers or self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self.publish, updates)
@@ -5,7 +5,7 @@ import os
 from datetime import datetime, timedelta
 from typing import List, Optional, Set
 
-from sqlmodel import Session, select, col
+from sqlmodel import Session, select, col, func
 
 from services.db.connection import get_engine, session_scope
 from services.db.models import (
@@ -21,6 +21,7 @@ from services.db.models.base import SubscriptionTargetKind
 from services.hulaquan.tables import TicketUpdateLog, HulaquanCast, TicketCastAssociation
 from services.hulaquan.models import TicketUpdate
 from services.notification.config import CHANGE_TYPE_LEVEL_MAP
+from services.system.metrics import metrics
 
 log = logging.getLogger(__name__)
 
@@ -31,6 +32,18 @@ BACKFILL_HOURS = 24  #补发时限
 
 
 
+def _collect_queue_depth():
+    # Pending SendQueue rows (web produces, bot consumes) / 发送队列积压（web 入队，bot 消费）
+    with session_scope(readonly=True) as db:
+        pending = db.exec(
+            select(func.count()).select_from(SendQueue).where(SendQueue.status == SendQueueStatus.PENDING)
+        ).one()
+    yield "send_queue_pending", pending, None
+
+
+metrics.register_collector(_collect_queue_depth)
+
+
 class NotificationEngine:
     """
     通知引擎 - 将 TicketUpdate 匹配订阅并入队发送。
@@ -63,7 +76,9 @@ class NotificationEngine:
             return 0
         
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._process_updates_sync, updates)
+        enqueued = await loop.run_in_executor(None, self._process_updates_sync, updates)
+        metrics.inc("notifications_enqueued_total", enqueued)
+        return enqueued
     
     
     def _process_updates_sync(self, updates: List[TicketUpdate]) -> int:
@@ -385,7 +400,7 @@ class NotificationEngine:
     
     def _get_pending_items(self, limit: int) -> List[SendQueue]:
         """获取待发送的队列项。"""
-        with session_scope() as db:
+        with session_scope(readonly=True) as db:
             stmt = (
                 select(SendQueue)
                 .where(
@@ -409,7 +424,7 @@ class NotificationEngine:
         Returns:
             QQ号字符串,如果未绑定QQ则返回None
         """
-        with session_scope() as db:
+        with session_scope(readonly=True) as db:
             stmt = select(UserAuthMethod).where(
                 UserAuthMethod.user_id == user_id,
                 UserAuthMethod.provider == "qq"
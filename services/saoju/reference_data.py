@@ -0,0 +1,164 @@
+"""
+扫剧参考数据（全量目录）共享缓存
+Shared cache for Saoju's full reference dumps (musical/, musicalcast/, artist/, role/, stage/, theatre/, city/).
+
+这些接口每次返回数 MB 的全量数据，且很少变化。原先 sync_musical_data、_build_artist_indexes、
+fetch_saoju_artist_list 各自独立下载；现在统一经由本模块：按数据集设置 TTL、并发请求合并为一次
+（single-flight）、持久化到 SaojuCache，重启后无需重新下载。
+These endpoints return multi-MB catalogues that rarely change. All callers share one store with a per-dataset
+TTL, single-flight loading (concurrent callers await the same download) and persistence in SaojuCache, so
+repeated musical syncs only pay for their tour/schedule/show requests. A failed refresh keeps serving the
+stale copy.
+
+过期但已有副本时按 stale-while-revalidate 处理：立即返回旧副本，后台刷新（同样 single-flight），
+上游故障/熔断期间调用方不会被数 MB 的下载或超时阻塞。
+Expired datasets that still have a copy are served immediately while a background refresh runs.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlmodel import select
+
+from services.crawler import json_codec
+from services.db.connection import session_scope
+from services.db.executor import db_executor
+from services.hulaquan.tables import SaojuCache
+from services.utils.timezone import now as timezone_now
+
+log = logging.getLogger(__name__)
+
+# Dataset -> TTL. musicalcast grows with every cast announcement; the rest is near-static.
+# 数据集 -> 有效期。musicalcast 随卡司公布持续增长，其余几乎不变。
+DATASET_TTLS: Dict[str, timedelta] = {
+    "musicalcast": timedelta(hours=12),
+    "musical": timedelta(days=1),
+    "role": timedelta(days=1),
+    "artist": timedelta(days=3),
+    "stage": timedelta(days=3),
+    "theatre": timedelta(days=3),
+    "city": timedelta(days=7),
+}
+
+_CACHE_KEY_PREFIX = "ref:"
+
+
+class ReferenceDataStore:
+    """TTL + single-flight cache for Saoju reference datasets."""
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Optional[Any]]]):
+        # fetch(path) -> parsed JSON or None (SaojuService._fetch_json)
+        self._fetch = fetch
+        self._data: Dict[str, Tuple[List[Dict], datetime]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._load_task: Optional[asyncio.Task] = None
+        self._derived: Dict[str, Tuple[Tuple, Any]] = {}
+        self.downloads = 0
+
+    def _is_fresh(self, name: str) -> bool:
+        entry = self._data.get(name)
+        return bool(entry) and (timezone_now() - entry[1]) < DATASET_TTLS[name]
+
+    async def _load_persisted(self):
+        # Once per process; concurrent first callers all wait for the same load
+        # 每个进程只加载一次，并发的首批调用方等待同一次加载
+        if self._load_task is None:
+            self._load_task = asyncio.create_task(self._load_persisted_once())
+        await asyncio.shield(self._load_task)
+
+    async def _load_persisted_once(self):
+        try:
+            loaded = await db_executor.run(self._load_persisted_sync)
+            for name, entry in loaded.items():
+                self._data.setdefault(name, entry)
+            if loaded:
+                log.info(f"Loaded Saoju reference data from DB: {', '.join(sorted(loaded))}")
+        except Exception as e:
+            log.warning(f"Failed to load Saoju reference data from DB: {e}")
+
+    def _load_persisted_sync(self) -> Dict[str, Tuple[List[Dict], datetime]]:
+        keys = [f"{_CACHE_KEY_PREFIX}{name}" for name in DATASET_TTLS]
+        result = {}
+        with session_scope(readonly=True) as session:
+            for cache in session.exec(select(SaojuCache).where(SaojuCache.key.in_(keys))).all():
+                payload = json_codec.loads(cache.data)
+                fetched_at = datetime.fromisoformat(payload["fetched_at"])
+                result[cache.key[len(_CACHE_KEY_PREFIX):]] = (payload["items"], fetched_at)
+        return result
+
+    def _persist_sync(self, name: str, items: List[Dict], fetched_at: datetime):
+        data = json.dumps({"fetched_at": fetched_at.isoformat(), "items": items}, ensure_ascii=False)
+        key = f"{_CACHE_KEY_PREFIX}{name}"
+        with session_scope() as session:
+            cache = session.get(SaojuCache, key)
+            if cache is None:
+                cache = SaojuCache(key=key, data=data)
+            else:
+                cache.data = data
+                cache.updated_at = fetched_at
+            session.add(cache)
+
+    async def _download(self, name: str) -> Optional[List[Dict]]:
+        items = await self._fetch(f"{name}/")
+        if not items:
+            stale = self._data.get(name)
+            if stale:
+                log.warning(f"Saoju reference '{name}' refresh failed, serving copy from {stale[1]}")
+                return stale[0]
+            return None
+
+        fetched_at = timezone_now()
+        self._data[name] = (items, fetched_at)
+        self.downloads += 1
+        log.info(f"Downloaded Saoju reference '{name}' ({len(items)} items)")
+        try:
+            await db_executor.run(self._persist_sync, name, items, fetched_at)
+        except Exception as e:
+            log.warning(f"Failed to persist Saoju reference '{name}': {e}")
+        return items
+
+    def _refresh(self, name: str) -> asyncio.Task:
+        task = self._inflight.get(name)
+        if task is None:
+            task = asyncio.create_task(self._download(name))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _t, n=name: self._inflight.pop(n, None))
+        return task
+
+    async def get(self, name: str, force: bool = False) -> Optional[List[Dict]]:
+        """Dataset items, downloading at most once per TTL no matter how many callers ask.
+        An expired copy is returned as-is while it is refreshed in the background (``force`` waits).
+        """
+        if name not in DATASET_TTLS:
+            raise KeyError(f"Unknown Saoju reference dataset: {name}")
+        await self._load_persisted()
+        if not force and self._is_fresh(name):
+            return self._data[name][0]
+
+        task = self._refresh(name)
+        if not force and name in self._data:
+            # Stale-while-revalidate: the download finishes (or fails) on its own
+            # 先返回旧副本，下载在后台完成（失败时保留旧副本）
+            return self._data[name][0]
+        # shield: one caller being cancelled must not cancel the shared download
+        # shield：单个调用方取消不应取消共享下载
+        return await asyncio.shield(task)
+
+    async def get_many(self, *names: str) -> List[Optional[List[Dict]]]:
+        """Fetch several datasets concurrently."""
+        return list(await asyncio.gather(*(self.get(name) for name in names)))
+
+    async def derived(self, key: str, names: Tuple[str, ...], build: Callable[..., Any]) -> Any:
+        """Lookup tables built from datasets, rebuilt only when one of the datasets was refreshed.
+        由数据集派生的查找表，仅在数据集刷新后重建。
+        """
+        datasets = await self.get_many(*names)
+        version = tuple(self._data[n][1] if n in self._data else None for n in names)
+        cached = self._derived.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        value = build(*[d or [] for d in datasets])
+        self._derived[key] = (version, value)
+        return value
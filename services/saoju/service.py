@@ -8,19 +8,58 @@ import aiohttp
 from sqlmodel import select
 from services.utils.timezone import now as timezone_now
 from services.db.connection import session_scope
-from services.hulaquan.tables import SaojuCache, SaojuShow, SaojuChangeLog
+from services.db.executor import db_executor
+from services.config import config
+from services.crawler.advanced_client import RETRY_STATUSES, AdvancedCrawlerClient, get_client
+from services.crawler import json_codec
+from services.crawler.crawl_executor import crawl_executor
+from services.crawler.schemas import SaojuDayShows
+from services.crawler.smart_retry import RetryConfig, RetryStrategy
+from services.hulaquan.tables import SaojuCache, SaojuShow
+from services.saoju.reference_data import ReferenceDataStore
+from services.saoju.session_match import SessionShowIndex, load_session_index, parse_cast_str, title_overlaps
+from services.saoju.show_cdc import (
+    apply_show_changes,
+    day_fingerprint,
+    load_day_fingerprints,
+    parse_show_list,
+    refetch_interval,
+    save_day_fingerprints,
+)
+from services.system import data_version
+from services.system.network_health import CircuitOpenError, upstream_monitor
 
 log = logging.getLogger(__name__)
 
+
+def _build_cast_resolution(cast_data: List[Dict], artist_data: List[Dict], role_data: List[Dict]):
+    # musicalcast_pk -> {artist: id, role: id}, artist_pk -> name, role_pk -> name
+    cast_lookup = {item["pk"]: item.get("fields", {}) for item in cast_data}
+    artist_lookup = {item["pk"]: item.get("fields", {}).get("name") for item in artist_data}
+    role_lookup = {item["pk"]: item.get("fields", {}).get("name") for item in role_data}
+    return cast_lookup, artist_lookup, role_lookup
+
+
+def _build_venue_resolution(stages: List[Dict], theatres: List[Dict], cities: List[Dict]):
+    stage_map = {s["pk"]: s.get("fields", {}) for s in stages} # has theatre_id
+    theatre_map = {t["pk"]: t.get("fields", {}) for t in theatres} # has city_id, name
+    city_map = {c["pk"]: c.get("fields", {}).get("name") for c in cities}
+    return stage_map, theatre_map, city_map
+
+
 class SaojuService:
-    API_BASE = "https://y.saoju.net/yyj/api"
+    API_HOST = "https://y.saoju.net"
+    API_BASE = f"{API_HOST}/yyj/api"
+    USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     
     def __init__(self):
-        self._session: Optional[aiohttp.ClientSession] = None
         self._day_cache: Dict[str, Dict] = {} # Key: date_str|city
         self.data: Dict = {}
         self.CACHE_KEY = "global_cache"
         self.load_data()
+        # Full catalogue dumps (musicalcast/, artist/, ...) shared by every caller
+        # 全量目录数据（musicalcast/、artist/ 等）由所有调用方共享
+        self.reference = ReferenceDataStore(self._fetch_json)
         
         # Ensure base structure
         self.data.setdefault("artists_map", {})
@@ -38,7 +77,7 @@ class SaojuService:
 
     def load_data(self):
         try:
-            with session_scope() as session:
+            with session_scope(readonly=True) as session:
                 # Create table if not exists (usually handled by migration/app startup but safe to ensure here or assume handled)
                 # Ideally, SQLModel.metadata.create_all(engine) is called somewhere.
                 # Since I added a new table, I should probably ensure it exists.
@@ -48,7 +87,7 @@ class SaojuService:
                 # For safety, I'll just query.
                 cache = session.exec(select(SaojuCache).where(SaojuCache.key == self.CACHE_KEY)).first()
                 if cache and cache.data:
-                    self.data = json.loads(cache.data)
+                    self.data = json_codec.loads(cache.data)
                     log.info(f"Loaded Saoju cache from DB (key={self.CACHE_KEY})")
                 else:
                     self.data = {}
@@ -59,8 +98,17 @@ class SaojuService:
             self.data = {}
 
     def save_data(self):
+        self._write_cache(json.dumps(self.data, ensure_ascii=False))
+
+    async def save_data_async(self):
+        """save_data for async callers: serialize on the loop (a consistent snapshot of self.data,
+        which coroutines keep mutating), write on the DB executor.
+        异步版本：在事件循环上序列化（保证快照一致），在数据库线程池中写入。
+        """
+        await db_executor.run(self._write_cache, json.dumps(self.data, ensure_ascii=False))
+
+    def _write_cache(self, json_str: str):
         try:
-            json_str = json.dumps(self.data, ensure_ascii=False)
             with session_scope() as session:
                 cache = session.exec(select(SaojuCache).where(SaojuCache.key == self.CACHE_KEY)).first()
                 if not cache:
@@ -71,6 +119,7 @@ class SaojuService:
                     cache.updated_at = timezone_now()
                     session.add(cache)
                 # session_scope auto commits
+            data_version.bump(data_version.SAOJU)
             log.info(f"Saved Saoju cache to DB (key={self.CACHE_KEY})")
         except Exception as e:
             log.error(f"Failed to save cache to DB: {e}")
@@ -80,71 +129,64 @@ class SaojuService:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self._session and not self._session.closed:
-            await self.close()
-
-
-    async def _ensure_session(self):
-        if self._session is None or self._session.closed:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            }
-            # 增加连接池大小和配置
-            connector = aiohttp.TCPConnector(limit=100, limit_per_host=30, force_close=False)
-            timeout = aiohttp.ClientTimeout(total=60, connect=10)
-            self._session = aiohttp.ClientSession(
-                headers=headers, 
-                timeout=timeout,
-                connector=connector
-            )
+        await self.close()
+
+
+    async def _ensure_session(self) -> AdvancedCrawlerClient:
+        # Process-wide client for y.saoju.net: keep-alive pool, adaptive retry (health-aware DNS ordering
+        # only with HLQ_CRAWL_BACKGROUND_PROBES). Every attempt also takes a crawl_executor slot + token.
+        # 进程内共享的 y.saoju.net 客户端：长连接复用、自适应重试（健康节点优先需开启 HLQ_CRAWL_BACKGROUND_PROBES）；
+        # 每次尝试占用 crawl_executor 名额
+        return await get_client(
+            self.API_HOST,
+            pool_size=config.CRAWL_MAX_CONCURRENCY_PER_HOST,
+            enable_health_probe=config.CRAWL_BACKGROUND_PROBES,
+            enable_keepalive_probes=config.CRAWL_BACKGROUND_PROBES,
+            headers={"User-Agent": self.USER_AGENT},
+            timeout=aiohttp.ClientTimeout(total=60, connect=10),
+            retry_config=RetryConfig(max_retries=3, base_delay=1.0, max_delay=8.0, give_up_probability=0.0),
+            retry_strategy=RetryStrategy.EXPONENTIAL_BACKOFF,
+            retry_statuses=RETRY_STATUSES,
+            executor=crawl_executor,
+            breaker=upstream_monitor.breaker(data_version.SAOJU, probe_url=self.API_HOST),
+        )
 
     async def close(self):
-        if self._session and not self._session.closed:
-            await self._session.close()
+        # The shared client outlives this service (close_all_clients() runs at process shutdown),
+        # so leaving `async with saoju_service` no longer tears down other callers' connections.
+        # 共享客户端由进程关闭时的 close_all_clients() 统一关闭，退出 async with 不再断开其他调用方的连接
+        pass
 
-    async def _fetch_json(self, path: str, params: Optional[Dict] = None, retries: int = 3) -> Optional[Dict]:
+    async def _fetch_json(self, path: str, params: Optional[Dict] = None, schema=None) -> Optional[Dict]:
         url = f"{self.API_BASE}/{path.lstrip('/')}"
-        
-        for attempt in range(retries):
-            try:
-                await self._ensure_session()
-                async with self._session.get(url, params=params) as response:
-                    if response.status != 200:
-                        log.error(f"Saoju API Error {response.status}: {url}")
-                        return None
-                    return await response.json(content_type=None)
-            except (aiohttp.ClientConnectionError, aiohttp.ClientConnectorError, asyncio.TimeoutError) as e:
-                if attempt < retries - 1:
-                    # 指数退避: 1s, 2s, 4s
-                    backoff_time = 2 ** attempt
-                    log.warning(f"连接错误,重试 {attempt + 1}/{retries - 1} (等待{backoff_time}秒): {type(e).__name__}")
-                    # DO NOT close session here as it kills concurrent requests
-                    await asyncio.sleep(backoff_time)  # 退避等待
-                else:
-                    log.error(
-                        f"Error fetching Saoju API\n"
-                        f"    URL: {url}\n"
-                        f"    Params: {params}\n"
-                        f"    Error: {type(e).__name__}: {e}"
-                    )
-                    # Do not close session on error, let it persist or be closed by lifespan
-                    return None
-            except Exception as e:
-                log.error(
-                    f"Error fetching Saoju API\n"
-                    f"    URL: {url}\n"
-                    f"    Params: {params}\n"
-                    f"    Error: {type(e).__name__}: {e}"
-                )
+        try:
+            client = await self._ensure_session()
+            status, body = await client.fetch_bytes(url, params=params)
+            if status != 200:
+                log.error(f"Saoju API Error {status}: {url}")
                 return None
+            return json_codec.decode(body, schema)
+        except CircuitOpenError as e:
+            # Breaker open: callers keep serving what is already in the DB / 熔断中：调用方继续使用库中已有数据
+            log.debug(f"Skip Saoju fetch {path}: {e}")
+            return None
+        except Exception as e:
+            # Connection errors / timeouts reach here only after the client's retries are exhausted
+            # 连接错误/超时在客户端重试耗尽后才会到这里
+            log.error(
+                f"Error fetching Saoju API\n"
+                f"    URL: {url}\n"
+                f"    Params: {params}\n"
+                f"    Error: {type(e).__name__}: {e}"
+            )
+            return None
 
     async def search_for_musical_by_date(self, search_name: str, date_str: str, time_str: str, city: Optional[str] = None, musical_id: Optional[str] = None) -> Optional[Dict]:
         """
         Search for a musical show in LOCAL DB ONLY (SaojuShow).
         Replaces the old network-dependent logic to prevent N+1 request issues.
         """
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._search_show_db_sync, search_name, date_str, time_str, city)
+        return await db_executor.run(self._search_show_db_sync, search_name, date_str, time_str, city)
 
     def _search_show_db_sync(self, search_name: str, date_str: str, time_str: str, city: Optional[str] = None) -> Optional[Dict]:
         try:
@@ -152,7 +194,7 @@ class SaojuService:
         except ValueError:
             return None
 
-        with session_scope() as session:
+        with session_scope(readonly=True) as session:
             # Index scan on date
             stmt = select(SaojuShow).where(SaojuShow.date == target_dt)
             if city:
@@ -186,8 +228,10 @@ class SaojuService:
         """
         if not search_name or not session_time:
             return []
-            
-        with session_scope() as session:
+        return await db_executor.run(self._get_cast_for_session_sync, search_name, session_time, city)
+
+    def _get_cast_for_session_sync(self, search_name: str, session_time: datetime, city: Optional[str] = None) -> List[Dict]:
+        with session_scope(readonly=True) as session:
             # 使用时间窗口匹配 (±1秒)，以容忍微秒精度差异
             # Use time window matching (±1 second) to tolerate microsecond precision differences
             time_start = session_time.replace(microsecond=0) - timedelta(seconds=1)
@@ -199,51 +243,22 @@ class SaojuService:
             candidates = session.exec(stmt).all()
             
             # Fuzzy Title Match in Memory
-            matched_show = None
-            for show in candidates:
-                # Check if titles overlap
-                if search_name in show.musical_name or show.musical_name in search_name:
-                    matched_show = show
-                    break
-            
-            if not matched_show or not matched_show.cast_str:
-                return []
-                
-            # Parse cast_str back to list of dicts
-            # Format: "Role:Actor / Role:Actor" or "Actor / Actor"
-            result = []
-            
-            # Robust split using regex to avoid splitting "Role/Name:Actor" inside the role
-            # We assume dividers are " / " (slash with spaces) or just spaces if no slash is used as divider
-            import re
-            if ' / ' in matched_show.cast_str:
-                segments = [s.strip() for s in matched_show.cast_str.split(' / ')]
-            elif '/' in matched_show.cast_str:
-                # If has '/' but no ' / ', this is likely space-separated format with role names containing slashes
-                # e.g. "程小时:舒荣波 陆光:杨浩然 林贞/陈潇妈:沈恬"
-                # Split by whitespace to preserve the slash in role names
-                segments = matched_show.cast_str.split()
-            else:
-                segments = matched_show.cast_str.split()
-                
-            for seg in segments:
-                if not seg: continue
-                item = {}
-                if ':' in seg:
-                    # Role:Name
-                    try:
-                        r_part, a_part = seg.split(':', 1)
-                        item['role'] = r_part.strip()
-                        item['artist'] = a_part.strip()
-                    except:
-                        item['artist'] = seg
-                else:
-                    item['artist'] = seg
-                
-                if item.get('artist'):
-                    result.append(item)
-                    
-            return result
+            matched_show = next((show for show in candidates if title_overlaps(search_name, show.musical_name)), None)
+            return parse_cast_str(matched_show.cast_str) if matched_show else []
+
+    async def build_session_index(self, search_name: str, session_times: List[datetime]) -> SessionShowIndex:
+        """
+        Batch form of search_for_musical_by_date / get_cast_for_hulaquan_session for one event:
+        one range query over all its session times, then per-session lookups in memory. LOCAL DB ONLY.
+        一个事件所有场次的批量查询（一次范围查询，之后内存匹配），无网络 I/O。
+        """
+        if not search_name or not session_times:
+            return SessionShowIndex(search_name)
+        return await db_executor.run(self._build_session_index_sync, search_name, session_times)
+
+    def _build_session_index_sync(self, search_name: str, session_times: List[datetime]) -> SessionShowIndex:
+        with session_scope(readonly=True) as session:
+            return load_session_index(session, search_name, session_times)
 
     async def match_co_casts(self, co_casts: List[str], show_others: bool = True, progress_callback=None, start_date: str = None, end_date: str = None) -> List[Dict]:
         """
@@ -252,8 +267,10 @@ class SaojuService:
         """
         if not co_casts:
             return []
-            
-        with session_scope() as session:
+        return await db_executor.run(self._match_co_casts_sync, co_casts, start_date, end_date)
+
+    def _match_co_casts_sync(self, co_casts: List[str], start_date: Optional[str], end_date: Optional[str]) -> List[Dict]:
+        with session_scope(readonly=True) as session:
             # Construct query
             # We need shows where cast_str contains ALL names
             # SQLite 'LIKE' is case insensitive usually, but names are standard
@@ -446,7 +463,7 @@ class SaojuService:
             cache[s_mid] = shows
             from services.hulaquan.utils import dateTimeToStr
             updated[s_mid] = dateTimeToStr(timezone_now())
-            self.save_data()
+            await self.save_data_async()
         
         return shows or []
 
@@ -455,7 +472,7 @@ class SaojuService:
         if self.data.get("musical_map"):
             return
             
-        musicals = await self._fetch_json("musical/")
+        musicals = await self.reference.get("musical")
         if not musicals:
             return
             
@@ -516,15 +533,12 @@ class SaojuService:
         log.info("Artists map expired or missing, fetching new list...")
         self.data['artists_map'] = await self.fetch_saoju_artist_list()
         self.data['artists_updated_at'] = now.isoformat()
-        self.save_data()
+        await self.save_data_async()
 
     async def fetch_saoju_artist_list(self):
         """Fetch all artists and filter those who appear in cast lists (musicalcast)."""
         # 1. Fetch all artists and all musicalcast entries
-        artist_task = self._fetch_json("artist/")
-        cast_task = self._fetch_json("musicalcast/")
-        
-        artist_data, cast_data = await asyncio.gather(artist_task, cast_task)
+        artist_data, cast_data = await self.reference.get_many("artist", "musicalcast")
         
         if not artist_data: return {}
         if not cast_data:
@@ -557,16 +571,11 @@ class SaojuService:
         new_indexes = await self._build_artist_indexes()
         if new_indexes:
             self.data["artist_indexes"] = new_indexes
-            self.save_data()
+            await self.save_data_async()
         return self.data.get("artist_indexes", {})
 
     async def _build_artist_indexes(self) -> Optional[Dict]:
-        # Simple gather
-        musical_task = self._fetch_json("musical/")
-        role_task = self._fetch_json("role/")
-        cast_task = self._fetch_json("musicalcast/")
-        
-        musical_data, role_data, cast_data = await asyncio.gather(musical_task, role_task, cast_task)
+        musical_data, role_data, cast_data = await self.reference.get_many("musical", "role", "musicalcast")
         
         if not musical_data or not role_data or not cast_data:
             return self.data.get("artist_indexes")
@@ -624,7 +633,7 @@ class SaojuService:
             "role_orders": role_orders,
             "updated_at": dateTimeToStr(timezone_now(), with_second=True),
         }
-        self.save_data()
+        await self.save_data_async()
         return result
     async def get_role_seq(self, musical_id: str, role_name: str) -> int:
         """Get official loop sequence number for a role in a musical. Default 999."""
@@ -637,113 +646,99 @@ class SaojuService:
         musical_roles = role_orders.get(str(musical_id), {})
         return musical_roles.get(role_name, 999)
 
-    async def sync_future_days(self, start_days: int = 0, end_days: int = 120):
+    async def sync_future_days(self, start_days: int = 0, end_days: int = 120, force: bool = False):
         """
         Sync future days using search_day API with Change Data Capture (CDC).
         Range: [today + start_days, today + end_days]
+        Days fetched recently are skipped and unchanged days skip DB work (see show_cdc.REFETCH_SCHEDULE);
+        ``force`` re-fetches and re-diffs every day.
         """
         today = datetime.now()
         
         target_dates = []
         for i in range(start_days, end_days + 1):
             date_val = today + timedelta(days=i)
-            target_dates.append(date_val)
+            target_dates.append(date_val.strftime("%Y-%m-%d"))
             
         log.info(f"Syncing future days {start_days}-{end_days} (Total {len(target_dates)} days)...")
-        
-        # Concurrency limit
-        sem = asyncio.Semaphore(10)
-        
-        async def fetch_and_save(date_val):
+        async with crawl_executor.crawl(f"saoju:days:{start_days}-{end_days}"):
+            stats = await self._sync_days(target_dates, source="api_daily", new_label="新增排期",
+                                          concurrency=10, force=force)
+        if stats["changed"]:
+            data_version.bump(data_version.SAOJU)
+        log.info(f"Finished syncing {len(target_dates)} days.")
+
+    async def _sync_days(self, dates: List[str], *, source: str, new_label: str,
+                         concurrency: int, force: bool = False) -> Dict[str, int]:
+        """
+        Incremental day sync shared by the near / distant / full-year jobs.
+        近期/远期/全年任务共用的增量按天同步。
+
+        1. Skip days fetched within their refetch interval (near days refresh more often).
+        2. Fetch the rest concurrently; days whose show_list hash is unchanged skip DB work.
+        3. Apply changed days with one bulk CDC write, then record the new fingerprints.
+
+        Fingerprints are keyed by date alone, so every job must parse days the same way (casts with
+        roles); otherwise overlapping jobs would skip each other's days or rewrite them back and forth.
+        指纹只按日期存储，各任务必须以相同格式（带角色）解析，否则重叠日期会被误跳过或来回改写。
+        """
+        fingerprints = {} if force else await db_executor.run(load_day_fingerprints, dates)
+
+        today = datetime.now()
+        now_naive = timezone_now().replace(tzinfo=None)
+        due = [
+            d for d in dates
+            if d not in fingerprints or now_naive - fingerprints[d][1] >= refetch_interval(d, today)
+        ]
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def fetch_day(date_str) -> Optional[List[Dict]]:
             async with sem:
-                date_str = date_val.strftime("%Y-%m-%d")
                 try:
-                    data = await self._fetch_json("search_day/", params={"date": date_str})
+                    data = await self._fetch_json("search_day/", params={"date": date_str}, schema=SaojuDayShows)
                     if not data or "show_list" not in data:
-                        return
-                    
-                    shows = data["show_list"]
-                    with session_scope() as session:
-                        for item in shows:
-                            musical_name = item.get("musical")
-                            time_part = item.get("time") # HH:MM usually in search_day context
-                            
-                            if not musical_name or not time_part:
-                                continue
-                                
-                            try:
-                                full_dt = datetime.strptime(f"{date_str} {time_part}", "%Y-%m-%d %H:%M")
-                            except:
-                                continue
-
-                            cast_list = item.get("cast", [])
-                            parts = []
-                            for c in cast_list:
-                                artist = c.get("artist")
-                                if not artist: continue
-                                role = c.get("role")
-                                if role:
-                                    parts.append(f"{role}:{artist}")
-                                else:
-                                    parts.append(artist)
-                            cast_str = " / ".join(parts)
-                            city = item.get("city", "")
-                            theatre = item.get("theatre", "")
-                            
-                            # CDC Check
-                            existing = session.get(SaojuShow, (full_dt, musical_name, city))
-                            
-                            if not existing:
-                                # New Record
-                                show_db = SaojuShow(
-                                    date=full_dt,
-                                    city=city,
-                                    musical_name=musical_name,
-                                    cast_str=cast_str,
-                                    theatre=theatre,
-                                    source="api_daily",
-                                    updated_at=timezone_now()
-                                )
-                                session.add(show_db)
-                                
-                                # Log Change
-                                change = SaojuChangeLog(
-                                    show_date=full_dt,
-                                    musical_name=musical_name,
-                                    change_type="NEW",
-                                    details=f"新增排期: {city} {theatre}"
-                                )
-                                session.add(change)
-                                
-                            else:
-                                # Update Check
-                                changes = []
-                                if existing.cast_str != cast_str:
-                                    changes.append(f"卡司变更: {existing.cast_str} -> {cast_str}")
-                                if existing.theatre != theatre and theatre:
-                                    changes.append(f"剧院变更: {existing.theatre} -> {theatre}")
-                                    
-                                if changes:
-                                    existing.cast_str = cast_str
-                                    existing.theatre = theatre
-                                    # existing.city = city # city is PK now, can't change it here without delete/insert
-                                    existing.source = "api_daily"
-                                    existing.updated_at = timezone_now()
-                                    session.add(existing)
-                                    
-                                    change = SaojuChangeLog(
-                                        show_date=full_dt,
-                                        musical_name=musical_name,
-                                        change_type="UPDATE",
-                                        details="; ".join(changes)
-                                    )
-                                    session.add(change)
+                        return None
+                    return parse_show_list(date_str, data["show_list"])
                 except Exception as e:
                     log.error(f"Error syncing date {date_str}: {e}")
+                    return None
 
-        tasks = [fetch_and_save(d) for d in target_dates]
-        await asyncio.gather(*tasks)
-        log.info(f"Finished syncing {len(target_dates)} days.")
+        day_rows = await asyncio.gather(*[fetch_day(d) for d in due])
+
+        rows: List[Dict] = []
+        new_fingerprints: Dict[str, tuple] = {}
+        for date_str, parsed in zip(due, day_rows):
+            if parsed is None:
+                # Failed fetch: no fingerprint, so it is retried next run
+                # 抓取失败：不记录指纹，下次重试
+                continue
+            content_hash = day_fingerprint(parsed)
+            changed = date_str not in fingerprints or fingerprints[date_str][0] != content_hash
+            new_fingerprints[date_str] = (content_hash, len(parsed), changed)
+            if changed:
+                rows.extend(parsed)
+
+        stats = {
+            "dates": len(dates),
+            "fresh": len(dates) - len(due),
+            "fetched": len(new_fingerprints),
+            "changed": sum(1 for _, _, changed in new_fingerprints.values() if changed),
+        }
+        try:
+            if rows:
+                await db_executor.run(apply_show_changes, rows, source, new_label)
+            # Only after the CDC write succeeded, otherwise changed days would be skipped next time
+            # 仅在 CDC 写入成功后记录指纹，否则下次会误判为未变化
+            await db_executor.run(save_day_fingerprints, new_fingerprints)
+        except Exception as e:
+            log.error(f"Error saving synced days ({source}): {e}")
+
+        log.info(
+            f"Saoju day sync ({source}): {stats['dates']} dates, {stats['fresh']} fresh (skipped), "
+            f"{stats['fetched']} fetched, {stats['changed']} changed"
+        )
+        return stats
 
 
     async def sync_distant_tours(self, start_buffer_days: int = 120):
@@ -753,6 +748,10 @@ class SaojuService:
         2. Fetch Schedules.
         3. Crawl specific dates.
         """
+        async with crawl_executor.crawl(f"saoju:distant_tours:{start_buffer_days}"):
+            await self._sync_distant_tours(start_buffer_days)
+
+    async def _sync_distant_tours(self, start_buffer_days: int):
         log.info(f"Starting Distant Tour Discovery (>{start_buffer_days} days)...")
         tours = await self._fetch_json("tour/")
         if not tours:
@@ -781,11 +780,12 @@ class SaojuService:
         
         log.info(f"Found {len(active_tours)} active distant tours.")
         
-        # Fetch schedules for these tours
+        # Fetch schedules for these tours (concurrently; crawl_executor caps the fan-out)
+        # 并发获取排期，由 crawl_executor 限制并发与速率
         target_dates = set()
-        
-        for tour in active_tours:
-            schedules = await self.get_schedules(tour["pk"])
+        schedules_by_tour = await asyncio.gather(*(self.get_schedules(tour["pk"]) for tour in active_tours))
+
+        for schedules in schedules_by_tour:
             for sched in schedules:
                 try:
                     fields = sched.get("fields", {})
@@ -814,96 +814,27 @@ class SaojuService:
 
         log.info(f"Identified {len(target_dates)} distant dates to crawl.")
         
-        # Crawl identified dates
-        # Reuse logic from sync_future_days but just pass specific dates if I refactor
-        # Or just copy paste core logic for now to avoid dependency
-        
-        sem = asyncio.Semaphore(5)
-        
-        async def fetch_and_save_distant(date_str):
-            async with sem:
-                try:
-                    data = await self._fetch_json("search_day/", params={"date": date_str})
-                    if not data or "show_list" not in data:
-                        return
-                    
-                    shows = data["show_list"]
-                    with session_scope() as session:
-                        for item in shows:
-                            musical_name = item.get("musical")
-                            time_part = item.get("time")
-                            if not musical_name or not time_part:
-                                continue
-                            
-                            try:
-                                full_dt = datetime.strptime(f"{date_str} {time_part}", "%Y-%m-%d %H:%M")
-                            except:
-                                continue
-
-                            cast_list = item.get("cast", [])
-                            cast_str = " / ".join([c.get("artist") for c in cast_list if c.get("artist")])
-                            city = item.get("city", "")
-                            theatre = item.get("theatre", "")
-                            
-                            # CDC Logic (duplicated for now given constraints)
-                            existing = session.get(SaojuShow, (full_dt, musical_name, city))
-                            
-                            if not existing:
-                                show_db = SaojuShow(
-                                    date=full_dt,
-                                    city=city,
-                                    musical_name=musical_name,
-                                    cast_str=cast_str,
-                                    theatre=theatre,
-                                    source="api_tour",
-                                    updated_at=timezone_now()
-                                )
-                                session.add(show_db)
-                                
-                                change = SaojuChangeLog(
-                                    show_date=full_dt,
-                                    musical_name=musical_name,
-                                    change_type="NEW",
-                                    details=f"远期新增: {city} {theatre}"
-                                )
-                                session.add(change)
-                            else:
-                                changes = []
-                                if existing.cast_str != cast_str:
-                                    changes.append(f"卡司变更: {existing.cast_str} -> {cast_str}")
-                                if existing.theatre != theatre and theatre:
-                                    changes.append(f"剧院变更: {existing.theatre} -> {theatre}")
-                                    
-                                if changes:
-                                    existing.cast_str = cast_str
-                                    existing.theatre = theatre
-                                    existing.city = city
-                                    existing.source = "api_tour"
-                                    existing.updated_at = timezone_now()
-                                    session.add(existing)
-                                    
-                                    change = SaojuChangeLog(
-                                        show_date=full_dt,
-                                        musical_name=musical_name,
-                                        change_type="UPDATE",
-                                        details="; ".join(changes)
-                                    )
-                                    session.add(change)
-
-                except Exception as e:
-                    log.error(f"Error syncing distant date {date_str}: {e}")
-
-        # Execute
-        tasks = [fetch_and_save_distant(d) for d in target_dates]
-        if tasks:
-            await asyncio.gather(*tasks)
+        # Crawl identified dates (same incremental day sync as sync_future_days)
+        if target_dates:
+            stats = await self._sync_days(sorted(target_dates), source="api_tour",
+                                          new_label="远期新增", concurrency=5)
+            if stats["changed"]:
+                data_version.bump(data_version.SAOJU)
         log.info("Distant Tour Discovery Complete.")
 
     async def sync_musical_data(self, musical_id: int):
         """
         Traverse Tour -> Schedule -> Show -> Cast to build a complete picture.
         Returns a list of 'Show' dictionaries with resolved data.
+
+        Each level is fetched concurrently (all tours' schedules, then all schedules' shows, then
+        every recent show's cast); crawl_executor bounds the requests in flight to y.saoju.net.
+        每一层并发抓取，由 crawl_executor 限制对 y.saoju.net 的并发与速率。
         """
+        async with crawl_executor.crawl(f"saoju:musical:{musical_id}"):
+            return await self._sync_musical_data(musical_id)
+
+    async def _sync_musical_data(self, musical_id: int):
         log.info(f"Syncing data for musical {musical_id}...")
         tours = await self.get_tours(musical_id)
         if not tours:
@@ -911,141 +842,81 @@ class SaojuService:
 
         all_shows = []
         
-        # We need artist map to resolve names if API 15 only gives IDs.
-        # User says API 15 gives "musicalcast" objects.
-        # musicalcast data (API 7) has: role (ID), artist (ID).
-        # So API 15 likely returns list of musicalcast objects.
-        # We need to load artist/role/musicalcast indexes to be fast.
-        indexes = await self._ensure_artist_indexes()
-        
-        # Helper to resolve cast ID to Artist Name
-        # We need a map from musicalcast_pk -> (ArtistName, RoleName)
-        # current _build_artist_indexes builds artist_id -> musical -> roles
-        # We might need a reverse lookup or just fetch all musicalcast to build a lookup.
-        # Let's look at _build_artist_indexes.
-        # It fetches all musicalcast entries at once.
-        # We can create a quick lookup map inside this method or cache it.
-        
-        # Let's fetch all necessary metadata for resolution
-        # We can reuse the indexes logic or just fetch again if needed.
-        # To be safe and fast, let's fetch cast/role/artist once here or ensure they are ready.
-        # _build_artist_indexes does fetch all.
-        
-        # But wait, existing _build_artist_indexes structure is:
-        # artist_musicals[artist_id][musical_id]
-        # This is optimized for "Get all shows for Artist".
-        # Now we have "Get all artists for Show".
-        # We have the show's cast list (list of musicalcast objects from API 15).
-        # Each object has a PK.
-        # We need to map that PK to Artist/Role.
-        
-        # Let's verify if API 15 returns the *musicalcast* object itself or just a ref.
-        # User says:
-        # pk: 2114
-        # model: "yyj.musicalcast"
-        # fields: {} 
-        # Wait, if fields is empty, how do we know which artist/role it is?
-        # Ah, API 7 (musicalcast) has fields: role, artist.
-        # If API 15 returns musicalcast objects *with empty fields*, that implies we must look up the PK in the "All MusicalCast" table (API 7) to find the artist/role.
-        # Correct!
-        # So we absolutely need the full API 7 list to map PK -> (ArtistID, RoleID).
-        
-        # Let's build that map.
-        cast_data_full = await self._fetch_json("musicalcast/")
-        # map: musicalcast_pk -> {artist: id, role: id}
-        cast_lookup = {item["pk"]: item.get("fields", {}) for item in cast_data_full}
-        
-        # Also need Artist and Role lookups
-        artist_data = await self._fetch_json("artist/")
-        artist_lookup = {item["pk"]: item.get("fields", {}).get("name") for item in artist_data}
-        
-        role_data = await self._fetch_json("role/")
-        role_lookup = {item["pk"]: item.get("fields", {}).get("name") for item in role_data}
-
-        # Optimization: use gather for these 3 if not cached
-        # For now, sequential is fine for safety.
-
-        for tour in tours:
-            tour_id = tour["pk"]
-            schedules = await self.get_schedules(tour_id)
-            for sched in schedules:
-                sched_id = sched["pk"]
-                shows = await self.get_shows(sched_id)
+        # Show cast entries (show/ -> musicalcast/?show=) are musicalcast PKs with empty fields,
+        # so resolving them needs the full musicalcast/artist/role catalogues (shared, cached).
+        # 场次卡司只返回 musicalcast 主键，需要全量 musicalcast/artist/role 目录解析（共享缓存）
+        cast_lookup, artist_lookup, role_lookup = await self.reference.derived(
+            "cast_resolution", ("musicalcast", "artist", "role"), _build_cast_resolution
+        )
+
+        schedules_by_tour = await asyncio.gather(*(self.get_schedules(tour["pk"]) for tour in tours))
+        tour_schedules = [
+            (tour, sched) for tour, schedules in zip(tours, schedules_by_tour) for sched in schedules
+        ]
+        shows_by_schedule = await asyncio.gather(*(self.get_shows(sched["pk"]) for _, sched in tour_schedules))
+
+        # Filter shows by date BEFORE fetching casts to save massive time
+        recent_cutoff = timezone_now() - timedelta(days=90)
+        valid_shows = []  # (tour, sched, show)
+        for (tour, sched), shows in zip(tour_schedules, shows_by_schedule):
+            for show in shows:
+                 show_time_str = show.get("fields", {}).get("time") # 2023-10-02T11:30:00Z
+                 if not show_time_str:
+                     continue
+                 
+                 # Quick parse for filtering
+                 try:
+                     # Handle Z if present
+                     clean_ts = show_time_str.rstrip('Z')
+                     dt = datetime.fromisoformat(clean_ts)
+                     if dt > recent_cutoff:
+                         valid_shows.append((tour, sched, show))
+                 except Exception:
+                     # If parse fails, include it to be safe or log? Include safe.
+                     valid_shows.append((tour, sched, show))
+
+        # Fetch casts concurrently for filtered shows only
+        casts_results = await asyncio.gather(*(self.get_show_cast(show["pk"]) for _, _, show in valid_shows))
+
+        for (tour, sched, show), cast_list in zip(valid_shows, casts_results):
+            # Resolve cast
+            resolved_cast = []
+            for cast_item in cast_list:
+                cw_pk = cast_item["pk"] # This is the musicalcast PK
+                ref = cast_lookup.get(cw_pk)
+                if not ref:
+                    continue
                 
-                # Filter shows by date BEFORE fetching casts to save massive time
-                valid_shows = []
-                recent_cutoff = timezone_now() - timedelta(days=90)
+                a_id = ref.get("artist")
+                r_id = ref.get("role")
                 
-                for show in shows:
-                     show_time_str = show.get("fields", {}).get("time") # 2023-10-02T11:30:00Z
-                     if not show_time_str:
-                         continue
-                     
-                     # Quick parse for filtering
-                     try:
-                         # Handle Z if present
-                         clean_ts = show_time_str.rstrip('Z')
-                         dt = datetime.fromisoformat(clean_ts)
-                         if dt > recent_cutoff:
-                             valid_shows.append(show)
-                     except Exception:
-                         # If parse fails, include it to be safe or log? Include safe.
-                         valid_shows.append(show)
-
-                if not valid_shows:
-                    continue
-
-                # Fetch casts concurrently for filtered shows only
-                tasks = [self.get_show_cast(show["pk"]) for show in valid_shows]
-                if not tasks:
-                    continue
-                    
-                casts_results = await asyncio.gather(*tasks)
+                a_name = artist_lookup.get(a_id)
+                r_name = role_lookup.get(r_id)
                 
-                for show, cast_list in zip(valid_shows, casts_results):
-                    # Resolve cast
-                    resolved_cast = []
-                    for cast_item in cast_list:
-                        cw_pk = cast_item["pk"] # This is the musicalcast PK
-                        ref = cast_lookup.get(cw_pk)
-                        if not ref:
-                            continue
-                        
-                        a_id = ref.get("artist")
-                        r_id = ref.get("role")
-                        
-                        a_name = artist_lookup.get(a_id)
-                        r_name = role_lookup.get(r_id)
-                        
-                        if a_name:
-                            resolved_cast.append({"artist": a_name, "role": r_name})
-                    
-                    show_time = show.get("fields", {}).get("time") # 2023-10-02T11:30:00Z
-                    
-                    # Store structured data
-                    all_shows.append({
-                        "show_id": show["pk"],
-                        "time": show_time,
-                        "cast": resolved_cast,
-                        # Pass through context
-                        "tour_name": tour.get("fields", {}).get("name"),
-                        "city": "Unknown", # Schedule -> Stage -> Theatre -> City path needed if we want city...
-                        # Wait, API 13 Schedule has "stage". API 11 Stage has "theatre". API 10 Theatre has "city".
-                        # This is a deep traversal for City. 
-                        # Only way to get city is to resolve Schedule -> Stage -> Theatre -> City.
-                        "stage_id": sched.get("fields", {}).get("stage")
-                    })
+                if a_name:
+                    resolved_cast.append({"artist": a_name, "role": r_name})
+            
+            show_time = show.get("fields", {}).get("time") # 2023-10-02T11:30:00Z
+            
+            # Store structured data
+            all_shows.append({
+                "show_id": show["pk"],
+                "time": show_time,
+                "cast": resolved_cast,
+                # Pass through context
+                "tour_name": tour.get("fields", {}).get("name"),
+                "city": "Unknown", # Schedule -> Stage -> Theatre -> City path needed if we want city...
+                # Wait, API 13 Schedule has "stage". API 11 Stage has "theatre". API 10 Theatre has "city".
+                # This is a deep traversal for City. 
+                # Only way to get city is to resolve Schedule -> Stage -> Theatre -> City.
+                "stage_id": sched.get("fields", {}).get("stage")
+            })
 
         # To populate City, we need Stage/Theatre/City maps.
         # Let's do that for completeness since user query usually involves City.
-        stages = await self._fetch_json("stage/")
-        stage_map = {s["pk"]: s.get("fields", {}) for s in stages} # has theatre_id
-        
-        theatres = await self._fetch_json("theatre/")
-        theatre_map = {t["pk"]: t.get("fields", {}) for t in theatres} # has city_id, name
-        
-        cities = await self._fetch_json("city/")
-        city_map = {c["pk"]: c.get("fields", {}).get("name") for c in cities}
+        stage_map, theatre_map, city_map = await self.reference.derived(
+            "venue_resolution", ("stage", "theatre", "city"), _build_venue_resolution
+        )
         
         # Backfill city/theatre info
         for s in all_shows:
@@ -1067,18 +938,24 @@ class SaojuService:
 
     async def get_total_shows_count(self) -> int:
         """获取收录的演出总数。"""
+        return await db_executor.run(self._total_shows_count_sync)
+
+    def _total_shows_count_sync(self) -> int:
         from sqlmodel import func
-        with session_scope() as session:
+        with session_scope(readonly=True) as session:
             count = session.exec(select(func.count()).select_from(SaojuShow)).one()
             return count
 
     async def get_heatmap_data(self, year: int) -> Dict[str, Any]:
         """获取指定年份的演出热力图数据。"""
+        return await db_executor.run(self._heatmap_data_sync, year)
+
+    def _heatmap_data_sync(self, year: int) -> Dict[str, Any]:
         import calendar
         start_date = datetime(year, 1, 1)
         end_date = datetime(year, 12, 31, 23, 59, 59)
         
-        with session_scope() as session:
+        with session_scope(readonly=True) as session:
             stmt = select(SaojuShow.date).where(SaojuShow.date >= start_date, SaojuShow.date <= end_date)
             # 仅在 Python 侧进行简单计数，避免复杂的 SQL 分组操作（考虑到 SQLite 的局限性）
             all_dates = session.exec(stmt).all()
@@ -0,0 +1,112 @@
+"""
+呼啦圈场次与扫剧排期的批量匹配
+Batch matching of Hulaquan sessions against SaojuShow rows.
+
+呼啦圈同步为每个事件补充城市与卡司时，原先每张票查询两次 SaojuShow（按时间找城市、按时间找卡司）。
+这里改为每个事件一次范围查询：取该事件所有场次时间跨度内、剧名与搜索名互相包含的排期，
+按 (分钟, 城市) 建字典，之后每张票的匹配都是内存查找，单个事件的数据库开销为常数。
+Enrichment used to run two SaojuShow queries per ticket. ``load_session_index`` loads every
+candidate row for an event's session span in one range query (title-filtered in SQL);
+``SessionShowIndex`` then answers each ticket from a dict keyed by (minute, city).
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlmodel import Session, col, func, or_, select
+
+from services.hulaquan.tables import SaojuShow
+
+
+class ShowRow(NamedTuple):
+    date: datetime
+    musical_name: str
+    city: str
+    theatre: Optional[str]
+    cast_str: Optional[str]
+
+
+def _minute(dt: datetime) -> datetime:
+    return dt.replace(second=0, microsecond=0, tzinfo=None)
+
+
+def title_overlaps(search_name: str, musical_name: str) -> bool:
+    """Fuzzy title match used by every Hulaquan -> Saoju lookup (e.g. "时光" vs "时光代理人")."""
+    return search_name in musical_name or musical_name in search_name
+
+
+def parse_cast_str(cast_str: Optional[str]) -> List[Dict]:
+    """Parse SaojuShow.cast_str ("Role:Actor / Role:Actor" or "Actor Actor") into [{role?, artist}]."""
+    if not cast_str:
+        return []
+    # Robust split: " / " is the divider; without it, split on whitespace so that role names
+    # containing a slash (e.g. "程小时:舒荣波 陆光:杨浩然 林贞/陈潇妈:沈恬") stay intact
+    # 以 " / " 为分隔；没有时按空白切分，保留角色名中的斜杠
+    if ' / ' in cast_str:
+        segments = [s.strip() for s in cast_str.split(' / ')]
+    else:
+        segments = cast_str.split()
+
+    result = []
+    for seg in segments:
+        if not seg:
+            continue
+        item = {}
+        if ':' in seg:
+            r_part, a_part = seg.split(':', 1)
+            item['role'] = r_part.strip()
+            item['artist'] = a_part.strip()
+        else:
+            item['artist'] = seg
+        if item.get('artist'):
+            result.append(item)
+    return result
+
+
+class SessionShowIndex:
+    """In-memory (minute, city) -> rows lookup for one event's sessions."""
+
+    def __init__(self, search_name: str, rows: Iterable[ShowRow] = ()):
+        self.search_name = search_name
+        self.rows = 0
+        self._by_key: Dict[Tuple[datetime, str], List[ShowRow]] = {}
+        self._by_minute: Dict[datetime, List[ShowRow]] = {}
+        for row in rows:
+            if not title_overlaps(search_name, row.musical_name):
+                continue
+            minute = _minute(row.date)
+            self._by_key.setdefault((minute, row.city), []).append(row)
+            self._by_minute.setdefault(minute, []).append(row)
+            self.rows += 1
+
+    def match(self, session_time: Optional[datetime], city: Optional[str] = None) -> Optional[ShowRow]:
+        """First show of this musical at the session's minute (in ``city`` when given)."""
+        if not session_time or not self.search_name:
+            return None
+        minute = _minute(session_time)
+        candidates = self._by_key.get((minute, city)) if city else self._by_minute.get(minute)
+        return candidates[0] if candidates else None
+
+    def cast(self, session_time: Optional[datetime], city: Optional[str] = None) -> List[Dict]:
+        row = self.match(session_time, city)
+        return parse_cast_str(row.cast_str) if row else []
+
+
+def load_session_index(session: Session, search_name: str, session_times: Iterable[datetime]) -> SessionShowIndex:
+    """One range query over [first session, last session] for shows whose title overlaps ``search_name``."""
+    minutes = sorted({_minute(t) for t in session_times if t})
+    if not search_name or not minutes:
+        return SessionShowIndex(search_name)
+
+    stmt = (
+        select(SaojuShow.date, SaojuShow.musical_name, SaojuShow.city, SaojuShow.theatre, SaojuShow.cast_str)
+        .where(
+            SaojuShow.date >= minutes[0],
+            SaojuShow.date < minutes[-1] + timedelta(minutes=1),
+            # Both directions of title_overlaps; re-checked in Python (LIKE ignores ASCII case)
+            # 剧名双向包含；LIKE 对 ASCII 不区分大小写，Python 侧会再校验
+            or_(col(SaojuShow.musical_name).contains(search_name, autoescape=True),
+                func.instr(search_name, SaojuShow.musical_name) > 0),
+        )
+        .order_by(SaojuShow.date, SaojuShow.musical_name, SaojuShow.city)
+    )
+    return SessionShowIndex(search_name, (ShowRow(*row) for row in session.exec(stmt).all()))
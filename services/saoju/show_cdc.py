@@ -0,0 +1,285 @@
+"""
+扫剧排期的批量变更捕获（CDC）写入
+Bulk change-data-capture writer for SaojuShow.
+
+sync_future_days / sync_distant_tours 先并发抓取所有日期的 show_list（不访问数据库），
+再由这里一次性写入：每批数据先写入连接级临时表，通过一次 LEFT JOIN 计算 NEW / UPDATE 集合，
+然后用 executemany 批量插入/更新 SaojuShow 并写入 SaojuChangeLog。
+The sync methods fetch every day's show_list concurrently without touching the DB, then hand the
+parsed rows to ``apply_show_changes`` (run in an executor). Each batch is staged into a TEMP table,
+NEW/UPDATE sets come from one LEFT JOIN against saojushow, and inserts/updates/change-log rows are
+applied with executemany in the same ``BEGIN IMMEDIATE`` transaction — a 120-day sweep is a handful
+of transactions.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, and_, bindparam, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from services.db.connection import session_scope
+from services.hulaquan.tables import SaojuChangeLog, SaojuDayFingerprint, SaojuShow
+from services.utils.timezone import now as timezone_now
+
+log = logging.getLogger(__name__)
+
+# Rows per transaction (~30-40 days of search_day results)
+# 每个事务的行数（约 30–40 天的 search_day 结果）
+CDC_BATCH_ROWS = 4000
+
+ShowKey = Tuple[datetime, str, str]
+
+# Minimum age of a day's last fetch before it is fetched again, by days ahead of today.
+# Near days change often (cast announcements); far days rarely. Also dedupes the near /
+# distant / full-year jobs, which overlap on many dates.
+# 按距今天数决定再次抓取的最短间隔：近期日期变化频繁，远期很少变化；同时对近期/远期/全年任务的重叠日期去重。
+REFETCH_SCHEDULE: List[Tuple[int, timedelta]] = [
+    (7, timedelta(hours=1)),
+    (30, timedelta(hours=12)),
+    (120, timedelta(hours=24)),
+]
+FAR_REFETCH_INTERVAL = timedelta(hours=72)
+
+# Connection-local staging table. Declared with SQLAlchemy types so dates are bound in exactly the
+# same text format as saojushow.date, which the join depends on. Not part of SQLModel.metadata.
+# 连接级临时表；使用 SQLAlchemy 类型声明，保证日期与 saojushow.date 的存储格式一致（JOIN 依赖这一点）
+_stage_metadata = MetaData()
+SHOW_STAGE = Table(
+    "saoju_show_stage",
+    _stage_metadata,
+    Column("date", DateTime, primary_key=True),
+    Column("musical_name", String, primary_key=True),
+    Column("city", String, primary_key=True),
+    Column("cast_str", String),
+    Column("theatre", String),
+)
+_CREATE_STAGE_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS saoju_show_stage ("
+    "date DATETIME NOT NULL, musical_name VARCHAR NOT NULL, city VARCHAR NOT NULL, "
+    "cast_str VARCHAR, theatre VARCHAR, PRIMARY KEY (date, musical_name, city))"
+)
+
+
+def parse_show_list(date_str: str, shows: Iterable[Dict], with_roles: bool = True) -> List[Dict]:
+    """Parse a search_day ``show_list`` into SaojuShow row dicts.
+    将 search_day 的 show_list 解析为 SaojuShow 行。
+
+    ``with_roles`` formats the cast as "角色:演员" (every day sync uses it, see ``SaojuService._sync_days``);
+    without it only artist names are kept.
+    """
+    rows = []
+    for item in shows:
+        musical_name = item.get("musical")
+        time_part = item.get("time") # HH:MM usually in search_day context
+        if not musical_name or not time_part:
+            continue
+
+        try:
+            full_dt = datetime.strptime(f"{date_str} {time_part}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            continue
+
+        cast_list = item.get("cast", [])
+        if with_roles:
+            parts = []
+            for c in cast_list:
+                artist = c.get("artist")
+                if not artist:
+                    continue
+                role = c.get("role")
+                parts.append(f"{role}:{artist}" if role else artist)
+            cast_str = " / ".join(parts)
+        else:
+            cast_str = " / ".join([c.get("artist") for c in cast_list if c.get("artist")])
+
+        rows.append({
+            "date": full_dt,
+            "musical_name": musical_name,
+            "city": item.get("city", ""),
+            "cast_str": cast_str,
+            "theatre": item.get("theatre", ""),
+        })
+    return rows
+
+
+def _diff_batch(conn, rows: List[Dict]) -> List[Tuple[Dict, Optional[Tuple[Optional[str], Optional[str]]]]]:
+    """Stage rows and LEFT JOIN them against saojushow; returns (row, existing (cast, theatre) or None)."""
+    conn.exec_driver_sql(_CREATE_STAGE_SQL)
+    conn.execute(SHOW_STAGE.delete())
+    conn.execute(insert(SHOW_STAGE).prefix_with("OR REPLACE"), rows)
+
+    show = SaojuShow.__table__
+    stmt = select(
+        SHOW_STAGE.c.date, SHOW_STAGE.c.musical_name, SHOW_STAGE.c.city,
+        SHOW_STAGE.c.cast_str, SHOW_STAGE.c.theatre,
+        show.c.date.label("existing_date"), show.c.cast_str.label("existing_cast"),
+        show.c.theatre.label("existing_theatre"),
+    ).select_from(
+        SHOW_STAGE.outerjoin(show, and_(
+            show.c.date == SHOW_STAGE.c.date,
+            show.c.musical_name == SHOW_STAGE.c.musical_name,
+            show.c.city == SHOW_STAGE.c.city,
+        ))
+    )
+    result = []
+    for r in conn.execute(stmt).all():
+        row = {"date": r.date, "musical_name": r.musical_name, "city": r.city,
+               "cast_str": r.cast_str, "theatre": r.theatre}
+        existing = None if r.existing_date is None else (r.existing_cast, r.existing_theatre)
+        result.append((row, existing))
+    conn.execute(SHOW_STAGE.delete())
+    return result
+
+
+_UPDATE_SHOW = (
+    update(SaojuShow.__table__)
+    .where(and_(
+        SaojuShow.__table__.c.date == bindparam("k_date"),
+        SaojuShow.__table__.c.musical_name == bindparam("k_musical_name"),
+        SaojuShow.__table__.c.city == bindparam("k_city"),
+    ))
+    .values(cast_str=bindparam("v_cast_str"), theatre=bindparam("v_theatre"),
+            source=bindparam("v_source"), updated_at=bindparam("v_updated_at"))
+)
+
+
+def apply_show_changes(rows: List[Dict], source: str, new_label: str,
+                       batch_rows: int = CDC_BATCH_ROWS) -> Tuple[int, int]:
+    """Upsert parsed shows and log NEW/UPDATE changes. Sync; call via db_executor.run.
+    批量写入解析后的排期并记录变更（同步函数，需在线程池中调用）。返回 (新增数, 更新数)。
+
+    ``new_label`` prefixes the NEW change-log details, e.g. "新增排期" / "远期新增".
+    """
+    # Same show listed twice: the last occurrence wins
+    # 同一场次重复出现时以最后一条为准
+    unique: Dict[ShowKey, Dict] = {}
+    for row in rows:
+        unique[(row["date"], row["musical_name"], row["city"])] = row
+    rows = list(unique.values())
+
+    total_new = total_updated = 0
+    for start in range(0, len(rows), batch_rows):
+        batch = rows[start:start + batch_rows]
+        now = timezone_now()
+        inserts, updates, changes = [], [], []
+
+        with session_scope() as session:
+            conn = session.connection()
+            # Take the write lock before staging: the TEMP-table DML would otherwise open a deferred
+            # transaction, the join would read saojushow under that snapshot, and upgrading it to a write
+            # after another connection committed fails at once with SQLITE_BUSY (busy_timeout not applied).
+            # 暂存前先获取写锁：否则临时表的 DML 会开启延迟事务，JOIN 在该快照下读取 saojushow，
+            # 之后若其他连接已提交，升级为写事务会立即返回 BUSY（不等待 busy_timeout）
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            for row, existing in _diff_batch(conn, batch):
+                if existing is None:
+                    inserts.append({**row, "source": source, "updated_at": now})
+                    changes.append({
+                        "detected_at": now, "show_date": row["date"], "musical_name": row["musical_name"],
+                        "change_type": "NEW", "details": f"{new_label}: {row['city']} {row['theatre']}",
+                    })
+                    continue
+
+                existing_cast, existing_theatre = existing
+                diffs = []
+                if existing_cast != row["cast_str"]:
+                    diffs.append(f"卡司变更: {existing_cast} -> {row['cast_str']}")
+                if existing_theatre != row["theatre"] and row["theatre"]:
+                    diffs.append(f"剧院变更: {existing_theatre} -> {row['theatre']}")
+                if not diffs:
+                    continue
+
+                updates.append({
+                    "k_date": row["date"], "k_musical_name": row["musical_name"], "k_city": row["city"],
+                    "v_cast_str": row["cast_str"], "v_theatre": row["theatre"],
+                    "v_source": source, "v_updated_at": now,
+                })
+                changes.append({
+                    "detected_at": now, "show_date": row["date"], "musical_name": row["musical_name"],
+                    "change_type": "UPDATE", "details": "; ".join(diffs),
+                })
+
+            if inserts:
+                conn.execute(insert(SaojuShow.__table__), inserts)
+            if updates:
+                conn.execute(_UPDATE_SHOW, updates)
+            if changes:
+                conn.execute(insert(SaojuChangeLog.__table__), changes)
+
+        total_new += len(inserts)
+        total_updated += len(updates)
+
+    log.info(f"Saoju CDC ({source}): {len(rows)} shows, {total_new} new, {total_updated} updated")
+    return total_new, total_updated
+
+
+# --- Per-day fingerprints (incremental sync) ---
+
+def day_fingerprint(rows: List[Dict]) -> str:
+    """Order-independent hash of one day's parsed rows (includes the cast format)."""
+    normalized = sorted(
+        (row["date"].isoformat(), row["musical_name"], row["city"], row["cast_str"] or "", row["theatre"] or "")
+        for row in rows
+    )
+    return hashlib.sha1(json.dumps(normalized, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def refetch_interval(date_str: str, today: datetime) -> timedelta:
+    days_ahead = (datetime.strptime(date_str, "%Y-%m-%d").date() - today.date()).days
+    if days_ahead < 0:
+        return FAR_REFETCH_INTERVAL
+    for max_days, interval in REFETCH_SCHEDULE:
+        if days_ahead <= max_days:
+            return interval
+    return FAR_REFETCH_INTERVAL
+
+
+def load_day_fingerprints(dates: List[str]) -> Dict[str, Tuple[str, datetime]]:
+    """date -> (content_hash, fetched_at) for the given dates. Sync; call via db_executor.run."""
+    result = {}
+    # Chunked to stay under SQLite's bound-parameter limit
+    # 分块查询，避免超过 SQLite 参数上限
+    with session_scope(readonly=True) as session:
+        for i in range(0, len(dates), 500):
+            stmt = select(SaojuDayFingerprint.date, SaojuDayFingerprint.content_hash, SaojuDayFingerprint.fetched_at) \
+                .where(SaojuDayFingerprint.date.in_(dates[i:i + 500]))
+            for date_str, content_hash, fetched_at in session.connection().execute(stmt).all():
+                result[date_str] = (content_hash, fetched_at)
+    return result
+
+
+def save_day_fingerprints(fingerprints: Dict[str, Tuple[str, int, bool]]):
+    """Upsert date -> (content_hash, show_count, changed). Sync; call via db_executor.run."""
+    if not fingerprints:
+        return
+    now = timezone_now()
+    table = SaojuDayFingerprint.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.date],
+        set_={
+            "content_hash": stmt.excluded.content_hash,
+            "show_count": stmt.excluded.show_count,
+            "fetched_at": stmt.excluded.fetched_at,
+            "changed_at": stmt.excluded.changed_at,
+        },
+    )
+    unchanged = [d for d, (_, _, changed) in fingerprints.items() if not changed]
+    with session_scope() as session:
+        conn = session.connection()
+        if unchanged:
+            # Unchanged days only need fetched_at bumped
+            # 内容未变的日期只需更新 fetched_at
+            conn.execute(
+                update(table).where(table.c.date == bindparam("k_date")).values(fetched_at=bindparam("v_fetched_at")),
+                [{"k_date": d, "v_fetched_at": now} for d in unchanged],
+            )
+        changed = [
+            {"date": d, "content_hash": h, "show_count": count, "fetched_at": now, "changed_at": now}
+            for d, (h, count, is_changed) in fingerprints.items() if is_changed
+        ]
+        if changed:
+            conn.execute(stmt, changed)
@@ -1,17 +1,30 @@
+import argparse
 import csv
 import glob
 import os
 import sys
+import time
 from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 # Adjust path to allow imports from project root
 sys.path.append(os.getcwd())
 
+from sqlalchemy import and_, bindparam, insert, update
 from sqlmodel import select
 from services.db.connection import session_scope
 from services.hulaquan.tables import SaojuShow
 from services.utils.timezone import now as timezone_now
 
+# Rows per lookup + write transaction. Keeps each writer transaction short (and the
+# distinct-date IN list well under SQLite's bound-parameter limit).
+# 每批的行数：写事务保持短小，date IN 列表也远低于 SQLite 参数上限
+DEFAULT_CHUNK_SIZE = 500
+
+ShowKey = Tuple[datetime, str, str]
+
+
 def parse_cast(cast_raw):
     """
     Convert space-separated cast string to ' / ' separated.
@@ -26,92 +39,172 @@ def parse_cast(cast_raw):
     parts = [p for p in parts if p.strip()]
     return ' / '.join(parts)
 
-def import_csv_files(data_dir):
-    csv_files = glob.glob(os.path.join(data_dir, '*.csv'))
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.invalid = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def line(self) -> str:
+        return (f"rows={self.rows} inserted={self.inserted} updated={self.updated} "
+                f"skipped={self.skipped} invalid={self.invalid} ({self.rate:.0f} rows/s)")
+
+
+def iter_csv_rows(csv_files: List[str], stats: ImportStats) -> Iterator[Dict]:
+    """Stream parsed rows from the CSV files (headers: 时间,城市,音乐剧,卡司,剧院)."""
+    for file_path in csv_files:
+        print(f"Processing {file_path}...")
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                time_str = row.get('时间')
+                city = row.get('城市')
+                musical_name = row.get('音乐剧')
+
+                if not time_str or not musical_name or not city:
+                    stats.invalid += 1
+                    continue
+
+                try:
+                    # Parse date: 2023-01-01 11:00
+                    date_val = datetime.strptime(time_str, "%Y-%m-%d %H:%M")
+                except ValueError as e:
+                    print(f"Skipping invalid date {time_str}: {e}")
+                    stats.invalid += 1
+                    continue
+
+                stats.rows += 1
+                yield {
+                    "date": date_val,
+                    "musical_name": musical_name,
+                    "city": city,
+                    "cast_str": parse_cast(row.get('卡司')),
+                    "theatre": row.get('剧院') or None,
+                }
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _merge_chunk(chunk: List[Dict]) -> Dict[ShowKey, Dict]:
+    # Same show repeated within a chunk: keep the first row, fill its blanks from later ones
+    # 同一批中重复的场次：保留第一条，空字段用后续行补全
+    merged: Dict[ShowKey, Dict] = {}
+    for row in chunk:
+        key = (row["date"], row["musical_name"], row["city"])
+        first = merged.get(key)
+        if first is None:
+            merged[key] = row
+        else:
+            first["cast_str"] = first["cast_str"] or row["cast_str"]
+            first["theatre"] = first["theatre"] or row["theatre"]
+    return merged
+
+
+def _existing_shows(session, keys: Iterable[ShowKey]) -> Dict[ShowKey, Tuple[Optional[str], Optional[str]]]:
+    # One query per chunk: the PK starts with date, so `date IN (...)` is an index lookup
+    # 每批一次查询：主键以 date 开头，date IN (...) 走索引
+    dates = list({key[0] for key in keys})
+    stmt = select(SaojuShow.date, SaojuShow.musical_name, SaojuShow.city,
+                  SaojuShow.cast_str, SaojuShow.theatre).where(SaojuShow.date.in_(dates))
+    return {(d, m, c): (cast_str, theatre) for d, m, c, cast_str, theatre in session.exec(stmt).all()}
+
+
+_UPDATE_STMT = (
+    update(SaojuShow.__table__)
+    .where(and_(
+        SaojuShow.__table__.c.date == bindparam("k_date"),
+        SaojuShow.__table__.c.musical_name == bindparam("k_musical_name"),
+        SaojuShow.__table__.c.city == bindparam("k_city"),
+    ))
+    .values(cast_str=bindparam("v_cast_str"), theatre=bindparam("v_theatre"), updated_at=bindparam("v_updated_at"))
+)
+
+
+def _import_chunk(chunk: List[Dict], stats: ImportStats, dry_run: bool):
+    merged = _merge_chunk(chunk)
+    stats.skipped += len(chunk) - len(merged)
+    now = timezone_now()
+
+    with session_scope(readonly=True) as session:
+        existing = _existing_shows(session, merged.keys())
+
+    inserts, updates = [], []
+    for key, row in merged.items():
+        current = existing.get(key)
+        if current is None:
+            inserts.append({**row, "source": "csv_history", "updated_at": now})
+            continue
+        # Only fill fields missing in the DB; never overwrite API data
+        # 只补全数据库中缺失的字段，不覆盖 API 数据
+        cast_str, theatre = current
+        new_cast = cast_str or row["cast_str"]
+        new_theatre = theatre or row["theatre"]
+        if (new_cast, new_theatre) != (cast_str, theatre):
+            updates.append({
+                "k_date": key[0], "k_musical_name": key[1], "k_city": key[2],
+                "v_cast_str": new_cast, "v_theatre": new_theatre, "v_updated_at": now,
+            })
+        else:
+            stats.skipped += 1
+
+    if not dry_run and (inserts or updates):
+        # One short writer transaction per chunk, executemany for both statements
+        # 每批一个短写事务，插入与更新均使用 executemany
+        with session_scope() as session:
+            conn = session.connection()
+            if inserts:
+                # OR IGNORE: a live Saoju sync may have inserted the same show since the lookup
+                # OR IGNORE：查询之后线上同步可能已写入同一场次
+                conn.execute(insert(SaojuShow.__table__).prefix_with("OR IGNORE"), inserts)
+            if updates:
+                conn.execute(_UPDATE_STMT, updates)
+
+    stats.inserted += len(inserts)
+    stats.updated += len(updates)
+
+
+def import_csv_files(data_dir, chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False,
+                     progress_every: int = 20) -> ImportStats:
+    csv_files = sorted(glob.glob(os.path.join(data_dir, '*.csv')))
     print(f"Found {len(csv_files)} CSV files in {data_dir}")
-    
-    total_inserted = 0
-    total_updated = 0
-    total_skipped = 0
-    
-    with session_scope() as session:
-        for file_path in csv_files:
-            print(f"Processing {file_path}...")
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                # Ensure headers match expected: 时间,城市,音乐剧,卡司,剧院
-                # DictReader uses first row as header.
-                
-                for row in reader:
-                    time_str = row.get('时间')
-                    city = row.get('城市')
-                    musical_name = row.get('音乐剧')
-                    cast_raw = row.get('卡司')
-                    theatre = row.get('剧院')
-                    
-                    if not time_str or not musical_name or not city:
-                        continue
-                        
-                    try:
-                        # Parse date: 2023-01-01 11:00
-                        date_val = datetime.strptime(time_str, "%Y-%m-%d %H:%M")
-                    except ValueError as e:
-                        print(f"Skipping invalid date {time_str}: {e}")
-                        continue
-                        
-                    cast_str = parse_cast(cast_raw)
-                    
-                    # Check existence
-                    existing = session.get(SaojuShow, (date_val, musical_name, city))
-                    
-                    if existing:
-                        # Optional: Update if cast is better? 
-                        # For now, let's assume if it exists, we stick with what we have 
-                        # unless it's clearly empty vs populated.
-                        # Actually, user said historical data is missing, so likely it doesn't exist.
-                        # But if it does, and source is not CSV, maybe keep it?
-                        # Let's just update if cast_str is missing in DB but present in CSV.
-                        
-                        updated = False
-                        if not existing.cast_str and cast_str:
-                            existing.cast_str = cast_str
-                            updated = True
-                        if not existing.theatre and theatre:
-                            existing.theatre = theatre
-                            updated = True
-                            
-                        if updated:
-                            session.add(existing)
-                            total_updated += 1
-                        else:
-                            total_skipped += 1
-                    else:
-                        # Create new
-                        new_show = SaojuShow(
-                            date=date_val,
-                            musical_name=musical_name,
-                            city=city,
-                            cast_str=cast_str,
-                            theatre=theatre,
-                            source="csv_history",
-                            updated_at=timezone_now()
-                        )
-                        session.add(new_show)
-                        total_inserted += 1
-            
-            # Commit per file or check point roughly?
-            # session_scope auto commits at end.
-            # To avoid huge transaction, maybe commit occasionally? 
-            # But context manager commits at exit. 
-            # Let's trust session to handle it or we can flush.
-            session.flush() 
-
-    print("Import finished.")
-    print(f"Inserted: {total_inserted}")
-    print(f"Updated: {total_updated}")
-    print(f"Skipped: {total_skipped}")
+    if dry_run:
+        print("[DRY RUN] No changes will be written.")
+
+    stats = ImportStats()
+    for i, chunk in enumerate(_chunks(iter_csv_rows(csv_files, stats), chunk_size), start=1):
+        _import_chunk(chunk, stats, dry_run)
+        if i % progress_every == 0:
+            print(f"  ... {stats.line()}")
+
+    print("Import finished." if not dry_run else "Dry run finished.")
+    print(f"Inserted: {stats.inserted}")
+    print(f"Updated: {stats.updated}")
+    print(f"Skipped: {stats.skipped}")
+    print(f"Invalid: {stats.invalid}")
+    print(f"Elapsed: {time.perf_counter() - stats.started:.2f}s ({stats.rate:.0f} rows/s)")
+    return stats
+
 
 if __name__ == "__main__":
     # Assuming run from project root: python services/scripts/import_history.py
-    data_dir = os.path.join(os.getcwd(), 'data', 'history_data')
-    import_csv_files(data_dir)
+    parser = argparse.ArgumentParser(description="Import Saoju history CSV files into SaojuShow")
+    parser.add_argument("data_dir", nargs="?", default=os.path.join(os.getcwd(), 'data', 'history_data'))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+    import_csv_files(args.data_dir, chunk_size=args.chunk_size, dry_run=args.dry_run)
@@ -0,0 +1,35 @@
+"""
+全局数据版本号
+Global data versions, bumped by the sync writers.
+
+每个数据域（hulaquan / saoju）一个单调递增的版本号，写入方在提交后调用 bump()，
+读取方（如 web/middleware/response_cache.py）据此判断缓存是否失效。
+One monotonically increasing counter per data domain. Writers call bump() after committing;
+readers (e.g. the response cache middleware) compare versions to decide whether a cached
+response is still valid.
+"""
+import threading
+from typing import Dict, Iterable, Tuple
+
+HULAQUAN = "hulaquan"
+SAOJU = "saoju"
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+
+
+def bump(domain: str) -> int:
+    """Mark `domain` as changed. Safe to call from executor threads.
+    标记数据域已变化，可在线程池中调用。
+    """
+    with _lock:
+        _versions[domain] = _versions.get(domain, 0) + 1
+        return _versions[domain]
+
+
+def get(domain: str) -> int:
+    return _versions.get(domain, 0)
+
+
+def snapshot(domains: Iterable[str]) -> Tuple[int, ...]:
+    return tuple(_versions.get(d, 0) for d in domains)
@@ -0,0 +1,135 @@
+"""
+进程级 HTTP 客户端注册表
+Process-wide HTTP client registry.
+
+每个目标主机一个 TCPConnector（长连接池 + DNS 缓存 + keep-alive 调优），所有调用方共享：
+呼啦圈/扫剧爬虫（经 SmartConnectionPool）、Turnstile 验证、safe_http_request 等。
+连接器与 Session 只在进程退出时由 ``http_clients.close()`` 关闭（web_app lifespan / Bot stop），
+调用方不得自行关闭，因此不会在请求进行中被拆掉。
+One TCPConnector per target host, shared by every caller. Callers never close what they get back;
+the app lifespan (and the bot's stop()) closes everything once via ``http_clients.close()``.
+
+用法 / Usage:
+    session = http_clients.session_for(url)
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+        ...
+"""
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from services.config import config
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+
+_HostKey = Tuple[str, str, Optional[int], Optional[bool]]
+
+
+class HttpClientRegistry:
+    """按主机共享的连接器与 Session"""
+
+    def __init__(self, limit_per_host: int = 30, keepalive_timeout: float = 60.0, dns_cache_ttl: int = 300):
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._connectors: Dict[_HostKey, aiohttp.TCPConnector] = {}
+        self._sessions: Dict[_HostKey, aiohttp.ClientSession] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def _key(url: str, ssl: Optional[bool]) -> _HostKey:
+        parsed = urlparse(url)
+        return (parsed.scheme or "https", parsed.hostname or "", parsed.port, ssl)
+
+    def _check_loop(self):
+        # Connectors are bound to one event loop; scripts calling asyncio.run() twice start fresh
+        # 连接器绑定事件循环；脚本多次 asyncio.run() 时重新创建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._connectors:
+                log.warning("Event loop changed, dropping HTTP connectors from the previous loop")
+            self._connectors.clear()
+            self._sessions.clear()
+            self._loop = loop
+
+    def connector_for(self, url: str, *, ssl: Optional[bool] = None,
+                      resolver: Optional[AbstractResolver] = None,
+                      limit: Optional[int] = None,
+                      dns_cache_ttl: Optional[int] = None) -> aiohttp.TCPConnector:
+        """Shared connector for ``url``'s host. Options apply only when the connector is first created.
+        获取主机共享的连接器（参数仅在首次创建时生效）；调用方不要关闭它。
+        """
+        self._check_loop()
+        key = self._key(url, ssl)
+        connector = self._connectors.get(key)
+        if connector is None or connector.closed:
+            kwargs = {}
+            if ssl is not None:
+                kwargs["ssl"] = ssl
+            if resolver is not None:
+                kwargs["resolver"] = resolver
+            connector = aiohttp.TCPConnector(
+                limit=limit or self.limit_per_host,
+                limit_per_host=limit or self.limit_per_host,
+                ttl_dns_cache=dns_cache_ttl or self.dns_cache_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout,
+                force_close=False,
+                enable_cleanup_closed=True,
+                **kwargs,
+            )
+            self._connectors[key] = connector
+        return connector
+
+    def session_for(self, url: str, *, ssl: Optional[bool] = None) -> aiohttp.ClientSession:
+        """Shared session on the host's connector. Pass headers/timeouts per request; do not close it.
+        获取主机共享的 Session；headers/超时按请求传入，调用方不要关闭它。
+        """
+        self._check_loop()
+        key = self._key(url, ssl)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=self.connector_for(url, ssl=ssl),
+                connector_owner=False,
+                timeout=DEFAULT_TIMEOUT,
+            )
+            self._sessions[key] = session
+        return session
+
+    async def close(self):
+        """Close every session and connector (process shutdown only)."""
+        for session in list(self._sessions.values()):
+            try:
+                await session.close()
+            except Exception as e:
+                log.warning(f"Failed to close HTTP session: {e}")
+        for connector in list(self._connectors.values()):
+            try:
+                await connector.close()
+            except Exception as e:
+                log.warning(f"Failed to close HTTP connector: {e}")
+        self._sessions.clear()
+        self._connectors.clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            "limit_per_host": self.limit_per_host,
+            "keepalive_timeout": self.keepalive_timeout,
+            "dns_cache_ttl": self.dns_cache_ttl,
+            "hosts": sorted(f"{scheme}://{host}" + (f":{port}" if port else "")
+                            for scheme, host, port, _ in self._connectors),
+        }
+
+
+http_clients = HttpClientRegistry(
+    limit_per_host=config.HTTP_LIMIT_PER_HOST,
+    keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=config.HTTP_DNS_CACHE_TTL,
+)
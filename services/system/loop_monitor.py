@@ -0,0 +1,120 @@
+"""
+事件循环延迟监控
+Event loop lag monitor.
+
+- 采样：每 LOOP_LAG_INTERVAL 秒 sleep 一次，实际唤醒时间与预期的差值即为循环延迟，写入
+  ``event_loop_lag_ms`` 直方图；超过 LOOP_LAG_THRESHOLD_MS 时记录告警并计入 ``event_loop_stalls_total``
+- 定位：看门狗线程在循环迟迟未唤醒（阻塞仍在进行）时，抓取事件循环线程当前的调用栈并记录，
+  直接指出是哪个回调在阻塞循环（asyncio 自带的 slow_callback_duration 只在 debug 模式下生效）
+
+A sleeper task measures how late each wake-up is (``event_loop_lag_ms``). While the loop is stuck,
+a watchdog thread logs the loop thread's current stack, naming the callback that blocks it.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+from services.config import config
+from services.system.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+# Innermost frames included in a stall report / 阻塞告警中记录的最内层栈帧数
+STACK_DEPTH = 12
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5, threshold_ms: float = 100.0):
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self.samples = 0
+        self.stalls = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._beat = 0.0
+        self._reported_beat: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    async def _sample_loop(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            try:
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                break
+            now = time.perf_counter()
+            lag_ms = max(0.0, (now - expected) * 1000)
+            stack_logged = self._reported_beat == self._beat
+            self._beat = now
+            self.samples += 1
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            metrics.observe("event_loop_lag_ms", lag_ms)
+            if lag_ms > self.threshold_ms:
+                self.stalls += 1
+                metrics.inc("event_loop_stalls_total")
+                # For long stalls the watchdog has already logged where it was stuck; this adds the total
+                # 长时间阻塞时看门狗已记录阻塞位置，这里补充总时长
+                log.warning(f"Event loop blocked for {lag_ms:.0f}ms (threshold {self.threshold_ms:.0f}ms"
+                            f"{', stack logged above' if stack_logged else ''})")
+
+    def _watch(self):
+        limit = self.interval + self.threshold_ms / 1000
+        while not self._stop.wait(min(self.interval, limit / 2)):
+            beat = self._beat
+            if not beat or beat == self._reported_beat or time.perf_counter() - beat < limit:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._reported_beat = beat
+            stack = "".join(traceback.format_stack(frame)[-STACK_DEPTH:])
+            log.warning(
+                f"Event loop blocked for over {self.threshold_ms:.0f}ms, currently running:\n{stack}"
+            )
+
+    async def start(self):
+        if not self.enabled or (self._task and not self._task.done()):
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._watchdog = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "interval_s": self.interval,
+            "threshold_ms": self.threshold_ms,
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "last_lag_ms": round(self.last_lag_ms, 3),
+            "max_lag_ms": round(self.max_lag_ms, 3),
+        }
+
+
+loop_monitor = LoopLagMonitor(config.LOOP_LAG_INTERVAL, config.LOOP_LAG_THRESHOLD_MS)
@@ -0,0 +1,335 @@
+"""
+进程内指标：计数器、仪表值与延迟直方图
+In-process metrics: counters, gauges and latency histograms.
+
+记录只是在内存中加一次锁累加（可在事件循环与线程池中调用），开销可忽略：
+
+    metrics.inc("http_requests_total", labels={"host": host, "endpoint": endpoint, "outcome": "ok"})
+    metrics.observe("http_request_duration_ms", latency_ms, {"host": host, "endpoint": endpoint})
+    with metrics.timer("sync_duration_ms", {"job": "hulaquan"}):
+        ...
+
+直方图为 HDR 风格的对数-线性分桶：每个 2 的幂区间再等分为 SUB_BUCKETS 个子桶，任意量级的相对误差
+都不超过 1/SUB_BUCKETS，内存只与数值跨度有关，与样本数无关。
+
+两种出口：
+- ``render_prometheus()``：Prometheus 文本格式（web_app.py 的 ``/metrics``），计数器与直方图为进程启动以来的累计值
+- ``start()`` 后每 ``HLQ_METRICS_FLUSH_INTERVAL`` 秒批量写入 ``Metric`` 表：计数器写本周期增量，仪表写当前值，
+  直方图写本周期的 ``_count/_p50/_p95/_p99/_max``；超过 ``HLQ_METRICS_RETENTION_DAYS`` 的行定期清理
+
+``register_collector(fn)`` 注册在导出/写库前调用的采集函数（返回 ``(name, value, labels)``），
+用于连接池、重试管理器、队列深度等已有统计。
+
+Recording is a lock + add; exports are Prometheus text (cumulative) and batched ``Metric`` rows per
+flush interval (counter deltas, gauge values, windowed histogram quantiles).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from services.config import config
+
+log = logging.getLogger(__name__)
+
+Labels = Optional[Mapping[str, object]]
+_LabelKey = Tuple[Tuple[str, str], ...]
+_SeriesKey = Tuple[str, _LabelKey]
+Collector = Callable[[], Iterable[Tuple[str, float, Labels]]]
+
+# Cumulative ``le`` buckets exported to Prometheus (ms); sync durations run into minutes
+# 导出给 Prometheus 的累计分桶上界（毫秒）
+EXPORT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+
+FLUSH_QUANTILES = (50, 95, 99)
+
+_PRUNE_INTERVAL = 3600
+_NAME_INVALID = re.compile(r"[^a-zA-Z0-9_:]")
+
+
+def _label_key(labels: Labels) -> _LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def gauges_from(prefix: str, stats: Mapping[str, object], labels: Labels = None) -> Iterator[Tuple[str, float, Labels]]:
+    """Numeric fields of a ``get_stats()`` dict as ``{prefix}_{field}`` gauges (for collectors)."""
+    for field, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}_{field}", value, labels
+
+
+def labels_hash(key: _LabelKey) -> str:
+    return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram: bounded relative error (1/SUB_BUCKETS) at every magnitude."""
+
+    SUB_BUCKETS = 16
+    MIN_VALUE = 1e-3
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    @classmethod
+    def _index(cls, value: float) -> int:
+        # value = m * 2**e with m in [0.5, 1); split [0.5, 1) into SUB_BUCKETS linear steps
+        m, e = math.frexp(max(value, cls.MIN_VALUE))
+        return e * cls.SUB_BUCKETS + int((m - 0.5) * 2 * cls.SUB_BUCKETS)
+
+    @classmethod
+    def _upper(cls, index: int) -> float:
+        e, sub = divmod(index, cls.SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2 * cls.SUB_BUCKETS), e)
+
+    def record(self, value: float):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds: Iterable[float]) -> List[Tuple[float, int]]:
+        """(le, count) pairs; a sub-bucket counts towards ``le`` when its upper bound is within it."""
+        ordered = sorted(self.counts.items())
+        result = []
+        seen = 0
+        i = 0
+        for bound in bounds:
+            while i < len(ordered) and self._upper(ordered[i][0]) <= bound:
+                seen += ordered[i][1]
+                i += 1
+            result.append((bound, seen))
+        return result
+
+
+class MetricsRegistry:
+    """计数器 / 仪表 / 直方图注册表，附带批量写入 Metric 表的后台任务"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[_SeriesKey, float] = {}
+        self._gauges: Dict[_SeriesKey, float] = {}
+        self._histograms: Dict[_SeriesKey, LatencyHistogram] = {}  # since start (Prometheus)
+        self._window: Dict[_SeriesKey, LatencyHistogram] = {}  # since last flush (Metric rows)
+        self._flushed_counters: Dict[_SeriesKey, float] = {}
+        self._collectors: List[Collector] = []
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+        self.flushes = 0
+        self.rows_written = 0
+
+    # --- Recording / 记录 ---
+
+    def inc(self, name: str, value: float = 1.0, labels: Labels = None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, labels: Labels = None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = float(value)
+
+    def observe(self, name: str, value: float, labels: Labels = None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = LatencyHistogram()
+            hist.record(value)
+            window = self._window.get(key)
+            if window is None:
+                window = self._window[key] = LatencyHistogram()
+            window.record(value)
+
+    @contextmanager
+    def timer(self, name: str, labels: Labels = None) -> Iterator[None]:
+        """Observe the block's duration (ms) with an ``outcome`` label of ok / error."""
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000, {**(labels or {}), "outcome": outcome})
+
+    def register_collector(self, collector: Collector):
+        """``collector()`` -> iterable of (name, value, labels) gauges, run before every export/flush."""
+        self._collectors.append(collector)
+
+    def collect(self):
+        """Run the registered collectors (may hit the DB: call from a worker thread)."""
+        for collector in list(self._collectors):
+            try:
+                for name, value, labels in collector():
+                    if value is not None:
+                        self.set(name, value, labels)
+            except Exception as e:
+                log.debug(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+
+    # --- Prometheus text / Prometheus 文本格式 ---
+
+    @staticmethod
+    def _prom_labels(key: _LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = key + extra
+        if not pairs:
+            return ""
+        escaped = (
+            (_NAME_INVALID.sub("_", k), v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+            for k, v in pairs
+        )
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(
+                (key, h.cumulative(EXPORT_BUCKETS_MS), h.count, h.sum) for key, h in self._histograms.items()
+            )
+
+        lines = []
+        typed = set()
+
+        def _type(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, key), value in counters:
+            name = _NAME_INVALID.sub("_", name)
+            _type(name, "counter")
+            lines.append(f"{name}{self._prom_labels(key)} {value:g}")
+        for (name, key), value in gauges:
+            name = _NAME_INVALID.sub("_", name)
+            _type(name, "gauge")
+            lines.append(f"{name}{self._prom_labels(key)} {value:g}")
+        for (name, key), buckets, count, total in histograms:
+            name = _NAME_INVALID.sub("_", name)
+            _type(name, "histogram")
+            for bound, cumulative in buckets:
+                lines.append(f"{name}_bucket{self._prom_labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{self._prom_labels(key, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{self._prom_labels(key)} {total:g}")
+            lines.append(f"{name}_count{self._prom_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    # --- Metric table / 写入 Metric 表 ---
+
+    def _flush_rows(self) -> List[Tuple[str, float, _LabelKey]]:
+        """Rows for this flush window; resets the window histograms and the counter baselines."""
+        rows = []
+        with self._lock:
+            for key, value in self._counters.items():
+                delta = value - self._flushed_counters.get(key, 0.0)
+                if delta:
+                    rows.append((key[0], delta, key[1]))
+                self._flushed_counters[key] = value
+            for key, value in self._gauges.items():
+                rows.append((key[0], value, key[1]))
+            window, self._window = self._window, {}
+        for (name, key), hist in window.items():
+            rows.append((f"{name}_count", float(hist.count), key))
+            for q in FLUSH_QUANTILES:
+                rows.append((f"{name}_p{q}", round(hist.percentile(q), 3), key))
+            rows.append((f"{name}_max", round(hist.max, 3), key))
+        return rows
+
+    def flush(self) -> int:
+        """Collect, then write one batch of Metric rows (blocking: run in a worker thread)."""
+        from sqlalchemy import delete
+
+        from services.db.connection import session_scope
+        from services.db.models.observability import Metric
+        from services.utils.timezone import now as timezone_now
+
+        self.collect()
+        rows = self._flush_rows()
+        now_ts = time.time()
+        prune = now_ts - self._last_prune > _PRUNE_INTERVAL
+        if not rows and not prune:
+            return 0
+
+        with session_scope() as session:
+            session.add_all([
+                Metric(name=name, value=value, labels=dict(key) or None, labels_hash=labels_hash(key) if key else None)
+                for name, value, key in rows
+            ])
+            if prune:
+                cutoff = timezone_now() - timedelta(days=config.METRICS_RETENTION_DAYS)
+                session.exec(delete(Metric).where(Metric.created_at < cutoff))
+        if prune:
+            self._last_prune = now_ts
+        self.flushes += 1
+        self.rows_written += len(rows)
+        return len(rows)
+
+    async def _flush_loop(self, interval: float):
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                await asyncio.to_thread(self.flush)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.warning(f"Metrics flush failed: {e}")
+
+    async def start(self, interval: Optional[float] = None):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._flush_loop(interval or config.METRICS_FLUSH_INTERVAL))
+
+    async def stop(self):
+        """Stop the flush task and write the last partial window."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            log.warning(f"Final metrics flush failed: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "counters": len(self._counters),
+                "gauges": len(self._gauges),
+                "histograms": len(self._histograms),
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+            }
+
+
+metrics = MetricsRegistry()
@@ -1,15 +1,21 @@
 """
 网络健康检查与熔断器模块
 防止DNS故障、网络断连等问题导致的服务雪崩
+
+upstream_monitor 为呼啦圈/扫剧各维护一个熔断器(见 UpstreamMonitor)
 """
 import asyncio
+import logging
 import time
 from enum import Enum
-from typing import Optional, Callable
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import aiohttp
-from ncatbot.utils.logger import get_log
 
-log = get_log()
+from services.config import config
+from services.system.http_clients import http_clients
+from services.system.metrics import metrics
+
+log = logging.getLogger(__name__)
 
 
 class CircuitState(Enum):
@@ -151,22 +157,93 @@ class NetworkHealthChecker:
             return False
 
 
+class CircuitOpenError(Exception):
+    """熔断器开启期间拒绝调用(快速失败, 不发出请求)"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"熔断器开启中,拒绝调用 {name} ({retry_after:.0f}s 后重试)")
+        self.name = name
+        self.retry_after = retry_after
+
+
 class CircuitBreaker:
-    """熔断器 - 防止故障扩散"""
+    """熔断器 - 防止故障扩散
+    
+    连续失败达到阈值后进入 OPEN, 期间 allow() 返回 False; timeout 秒后(或后台探测成功时)
+    进入 HALF_OPEN 放行试探请求, 成功即恢复 CLOSED, 失败则重新 OPEN。
+    既可作为装饰器/call() 使用, 也可由调用方显式 allow()/record_success()/record_failure()。
+    """
     
     def __init__(
         self, 
         failure_threshold: int = 5,      # 失败阈值
         timeout: int = 60,                # 熔断超时(秒)
-        expected_exception: tuple = (Exception,)
+        expected_exception: tuple = (Exception,),
+        name: str = "",
     ):
         self.failure_threshold = failure_threshold
         self.timeout = timeout
         self.expected_exception = expected_exception
+        self.name = name
         
         self.failure_count = 0
         self.last_failure_time = 0
+        self.last_success_time = 0
         self.state = CircuitState.CLOSED
+        self.open_count = 0
+        self.rejected = 0
+    
+    @property
+    def retry_after(self) -> float:
+        """OPEN 状态下距离进入 HALF_OPEN 的秒数"""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self.timeout - (time.time() - self.last_failure_time))
+    
+    def allow(self) -> bool:
+        """是否放行本次调用(OPEN 超时后转为 HALF_OPEN 并放行)"""
+        if self.state == CircuitState.OPEN:
+            if self.retry_after > 0:
+                self.rejected += 1
+                return False
+            log.info(f"🔄 熔断器进入半开状态: {self.name}")
+            self.state = CircuitState.HALF_OPEN
+        return True
+    
+    def half_open(self):
+        """后台探测成功: 提前放行试探请求"""
+        if self.state == CircuitState.OPEN:
+            log.info(f"🔄 探测成功, 熔断器进入半开状态: {self.name}")
+            self.state = CircuitState.HALF_OPEN
+    
+    def record_success(self):
+        self.last_success_time = time.time()
+        if self.state != CircuitState.CLOSED:
+            log.info(f"✅ 熔断器恢复正常: {self.name}")
+            self.state = CircuitState.CLOSED
+        self.failure_count = 0
+    
+    def record_failure(self):
+        self.failure_count += 1
+        self.last_failure_time = time.time()
+        
+        # 达到阈值(或半开试探失败), 开启熔断
+        if self.state == CircuitState.HALF_OPEN or self.failure_count >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                self.open_count += 1
+                log.error(f"🔥 熔断器开启: {self.name} (连续失败{self.failure_count}次, {self.timeout}s 后试探)")
+            self.state = CircuitState.OPEN
+    
+    def get_stats(self) -> Dict:
+        return {
+            "state": self.state.value,
+            "failure_count": self.failure_count,
+            "retry_after_s": round(self.retry_after, 1),
+            "open_count": self.open_count,
+            "rejected": self.rejected,
+            "last_failure": self.last_failure_time or None,
+            "last_success": self.last_success_time or None,
+        }
     
     def __call__(self, func: Callable):
         """装饰器用法"""
@@ -176,40 +253,123 @@ class CircuitBreaker:
     
     async def call(self, func: Callable, *args, **kwargs):
         """执行函数调用(带熔断保护)"""
-        
-        # 检查是否需要从OPEN转到HALF_OPEN
-        if self.state == CircuitState.OPEN:
-            if time.time() - self.last_failure_time > self.timeout:
-                log.info(f"🔄 熔断器进入半开状态: {func.__name__}")
-                self.state = CircuitState.HALF_OPEN
-            else:
-                raise Exception(f"熔断器开启中,拒绝调用 {func.__name__}")
+        if not self.allow():
+            raise CircuitOpenError(self.name or func.__name__, self.retry_after)
         
         try:
             result = await func(*args, **kwargs)
-            
-            # 成功调用,重置计数
-            if self.state == CircuitState.HALF_OPEN:
-                log.info(f"✅ 熔断器恢复正常: {func.__name__}")
-                self.state = CircuitState.CLOSED
-                self.failure_count = 0
-            
-            return result
-        
-        except self.expected_exception as e:
-            self.failure_count += 1
-            self.last_failure_time = time.time()
-            
-            # 达到阈值,开启熔断
-            if self.failure_count >= self.failure_threshold:
-                self.state = CircuitState.OPEN
-                log.error(f"🔥 熔断器开启: {func.__name__} (失败{self.failure_count}次)")
-            
+        except self.expected_exception:
+            self.record_failure()
             raise
+        
+        self.record_success()
+        return result
+
+
+class UpstreamMonitor:
+    """按上游(呼啦圈/扫剧)的熔断器, 以及熔断期间的后台探测
+    
+    熔断器由 AdvancedCrawlerClient 在每次请求(含重试耗尽)后更新; 调度器在熔断期间跳过对应同步,
+    本监控每 probe_interval 秒对 OPEN 的上游发一个轻量请求, 成功即转为 HALF_OPEN,
+    下一轮调度即可恢复同步, 无需等满 open_seconds。
+    名称与 services/system/data_version 的数据域一致, 响应缓存中间件据此给对应接口标记数据过期。
+    """
+    
+    def __init__(self, failure_threshold: int = 3, open_seconds: int = 300,
+                 probe_interval: float = 30.0, probe_timeout: float = 5.0):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._probes: Dict[str, Tuple[str, Optional[bool]]] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def breaker(self, name: str, probe_url: Optional[str] = None, ssl: Optional[bool] = None) -> CircuitBreaker:
+        """获取(或创建)上游熔断器; probe_url 为熔断期间的探测地址"""
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=self.failure_threshold,
+                timeout=self.open_seconds,
+                name=name,
+            )
+            self._breakers[name] = breaker
+        if probe_url:
+            self._probes[name] = (probe_url, ssl)
+        return breaker
+    
+    def is_open(self, name: str) -> bool:
+        """熔断中且未到试探时间(调度器据此跳过同步)"""
+        breaker = self._breakers.get(name)
+        return breaker is not None and breaker.retry_after > 0
+    
+    def stale_domains(self, names: Iterable[str]) -> List[str]:
+        """上游不健康(OPEN/HALF_OPEN)的数据域: 本地数据为最后一次成功同步的快照"""
+        return [n for n in names if n in self._breakers and self._breakers[n].state != CircuitState.CLOSED]
+    
+    async def probe(self, name: str) -> bool:
+        url, ssl = self._probes[name]
+        session = http_clients.session_for(url, ssl=ssl)
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=self.probe_timeout)) as resp:
+                return resp.status < 500
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.debug(f"上游探测失败 {name}: {type(e).__name__}: {e}")
+            return False
+    
+    async def _probe_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.probe_interval)
+                for name, breaker in list(self._breakers.items()):
+                    if breaker.state != CircuitState.OPEN or name not in self._probes:
+                        continue
+                    if await self.probe(name):
+                        breaker.half_open()
+                    else:
+                        # 仍不可达: 刷新熔断计时
+                        breaker.record_failure()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.error(f"上游探测异常: {e}")
+    
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._probe_loop())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_stats(self) -> Dict:
+        return {name: breaker.get_stats() for name, breaker in self._breakers.items()}
+
+    def collect_metrics(self):
+        # 0 = closed, 1 = half-open, 2 = open
+        levels = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+        for name, breaker in list(self._breakers.items()):
+            labels = {"upstream": name}
+            yield "upstream_circuit_state", levels[breaker.state], labels
+            yield "upstream_circuit_open_count", breaker.open_count, labels
+            yield "upstream_circuit_rejected", breaker.rejected, labels
 
 
 # 全局实例
 network_health_checker = NetworkHealthChecker()
+upstream_monitor = UpstreamMonitor(
+    failure_threshold=config.UPSTREAM_FAILURE_THRESHOLD,
+    open_seconds=config.UPSTREAM_OPEN_SECONDS,
+    probe_interval=config.UPSTREAM_PROBE_INTERVAL,
+    probe_timeout=config.UPSTREAM_PROBE_TIMEOUT,
+)
 
 
 async def safe_http_request(
@@ -238,30 +398,24 @@ async def safe_http_request(
         sock_read=timeout
     )
     
-    connector = aiohttp.TCPConnector(
-        limit=10,
-        ttl_dns_cache=300,
-        family=0
-    )
+    # 进程级共享连接(长连接复用、DNS缓存); 以前每次重试都新建 Session,
+    # 而退出 Session 会关闭传入的连接器, 导致第二次尝试必然失败
+    session = http_clients.session_for(url)
     
     # 3. 重试逻辑(指数退避)
     for attempt in range(max_retries):
         try:
-            async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout_config
-            ) as session:
-                async with session.request(method, url, **kwargs) as resp:
-                    if resp.status >= 500:
-                        # 服务器错误,可能需要重试
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(2 ** attempt)  # 指数退避
-                            continue
-                        return False, f"服务器错误: {resp.status}"
-                    
-                    # 成功
-                    data = await resp.text()
-                    return True, data
+            async with session.request(method, url, timeout=timeout_config, **kwargs) as resp:
+                if resp.status >= 500:
+                    # 服务器错误,可能需要重试
+                    if attempt < max_retries - 1:
+                        await asyncio.sleep(2 ** attempt)  # 指数退避
+                        continue
+                    return False, f"服务器错误: {resp.status}"
+                
+                # 成功
+                data = await resp.text()
+                return True, data
         
         except asyncio.TimeoutError:
             log.warning(f"请求超时 (尝试 {attempt + 1}/{max_retries}): {url}")
@@ -280,3 +434,4 @@ async def safe_http_request(
             return False, str(e)
     
     return False, "达到最大重试次数"
+metrics.register_collector(upstream_monitor.collect_metrics)
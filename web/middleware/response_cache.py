@@ -0,0 +1,195 @@
+"""
+Response Cache Middleware
+响应缓存中间件
+
+功能：
+- 公共 GET 接口的响应按 (路由, 规范化查询参数) 缓存预编码的响应体
+- 缓存与全局数据版本号（services/system/data_version.py）绑定，同步写入后自动失效
+- 支持 If-None-Match -> 304，并下发 ETag 与 stale-while-revalidate，方便 Nginx/浏览器分担流量
+
+Public GET endpoints are cached as pre-encoded bodies keyed by route + normalized query params.
+An entry is valid while the data versions of its domains are unchanged (and, for rules with a ``ttl``,
+within the same ttl-sized time bucket).
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from services.system import data_version
+from services.system.network_health import upstream_monitor
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CacheRule:
+    """一条缓存规则：匹配路径 -> 依赖的数据域与 Cache-Control 参数"""
+    pattern: str
+    domains: Tuple[str, ...]
+    max_age: int = 30
+    stale_while_revalidate: int = 60
+    # Also expire entries every ``ttl`` seconds, for responses that depend on the clock (e.g. "last 24h")
+    # 响应依赖当前时间（如“最近 24 小时”）时，条目另按 ttl 秒过期
+    ttl: Optional[int] = None
+    # Query params that never affect the response (cache busters etc.)
+    # 不影响响应内容的查询参数（如防缓存参数）
+    ignore_params: FrozenSet[str] = frozenset({"_", "t", "v"})
+    _regex: "re.Pattern" = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_regex", re.compile(self.pattern))
+
+    def matches(self, path: str) -> bool:
+        return self._regex.match(path) is not None
+
+    @property
+    def cache_control(self) -> str:
+        return f"public, max-age={self.max_age}, stale-while-revalidate={self.stale_while_revalidate}"
+
+
+DEFAULT_RULES: List[CacheRule] = [
+    CacheRule(r"^/api/events/(list|search|date)$", (data_version.HULAQUAN,), max_age=30),
+    # Hot ranking is windowed on "now", so it goes stale without any data change
+    # 热度排行按当前时间计算窗口，没有数据变化也会过期
+    CacheRule(r"^/api/events/hot$", (data_version.HULAQUAN,), max_age=60, ttl=300),
+    # Co-cast search reads Saoju shows (default) or Hulaquan tickets (only_student), so it depends on both
+    # 同台演员查询默认读扫剧排期（only_student 时读呼啦圈票务），依赖两个数据域
+    CacheRule(r"^/api/events/co-cast$", (data_version.HULAQUAN, data_version.SAOJU), max_age=60),
+    # Event detail: ID-shaped segments only, so named routes under /api/events/ never fall through here
+    # 事件详情：仅匹配 ID 形式的路径段，避免 /api/events/ 下的具名路由落入此规则
+    CacheRule(r"^/api/events/\d+$", (data_version.HULAQUAN,), max_age=30),
+    # Ticket feed: always revalidate, but a 304 is nearly free
+    # 票务动态：每次都重新验证，但 304 几乎没有开销
+    CacheRule(r"^/api/tickets/recent-updates$", (data_version.HULAQUAN,), max_age=0, stale_while_revalidate=30),
+    CacheRule(r"^/api/analytics/", (data_version.SAOJU,), max_age=300, stale_while_revalidate=3600),
+    CacheRule(r"^/api/meta/artists$", (data_version.SAOJU,), max_age=300, stale_while_revalidate=3600),
+]
+
+
+@dataclass
+class _CacheEntry:
+    versions: Tuple[int, ...]
+    body: bytes
+    media_type: str
+    etag: str
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """公共 GET 接口响应缓存中间件"""
+
+    def __init__(self, app, rules: Optional[Sequence[CacheRule]] = None,
+                 max_entries: int = 1024, max_body_bytes: int = 2 * 1024 * 1024):
+        super().__init__(app)
+        self.rules = list(rules) if rules is not None else DEFAULT_RULES
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _match_rule(self, path: str) -> Optional[CacheRule]:
+        for rule in self.rules:
+            if rule.matches(path):
+                return rule
+        return None
+
+    @staticmethod
+    def _cache_key(request: Request, rule: CacheRule) -> str:
+        params = sorted(
+            (k, v) for k, v in parse_qsl(request.url.query, keep_blank_values=False)
+            if k not in rule.ignore_params
+        )
+        query = "&".join(f"{k}={v}" for k, v in params)
+        return f"{request.url.path}?{query}"
+
+    @staticmethod
+    def _etag_matches(request: Request, etag: str) -> bool:
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        if header.strip() == "*":
+            return True
+        # Weak comparison: nginx may add W/ when it compresses the body
+        # 弱比较：nginx 压缩时可能加上 W/ 前缀
+        candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+        return etag in candidates
+
+    def _respond(self, request: Request, entry: _CacheEntry, rule: CacheRule, cache_status: str) -> Response:
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": rule.cache_control,
+            "X-Cache": cache_status,
+        }
+        # Upstream circuit open: the data is the last successful sync, say so instead of blocking
+        # 上游熔断中：数据为最后一次成功同步的快照，通过响应头标记
+        stale = upstream_monitor.stale_domains(sorted(rule.domains))
+        if stale:
+            headers["X-Data-Stale"] = ",".join(stale)
+            headers["Warning"] = '110 - "Response is Stale"'
+        if self._etag_matches(request, entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    def _store(self, key: str, entry: _CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method != "GET":
+            return await call_next(request)
+
+        rule = self._match_rule(request.url.path)
+        if rule is None:
+            return await call_next(request)
+
+        key = self._cache_key(request, rule)
+        # Captured before the handler runs: a write landing mid-request makes this entry stale on the next hit
+        # 在处理前记录版本：处理期间发生的写入会让该条目在下次访问时失效
+        versions = data_version.snapshot(rule.domains)
+        if rule.ttl:
+            versions += (int(time.time() // rule.ttl),)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.versions == versions:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._respond(request, entry, rule, "HIT")
+
+        self.misses += 1
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        media_type = response.headers.get("content-type", "")
+        if not media_type.startswith("application/json"):
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        # Handlers like /api/analytics/* report failures in-band with a 200; don't pin those
+        # 部分接口（如 /api/analytics/*）以 200 返回错误信息，这类响应不缓存
+        cacheable = len(body) <= self.max_body_bytes and b'"error"' not in body
+        entry = _CacheEntry(
+            versions=versions,
+            body=body,
+            media_type=media_type,
+            etag=f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+        )
+        if cacheable:
+            self._store(key, entry)
+        else:
+            log.debug(f"Response for {key} not cached ({len(body)} bytes)")
+        return self._respond(request, entry, rule, "MISS")
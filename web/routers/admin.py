@@ -19,6 +19,9 @@ from zoneinfo import ZoneInfo
 from services.hulaquan.tables import HulaquanSearchLog
 from services.db.models import Feedback
 from services.db.connection import session_scope
+# Write handlers run their sessions on the DB executor: a write may wait on SQLite's lock behind the sync
+# 写操作在数据库线程池中执行：写入可能需要等待同步任务释放 SQLite 写锁，不能阻塞事件循环
+from services.db.executor import db_executor
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 api_router = APIRouter(prefix="/api/admin", tags=["Admin API"])
@@ -275,7 +278,7 @@ async def get_search_analytics(admin_session: str = Cookie(None, alias=ADMIN_COO
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
+    with session_scope(readonly=True) as session:
         logs = session.exec(select(HulaquanSearchLog)).all()
         
         artist_counts = Counter()
@@ -319,7 +322,7 @@ async def get_feedbacks(limit: int = 50, admin_session: str = Cookie(None, alias
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
+    with session_scope(readonly=True) as session:
         stmt = select(Feedback).where(Feedback.is_ignored == False).order_by(col(Feedback.created_at).desc()).limit(limit)
         items = session.exec(stmt).all()
         return {
@@ -334,7 +337,7 @@ async def get_ignored_feedbacks(limit: int = 100, admin_session: str = Cookie(No
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
+    with session_scope(readonly=True) as session:
         stmt = select(Feedback).where(Feedback.is_ignored == True).order_by(col(Feedback.ignored_at).desc()).limit(limit)
         items = session.exec(stmt).all()
         return {
@@ -349,19 +352,21 @@ async def reply_feedback(feedback_id: int, req: FeedbackReplyRequest, admin_sess
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
-        fb = session.get(Feedback, feedback_id)
-        if not fb:
-            raise HTTPException(status_code=404, detail="Not found")
-            
-        fb.admin_reply = req.reply
-        fb.is_public = req.is_public
-        if req.reply:
-            fb.reply_at = datetime.now(ZoneInfo("Asia/Shanghai"))
-            fb.status = "closed"
-            
-        session.add(fb)
-        
+    def _write():
+        with session_scope() as session:
+            fb = session.get(Feedback, feedback_id)
+            if not fb:
+                raise HTTPException(status_code=404, detail="Not found")
+
+            fb.admin_reply = req.reply
+            fb.is_public = req.is_public
+            if req.reply:
+                fb.reply_at = datetime.now(ZoneInfo("Asia/Shanghai"))
+                fb.status = "closed"
+
+            session.add(fb)
+
+    await db_executor.run(_write)
     return {"status": "ok"}
 
 
@@ -371,15 +376,17 @@ async def ignore_feedback(feedback_id: int, admin_session: str = Cookie(None, al
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
-        fb = session.get(Feedback, feedback_id)
-        if not fb:
-            raise HTTPException(status_code=404, detail="Not found")
-            
-        fb.is_ignored = True
-        fb.ignored_at = datetime.now(ZoneInfo("Asia/Shanghai"))
-        session.add(fb)
-        
+    def _write():
+        with session_scope() as session:
+            fb = session.get(Feedback, feedback_id)
+            if not fb:
+                raise HTTPException(status_code=404, detail="Not found")
+
+            fb.is_ignored = True
+            fb.ignored_at = datetime.now(ZoneInfo("Asia/Shanghai"))
+            session.add(fb)
+
+    await db_executor.run(_write)
     return {"status": "ok"}
 
 
@@ -389,15 +396,17 @@ async def unignore_feedback(feedback_id: int, admin_session: str = Cookie(None,
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
-        fb = session.get(Feedback, feedback_id)
-        if not fb:
-            raise HTTPException(status_code=404, detail="Not found")
-            
-        fb.is_ignored = False
-        fb.ignored_at = None
-        session.add(fb)
-        
+    def _write():
+        with session_scope() as session:
+            fb = session.get(Feedback, feedback_id)
+            if not fb:
+                raise HTTPException(status_code=404, detail="Not found")
+
+            fb.is_ignored = False
+            fb.ignored_at = None
+            session.add(fb)
+
+    await db_executor.run(_write)
     return {"status": "ok"}
 
 
@@ -407,14 +416,16 @@ async def resolve_feedback(feedback_id: int, admin_session: str = Cookie(None, a
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
-        fb = session.get(Feedback, feedback_id)
-        if not fb:
-            raise HTTPException(status_code=404, detail="Not found")
-            
-        fb.status = "closed"
-        session.add(fb)
-        
+    def _write():
+        with session_scope() as session:
+            fb = session.get(Feedback, feedback_id)
+            if not fb:
+                raise HTTPException(status_code=404, detail="Not found")
+
+            fb.status = "closed"
+            session.add(fb)
+
+    await db_executor.run(_write)
     return {"status": "ok"}
 
 
@@ -424,14 +435,16 @@ async def reopen_feedback(feedback_id: int, admin_session: str = Cookie(None, al
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
-        fb = session.get(Feedback, feedback_id)
-        if not fb:
-            raise HTTPException(status_code=404, detail="Not found")
-            
-        fb.status = "open"
-        session.add(fb)
-        
+    def _write():
+        with session_scope() as session:
+            fb = session.get(Feedback, feedback_id)
+            if not fb:
+                raise HTTPException(status_code=404, detail="Not found")
+
+            fb.status = "open"
+            session.add(fb)
+
+    await db_executor.run(_write)
     return {"status": "ok"}
 
 
@@ -441,12 +454,14 @@ async def delete_feedback(feedback_id: int, admin_session: str = Cookie(None, al
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
-        fb = session.get(Feedback, feedback_id)
-        if not fb:
-            raise HTTPException(status_code=404, detail="Not found")
-        session.delete(fb)
-        
+    def _write():
+        with session_scope() as session:
+            fb = session.get(Feedback, feedback_id)
+            if not fb:
+                raise HTTPException(status_code=404, detail="Not found")
+            session.delete(fb)
+
+    await db_executor.run(_write)
     return {"status": "ok"}
 
 
@@ -567,3 +582,65 @@ async def get_logs(
     except Exception as e:
         return f"Failed to read log file ({target_file}): {str(e)}"
 
+
+
+@api_router.get("/db/pool")
+async def get_db_pool_metrics(admin_session: str = Cookie(None, alias=ADMIN_COOKIE_NAME)):
+    """数据库连接池状态（读/写引擎的连接数、等待时间与占用时间）、数据库线程池与事件循环延迟"""
+    if not admin_session or not verify_admin_session(admin_session):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    from services.db.connection import get_pool_metrics
+    from services.db.executor import db_executor
+    from services.system.loop_monitor import loop_monitor
+    return {"pools": get_pool_metrics(), "executor": db_executor.get_stats(), "event_loop": loop_monitor.get_stats()}
+
+
+@api_router.get("/db/queries")
+async def get_db_query_profile(
+    top: int = 50,
+    order_by: str = "total_ms",
+    admin_session: str = Cookie(None, alias=ADMIN_COOKIE_NAME),
+):
+    """SQL 查询分析：按指纹统计的调用次数/耗时、慢查询与疑似 N+1（需 HLQ_DB_PROFILE 或运行时开启）"""
+    if not admin_session or not verify_admin_session(admin_session):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    from services.db.profiler import profiler
+    return profiler.report(top=max(1, min(top, 500)), order_by=order_by)
+
+
+@api_router.post("/db/profiler")
+async def toggle_db_profiler(
+    enabled: Optional[bool] = None,
+    reset: bool = False,
+    admin_session: str = Cookie(None, alias=ADMIN_COOKIE_NAME),
+):
+    """运行时开启/关闭查询分析，或清空已收集的统计"""
+    if not admin_session or not verify_admin_session(admin_session):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    from services.db.profiler import profiler
+    if enabled is not None:
+        profiler.enabled = enabled
+    if reset:
+        profiler.reset()
+    return {"enabled": profiler.enabled, "slow_ms": profiler.slow_ms, "n_plus_one_threshold": profiler.n_plus_one_threshold}
+
+
+@api_router.get("/crawl/stats")
+async def get_crawl_stats(
+    admin_session: str = Cookie(None, alias=ADMIN_COOKIE_NAME),
+):
+    """外部接口爬取统计：按主机的并发/速率限制、在途请求数、最近各次爬取的请求数与延迟直方图、共享连接器、上游熔断状态"""
+    if not admin_session or not verify_admin_session(admin_session):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    from services.crawler.crawl_executor import crawl_executor
+    from services.system.http_clients import http_clients
+    from services.system.network_health import upstream_monitor
+    return {
+        **crawl_executor.get_stats(),
+        "http": http_clients.get_stats(),
+        "upstreams": upstream_monitor.get_stats(),
+    }
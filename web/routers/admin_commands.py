@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Cookie, HTTPException, Body
 from services.db.connection import session_scope
+from services.db.executor import db_executor
 from services.db.models import BotAlias
 from services.bot.commands import COMMAND_REGISTRY, refresh_alias_cache
 from web.routers.admin_utils import verify_admin_session, ADMIN_COOKIE_NAME
@@ -32,33 +33,36 @@ async def get_commands(admin_session: str = Cookie(None, alias=ADMIN_COOKIE_NAME
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
-        # 获取所有别名数据
-        db_aliases = session.exec(select(BotAlias)).all()
-        
-        # 按 command_key 分组
-        alias_map = {}
-        for item in db_aliases:
-            if item.command_key not in alias_map:
-                alias_map[item.command_key] = []
-            alias_map[item.command_key].append(AliasResponse(
-                id=item.id,
-                command_key=item.command_key,
-                alias=item.alias,
-                is_default=item.is_default
-            ))
-            
-        # 构建返回列表
-        result = []
-        for cmd in COMMAND_REGISTRY:
-            result.append(CommandInfo(
-                key=cmd.key,
-                canonical=cmd.canonical,
-                description=cmd.description,
-                aliases=alias_map.get(cmd.key, [])
-            ))
-            
-        return result
+    def _read():
+        with session_scope(readonly=True) as session:
+            # 获取所有别名数据
+            db_aliases = session.exec(select(BotAlias)).all()
+
+            # 按 command_key 分组
+            alias_map = {}
+            for item in db_aliases:
+                if item.command_key not in alias_map:
+                    alias_map[item.command_key] = []
+                alias_map[item.command_key].append(AliasResponse(
+                    id=item.id,
+                    command_key=item.command_key,
+                    alias=item.alias,
+                    is_default=item.is_default
+                ))
+
+            # 构建返回列表
+            result = []
+            for cmd in COMMAND_REGISTRY:
+                result.append(CommandInfo(
+                    key=cmd.key,
+                    canonical=cmd.canonical,
+                    description=cmd.description,
+                    aliases=alias_map.get(cmd.key, [])
+                ))
+
+            return result
+
+    return await db_executor.run(_read)
 
 @router.post("/aliases", response_model=AliasResponse)
 async def create_alias(item: AliasCreate, admin_session: str = Cookie(None, alias=ADMIN_COOKIE_NAME)):
@@ -75,30 +79,33 @@ async def create_alias(item: AliasCreate, admin_session: str = Cookie(None, alia
         
     normalized_alias = item.alias.strip()
 
-    with session_scope() as session:
-        # 检查重复
-        existing = session.exec(select(BotAlias).where(BotAlias.alias == normalized_alias)).first()
-        if existing:
-            raise HTTPException(status_code=400, detail=f"Alias '{normalized_alias}' already exists")
-            
-        new_alias = BotAlias(
-            command_key=item.command_key,
-            alias=normalized_alias,
-            is_default=False
-        )
-        session.add(new_alias)
-        session.commit()
-        session.refresh(new_alias)
-        
-        # 刷新缓存
-        refresh_alias_cache(session)
-        
-        return AliasResponse(
-            id=new_alias.id,
-            command_key=new_alias.command_key,
-            alias=new_alias.alias,
-            is_default=new_alias.is_default
-        )
+    def _write():
+        with session_scope() as session:
+            # 检查重复
+            existing = session.exec(select(BotAlias).where(BotAlias.alias == normalized_alias)).first()
+            if existing:
+                raise HTTPException(status_code=400, detail=f"Alias '{normalized_alias}' already exists")
+
+            new_alias = BotAlias(
+                command_key=item.command_key,
+                alias=normalized_alias,
+                is_default=False
+            )
+            session.add(new_alias)
+            session.commit()
+            session.refresh(new_alias)
+
+            # 刷新缓存
+            refresh_alias_cache(session)
+
+            return AliasResponse(
+                id=new_alias.id,
+                command_key=new_alias.command_key,
+                alias=new_alias.alias,
+                is_default=new_alias.is_default
+            )
+
+    return await db_executor.run(_write)
 
 @router.delete("/aliases/{alias_id}")
 async def delete_alias(alias_id: int, admin_session: str = Cookie(None, alias=ADMIN_COOKIE_NAME)):
@@ -106,20 +113,22 @@ async def delete_alias(alias_id: int, admin_session: str = Cookie(None, alias=AD
     if not admin_session or not verify_admin_session(admin_session):
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    with session_scope() as session:
-        alias = session.get(BotAlias, alias_id)
-        if not alias:
-            raise HTTPException(status_code=404, detail="Alias not found")
-            
-        # 可选：禁止删除默认别名？目前允许删除，因为默认别名也是在初始化时插入的
-        # 但如果允许删除默认别名，用户可能会误删常用词
-        # 策略：is_default 为 True 的，给予警告或禁止？
-        # 用户需求可以删除所有，这里暂不限制，但前端可以做提示
-        
-        session.delete(alias)
-        session.commit()
-        
-        # 刷新缓存
-        refresh_alias_cache(session)
-        
+    def _write():
+        with session_scope() as session:
+            alias = session.get(BotAlias, alias_id)
+            if not alias:
+                raise HTTPException(status_code=404, detail="Alias not found")
+
+            # 可选：禁止删除默认别名？目前允许删除，因为默认别名也是在初始化时插入的
+            # 但如果允许删除默认别名，用户可能会误删常用词
+            # 策略：is_default 为 True 的，给予警告或禁止？
+            # 用户需求可以删除所有，这里暂不限制，但前端可以做提示
+
+            session.delete(alias)
+            session.commit()
+
+            # 刷新缓存
+            refresh_alias_cache(session)
+
+    await db_executor.run(_write)
     return {"status": "ok"}
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import logging
 from datetime import datetime
+from typing import List, Optional
 
 from web.dependencies import (
     service, 
@@ -74,6 +75,19 @@ async def get_events_by_date(date: str):
     except ValueError:
         return {"error": "Invalid date format. Use YYYY-MM-DD"}
 
+@router.get("/api/events/hot")
+async def get_hot_events(hours: float = 24, limit: int = 20):
+    """Events ranked by sell-out velocity (tickets sold per hour) over the last `hours`."""
+    hours = min(max(hours, 1), 24 * 30)
+    limit = min(max(limit, 1), 100)
+    return {"window_hours": hours, "results": await service.get_hot_events(window_hours=hours, limit=limit)}
+
+@router.get("/api/events/{event_id}/stock")
+async def get_event_stock(event_id: str, hours: float = 24, points: bool = False):
+    """Stock trend of an event: velocity, time to sell-out, restocks; `points=true` adds each ticket's curve."""
+    hours = min(max(hours, 1), 24 * 30)
+    return await service.get_event_stock_stats(event_id, window_hours=hours, include_points=points)
+
 @router.get("/api/events/{event_id}")
 async def get_event_detail(event_id: str):
     """Get full details for a specific event."""
@@ -92,17 +106,85 @@ async def get_recent_ticket_updates(request: Request, limit: int = 20, types: st
 
     change_types = [t.strip() for t in types.split(",") if t.strip()] if types else None
     
-    updates = await service.get_recent_updates(limit=limit, change_types=change_types)
-    
-    return JSONResponse(
-        content={"results": [u.model_dump(mode='json') for u in updates]},
+    # Served from the in-memory ring buffer as a pre-encoded body;
+    # freshness is handled by ResponseCacheMiddleware (ETag + revalidation on every poll)
+    # 从内存环形缓冲返回预编码响应体；新鲜度由 ResponseCacheMiddleware 负责
+    body = await service.get_recent_updates_json(change_types=change_types, limit=limit)
+    return Response(content=body, media_type="application/json")
+
+
+# Seconds between keep-alive pings on idle live-feed connections (keeps Nginx/CDN from closing them)
+# 实时推送空闲时的心跳间隔（避免 Nginx/CDN 断开连接）
+FEED_HEARTBEAT_SECONDS = 15
+
+
+def _split_csv(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    items = [v.strip() for v in value.split(",") if v.strip()]
+    return items or None
+
+
+@router.get("/api/tickets/stream")
+async def stream_ticket_updates(
+    request: Request,
+    event_ids: Optional[str] = None,
+    types: Optional[str] = None,
+    actors: Optional[str] = None,
+):
+    """Server-Sent Events feed of ticket updates, filtered by event ids / change types / actors (comma separated)."""
+    logger.info("🎫 [用户行为] 订阅票务动态 (SSE)")
+    sub = service.ticket_feed.subscribe(_split_csv(event_ids), _split_csv(types), _split_csv(actors))
+
+    async def event_stream():
+        try:
+            # Tell EventSource to reconnect after 5s if the connection drops
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                item = await sub.get(timeout=FEED_HEARTBEAT_SECONDS)
+                if item is None:
+                    yield ": ping\n\n"
+                    continue
+                update, payload = item
+                yield f"event: {update.change_type}\ndata: {payload}\n\n"
+        finally:
+            sub.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
         headers={
-            "Cache-Control": "no-cache, no-store, must-revalidate, max-age=0",
-            "Pragma": "no-cache",
-            "Expires": "0"
-        }
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable Nginx proxy buffering for this response
+        },
     )
 
+
+@router.websocket("/api/tickets/ws")
+async def ticket_updates_ws(
+    websocket: WebSocket,
+    event_ids: Optional[str] = None,
+    types: Optional[str] = None,
+    actors: Optional[str] = None,
+):
+    """WebSocket feed of ticket updates; same filters as /api/tickets/stream."""
+    await websocket.accept()
+    sub = service.ticket_feed.subscribe(_split_csv(event_ids), _split_csv(types), _split_csv(actors))
+    try:
+        async with sub:
+            while True:
+                item = await sub.get(timeout=FEED_HEARTBEAT_SECONDS)
+                if item is None:
+                    await websocket.send_text('{"type":"ping"}')
+                    continue
+                _, payload = item
+                await websocket.send_text(payload)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Ticket feed websocket closed: {e}")
+
+
 @router.get("/api/meta/artists")
 async def get_all_artists():
     """Get list of all artists for autocomplete."""
@@ -122,19 +204,30 @@ async def get_service_status():
     from sqlmodel import select, col
     
     hlq_time = None
-    with session_scope() as session:
+    with session_scope(readonly=True) as session:
         stmt = select(HulaquanEvent.updated_at).order_by(col(HulaquanEvent.updated_at).desc()).limit(1)
         res = session.exec(stmt).first()
         if res:
             hlq_time = res
             
+    # Upstream circuit state: while not closed, the data below is the last successful sync
+    # 上游熔断状态：非 closed 时以下数据为最后一次成功同步的快照
+    from services.system import data_version
+    from services.system.network_health import upstream_monitor
+    circuits = upstream_monitor.get_stats()
+    stale = set(upstream_monitor.stale_domains([data_version.HULAQUAN, data_version.SAOJU]))
+            
     return {
         "hulaquan": {
             "active": config.ENABLE_CRAWLER,
-            "last_updated": hlq_time.isoformat() if hlq_time else None
+            "last_updated": hlq_time.isoformat() if hlq_time else None,
+            "stale": data_version.HULAQUAN in stale,
+            "circuit": circuits.get(data_version.HULAQUAN),
         },
         "saoju": {
-            "last_updated": saoju_updated
+            "last_updated": saoju_updated,
+            "stale": data_version.SAOJU in stale,
+            "circuit": circuits.get(data_version.SAOJU),
         },
         "service_info": {
             "version": "v1.4",
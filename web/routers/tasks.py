@@ -28,9 +28,10 @@ async def get_co_casts(casts: str, only_student: bool = False):
         tickets = await service.search_co_casts(cast_list)
         return {"results": tickets, "source": "hulaquan"}
     else:
-        async with saoju_service as s:
-            results = await s.match_co_casts(cast_list, show_others=True)
-            return {"results": results, "source": "saoju"}
+        # No `async with`: the global service's HTTP connections are shared and owned by the app lifespan
+        # 不使用 async with：全局服务的 HTTP 连接为共享连接，由应用 lifespan 管理
+        results = await saoju_service.match_co_casts(cast_list, show_others=True)
+        return {"results": results, "source": "saoju"}
 
 @router.post("/api/tasks/co-cast")
 @limiter.limit("5/minute", key_func=key_func_remote)
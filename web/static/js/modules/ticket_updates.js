@@ -4,6 +4,11 @@ import { state } from './state.js';
 import { formatSessionTime, escapeHtml } from './utils.js';
 
 let updateStatusPollInterval = null;
+let updatesStream = null;
+let streamRefreshTimer = null;
+
+// Change types shown in the updates card (also used to filter the live stream)
+const STREAM_TYPES = ['new', 'restock', 'back', 'pending'];
 
 // --- Initialization ---
 
@@ -15,6 +20,9 @@ export function initTicketUpdates() {
     if (updateStatusPollInterval) clearInterval(updateStatusPollInterval);
     updateStatusPollInterval = setInterval(fetchUpdateStatus, 60000);
 
+    // Live push: re-render as soon as the server publishes a matching update
+    connectUpdatesStream();
+
     // Expand/Collapse Card
     const card = document.getElementById('ticket-updates-card');
     const header = card.querySelector('.updates-header');
@@ -102,6 +110,29 @@ function renderFilterPills() {
     });
 }
 
+// --- Live Stream (SSE) ---
+
+function connectUpdatesStream() {
+    if (!window.EventSource) return;
+    if (updatesStream) updatesStream.close();
+
+    updatesStream = new EventSource(`/api/tickets/stream?types=${STREAM_TYPES.join(',')}`);
+    STREAM_TYPES.forEach(type => {
+        updatesStream.addEventListener(type, scheduleStreamRefresh);
+    });
+    // EventSource reconnects on its own (server sends retry: 5000)
+}
+
+function scheduleStreamRefresh() {
+    // A sync cycle publishes updates in bursts; refresh once per burst
+    if (streamRefreshTimer) clearTimeout(streamRefreshTimer);
+    streamRefreshTimer = setTimeout(() => {
+        streamRefreshTimer = null;
+        fetchAndRenderUpdates();
+        fetchUpdateStatus();
+    }, 2000);
+}
+
 async function fetchUpdateStatus() {
     const el = document.getElementById('update-status');
     if (!el) return;
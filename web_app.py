@@ -1,4 +1,5 @@
 import asyncio
+import hmac
 import logging
 import time
 import sys
@@ -159,13 +160,60 @@ async def lifespan(app: FastAPI):
     
     # Background Scheduler Logic
     scheduler_task = None
+
+    # City Mapping Watcher: re-resolve stored cities when config/venue_city_mapping.json changes
+    # 城市映射监听：映射文件变化时重新解析已存储的城市
+    async def _run_city_mapping_watcher():
+        while True:
+            try:
+                changed = await service.refresh_resolved_cities()
+                if changed:
+                    logger.info(f"City mapping watcher: re-resolved {changed} rows.")
+            except Exception as e:
+                logger.error(f"City mapping watcher error: {e}", exc_info=True)
+            await asyncio.sleep(60)
+
+    city_watcher_task = asyncio.create_task(_run_city_mapping_watcher())
+
+    # Seed the recent ticket updates ring buffer so the first visitor doesn't pay for the DB load
+    # 预热最近票务动态环形缓冲，避免首个访问者承担数据库加载
+    try:
+        await service.warm_recent_updates()
+    except Exception as e:
+        logger.warning(f"Failed to warm recent ticket updates: {e}")
     
     # NOTE: Notification Consumer is NOW MOVED to Bot Service.
     # Web service only produces SendQueue items (via process_updates).
 
+    # Metrics: periodic batch flush into the Metric table (also served live at /metrics)
+    # 指标：定期批量写入 Metric 表（/metrics 实时导出）
+    from services.system.metrics import metrics
+    if config.METRICS_FLUSH_INTERVAL > 0:
+        await metrics.start()
+
+    # Event loop lag: samples wake-up delay and logs the stack of any callback blocking the loop
+    # 事件循环延迟监控：采样唤醒延迟，记录阻塞循环的回调调用栈
+    from services.system.loop_monitor import loop_monitor
+    await loop_monitor.start()
+    
+    upstream_monitor = None
     if config.ENABLE_CRAWLER:
         logger.info("Crawler ENABLED. Starting background scheduler...")
         
+        # Per-upstream circuit breakers: while one is open its sync is skipped and a background probe
+        # checks for recovery; read APIs keep serving the last synced data (marked stale)
+        # 上游熔断：熔断期间跳过对应同步并在后台探测恢复；读接口继续返回最后一次同步的数据（标记为过期）
+        from services.system import data_version
+        from services.system.network_health import upstream_monitor
+        await upstream_monitor.start()
+        
+        def _circuit_open(name: str) -> bool:
+            if not upstream_monitor.is_open(name):
+                return False
+            breaker = upstream_monitor.breaker(name)
+            logger.warning(f"Scheduler: {name} circuit open, skipping sync (retry in {breaker.retry_after:.0f}s)")
+            return True
+        
         async def _run_scheduler():
             last_saoju_near = 0
             last_saoju_distant = 0
@@ -175,24 +223,35 @@ async def lifespan(app: FastAPI):
                     now_ts = time.time()
                     
                     # 1. Hulaquan Sync (Every ~5 mins)
-                    logger.info("Scheduler: Starting Hulaquan data sync...")
-                    updates = await service.sync_all_data()
+                    if not _circuit_open(data_version.HULAQUAN):
+                        logger.info("Scheduler: Starting Hulaquan data sync...")
+                        with metrics.timer("sync_duration_ms", {"job": "hulaquan"}):
+                            updates = await service.sync_all_data()
+                        metrics.inc("ticket_updates_total", len(updates))
+                        
+                        if updates:
+                             logger.info(f"Scheduler: Detected {len(updates)} updates, processing notifications...")
+                             enqueued = await notification_engine.process_updates(updates)
+                             logger.info(f"Scheduler: Enqueued {enqueued} new notifications.")
                     
-                    if updates:
-                         logger.info(f"Scheduler: Detected {len(updates)} updates, processing notifications...")
-                         enqueued = await notification_engine.process_updates(updates)
-                         logger.info(f"Scheduler: Enqueued {enqueued} new notifications.")
+                    # Saoju syncs stay due while the circuit is open (or opened during the sync),
+                    # so they run again as soon as it recovers
+                    # 扫剧熔断期间（或同步中触发熔断）不更新时间戳，恢复后立即补跑
+                    saoju_ok = not _circuit_open(data_version.SAOJU)
                     
                     # 2. Saoju Near Future (Every 4 hours)
-                    if now_ts - last_saoju_near > 14400:
+                    if saoju_ok and now_ts - last_saoju_near > 14400:
                          logger.info("Scheduler: Starting Saoju Near Future sync (0-120d)...")
-                         await saoju_service.sync_future_days(0, 120)
-                         last_saoju_near = time.time()
+                         with metrics.timer("sync_duration_ms", {"job": "saoju_near"}):
+                             await saoju_service.sync_future_days(0, 120)
+                         if not upstream_monitor.is_open(data_version.SAOJU):
+                             last_saoju_near = time.time()
 
                     # 3. Saoju Distant Future (Every 24 hours)
-                    if now_ts - last_saoju_distant > 86400:
+                    if saoju_ok and now_ts - last_saoju_distant > 86400:
                          logger.info("Scheduler: Starting Saoju Distant Tour sync (>120d)...")
-                         await saoju_service.sync_distant_tours(120)
+                         with metrics.timer("sync_duration_ms", {"job": "saoju_distant"}):
+                             await saoju_service.sync_distant_tours(120)
                          
                          logger.info("Scheduler: Starting 2026 Full Year Sync...")
                          try:
@@ -201,11 +260,13 @@ async def lifespan(app: FastAPI):
                              end_2026 = datetime(2026, 12, 31)
                              start_offset = (start_2026 - sch_now).days
                              end_offset = (end_2026 - sch_now).days + 1
-                             await saoju_service.sync_future_days(start_offset, end_offset)
+                             with metrics.timer("sync_duration_ms", {"job": "saoju_2026"}):
+                                 await saoju_service.sync_future_days(start_offset, end_offset)
                          except Exception as e:
                              logger.error(f"Error in 2026 Sync: {e}")
                              
-                         last_saoju_distant = time.time()
+                         if not upstream_monitor.is_open(data_version.SAOJU):
+                             last_saoju_distant = time.time()
                 except Exception as e:
                     logger.error(f"Scheduler Error: {e}", exc_info=True)
                     # Report to Admin
@@ -223,7 +284,7 @@ async def lifespan(app: FastAPI):
     # Shutdown logic
     logger.info("Shutting down...")
     
-    tasks_to_cancel = []
+    tasks_to_cancel = [city_watcher_task]
     if scheduler_task: tasks_to_cancel.append(scheduler_task)
     
     for t in tasks_to_cancel:
@@ -232,8 +293,21 @@ async def lifespan(app: FastAPI):
     if tasks_to_cancel:
         await asyncio.gather(*tasks_to_cancel, return_exceptions=True)
     
+    if upstream_monitor is not None:
+        await upstream_monitor.stop()
+    await loop_monitor.stop()
+    await metrics.stop()
+    
     # Close services
     await saoju_service.close()
+    # Shared HTTP clients: crawler clients first, then the per-host connectors they run on
+    # 关闭共享 HTTP 客户端：先关闭爬虫客户端，再关闭其所用的主机连接器
+    from services.crawler.advanced_client import close_all_clients
+    from services.system.http_clients import http_clients
+    await close_all_clients()
+    await http_clients.close()
+    from services.db.executor import db_executor
+    db_executor.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -262,6 +336,11 @@ async def not_found_handler(request: Request, exc):
 
 app.add_exception_handler(404, not_found_handler)
 
+# Response Cache for public GET APIs (innermost: maintenance mode still short-circuits first)
+# 公共 GET 接口响应缓存（最内层：维护模式仍然优先拦截）
+from web.middleware.response_cache import ResponseCacheMiddleware
+app.add_middleware(ResponseCacheMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -392,6 +471,22 @@ async def health_check():
     """Lightweight health check endpoint."""
     return {"status": "ok", "timestamp": time.time()}
 
+@app.get("/metrics", include_in_schema=False)
+@limiter.limit("30/minute")
+async def prometheus_metrics(request: Request):
+    """Prometheus text exposition; requires `Authorization: Bearer <HLQ_METRICS_TOKEN>` (404 when the token is unset)."""
+    # Exposes upstream hosts, DB pool state and queue depth: never served without a token
+    # 包含上游主机、连接池与队列积压等内部信息：未配置令牌时不提供
+    if not config.METRICS_TOKEN:
+        return Response(status_code=404)
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(),
+                               f"Bearer {config.METRICS_TOKEN}".encode()):
+        return Response(status_code=401)
+    from services.system.metrics import metrics
+    # Collectors read pool stats and the SendQueue depth; keep them off the event loop
+    await asyncio.to_thread(metrics.collect)
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/8726ae85b5d54209b12c399526d8e3b0.txt", response_class=PlainTextResponse)
 async def wechat_verification():
     """微信验证文件"""